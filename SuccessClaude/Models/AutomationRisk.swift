@@ -166,6 +166,73 @@ extension OccupationRisk {
 
 // MARK: - SOC Code Mapping
 
+// MARK: - Flattened Risk Index
+
+/// Every occupation code of every country resolved to its risk row at build time
+/// (scripts/risk_index.py), so a lookup is a single dictionary probe
+struct AutomationRiskIndex: Decodable {
+    static let supportedVersion = 1
+
+    let formatVersion: Int
+    let profiles: [[Double]]
+    let rows: [RiskIndexRow]
+    let lookup: [String: [String: Int]]
+    /// Metadata of each country's risk file, so the files themselves need not be loaded
+    let metadata: [String: RiskMetadata]
+
+    enum CodingKeys: String, CodingKey {
+        case formatVersion = "format_version"
+        case profiles
+        case rows
+        case lookup
+        case metadata
+    }
+
+    func risk(for code: String, countryCode: String) -> OccupationRisk? {
+        // Detailed US codes that only repeat their group are left out of the US file, so
+        // fall back to the minor group, then the broad group (XX-XXX0, XX-X000)
+        var candidates = [code]
+        if countryCode == "us" && code.count == 7 {
+            candidates += [String(code.dropLast()) + "0", String(code.prefix(4)) + "000"]
+        }
+        guard let table = lookup[countryCode],
+              let rowIndex = candidates.lazy.compactMap({ table[$0] }).first,
+              rows.indices.contains(rowIndex) else {
+            return nil
+        }
+        let row = rows[rowIndex]
+        guard profiles.indices.contains(row.profile), profiles[row.profile].count == 3 else {
+            return nil
+        }
+
+        let scores = profiles[row.profile]
+        return OccupationRisk(
+            socCode: row.socCode,
+            title: row.title,
+            category: row.category,
+            aiRisk: scores[0],
+            roboticsRisk: scores[1],
+            overallRisk: scores[2]
+        )
+    }
+}
+
+/// [soc_code, title, category, profile index]
+struct RiskIndexRow: Decodable {
+    let socCode: String
+    let title: String
+    let category: String
+    let profile: Int
+
+    init(from decoder: Decoder) throws {
+        var container = try decoder.unkeyedContainer()
+        socCode = try container.decode(String.self)
+        title = try container.decode(String.self)
+        category = try container.decode(String.self)
+        profile = try container.decode(Int.self)
+    }
+}
+
 struct SOCMapping: Codable {
     let mappings: [String: String]
     let metadata: MappingMetadata
@@ -127,6 +127,9 @@ struct CareerForecast {
     let ageGroups: [AgeGroupIncome]
     let peakAge: String
     let peakIncome: Double
+    /// Compound annual growth of the occupation's national median over the OEWS history, if available
+    var medianGrowth: Double? = nil
+    var growthYears: ClosedRange<Int>? = nil
 }
 
 struct AgeGroupIncome {
@@ -65,8 +65,11 @@ struct OccupationData: Codable, Identifiable {
     let nationalMedian: Double
     let nationalMean: Double
     let top10Percent: Double
-    let byState: [String: StateOccupationStats]
-    let ageDistribution: [String: IncomeStats]
+    var byState: [String: StateOccupationStats]
+    var ageDistribution: [String: IncomeStats]
+    /// Detail shard holding byState and ageDistribution when loaded from an occupation index
+    /// (scripts/occupation_shards.py); nil for entries read from a full occupation file
+    let shard: String?
 
     var id: String { socCode }
 
@@ -79,6 +82,36 @@ struct OccupationData: Codable, Identifiable {
         case top10Percent = "top_10_percent"
         case byState = "by_state"
         case ageDistribution = "age_distribution"
+        case shard
+    }
+
+    init(from decoder: Decoder) throws {
+        let container = try decoder.container(keyedBy: CodingKeys.self)
+        socCode = try container.decode(String.self, forKey: .socCode)
+        title = try container.decode(String.self, forKey: .title)
+        category = try container.decode(String.self, forKey: .category)
+        nationalMedian = try container.decode(Double.self, forKey: .nationalMedian)
+        nationalMean = try container.decode(Double.self, forKey: .nationalMean)
+        top10Percent = try container.decode(Double.self, forKey: .top10Percent)
+        // Index entries leave the detail blocks to their shard
+        byState = try container.decodeIfPresent([String: StateOccupationStats].self, forKey: .byState) ?? [:]
+        ageDistribution = try container.decodeIfPresent([String: IncomeStats].self, forKey: .ageDistribution) ?? [:]
+        shard = try container.decodeIfPresent(String.self, forKey: .shard)
+    }
+}
+
+/// One shard of occupation detail blocks, keyed by occupation code
+struct OccupationShardData: Codable {
+    let occupations: [String: OccupationDetail]
+}
+
+struct OccupationDetail: Codable {
+    let byState: [String: StateOccupationStats]
+    let ageDistribution: [String: IncomeStats]
+
+    enum CodingKeys: String, CodingKey {
+        case byState = "by_state"
+        case ageDistribution = "age_distribution"
     }
 }
 
@@ -193,6 +226,77 @@ struct DetailedIncomeStats: Codable {
     }
 }
 
+// MARK: - Percentile Tables
+
+struct PercentileTableData: Codable {
+    let quantiles: [Double]
+    let occupations: [String: OccupationQuantiles]
+}
+
+/// Wage values at each of the table's quantiles, ascending
+struct OccupationQuantiles: Codable {
+    let national: [Double]
+    let byState: [String: [Double]]
+    let fitted: Bool
+
+    enum CodingKeys: String, CodingKey {
+        case national
+        case byState = "by_state"
+        case fitted
+    }
+}
+
+// MARK: - Wage History
+
+/// National OEWS medians per year, built by scripts/oews_history.py (US only)
+struct WageHistoryData: Codable {
+    let years: [Int]
+    let occupations: [String: OccupationWageHistory]
+}
+
+/// Null where an occupation was not published that year
+struct OccupationWageHistory: Codable {
+    let median: [Double?]
+    let medianGrowth: Double?
+
+    enum CodingKeys: String, CodingKey {
+        case median
+        case medianGrowth = "median_growth"
+    }
+}
+
+// MARK: - Rank Indexes
+
+struct RankIndexData: Codable {
+    let stateRankings: [String: StateRankingIndex]
+    let similarOccupations: [String: [SimilarOccupationIndexEntry]]
+
+    enum CodingKeys: String, CodingKey {
+        case stateRankings = "state_rankings"
+        case similarOccupations = "similar_occupations"
+    }
+}
+
+/// Regions ordered by occupation median, descending
+struct StateRankingIndex: Codable {
+    let codes: [String]
+    let medians: [Double]
+}
+
+struct SimilarOccupationIndexEntry: Codable {
+    let socCode: String
+    let title: String
+    let median: Double
+    let percentageDifference: Double
+
+    enum CodingKeys: String, CodingKey {
+        case socCode = "soc_code"
+        case title
+        case median
+        case percentageDifference = "percentage_difference"
+    }
+}
+
 // MARK: - Metadata
 
 struct DataMetadata: Codable {
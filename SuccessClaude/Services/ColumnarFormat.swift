@@ -0,0 +1,587 @@
+//
+//  ColumnarFormat.swift
+//  SuccessClaude
+//
+//  Created by Claude on 12/28/25.
+//
+
+import Foundation
+
+/// Reader for the compact columnar data files written by scripts/compact_format.py.
+///
+/// Columnar documents (optionally wrapped in gzip) are decoded once into their column
+/// tree and the Codable models read rows straight out of the columns; plain JSON files
+/// go to JSONDecoder untouched.
+enum ColumnarFormat {
+    static let formatName = "successclaude-columnar"
+    static let supportedVersion = 1
+
+    private static let gzipMagic: [UInt8] = [0x1f, 0x8b]
+    private static let zstdMagic: [UInt8] = [0x28, 0xb5, 0x2f, 0xfd]
+
+    // MARK: - Entry Point
+
+    /// Decode a data file in any supported container or format
+    static func decode<T: Decodable>(_ type: T.Type, from data: Data, filename: String) throws -> T {
+        let payload = try unwrapContainer(data, filename: filename)
+
+        // The encoder always writes the format marker first, so legacy files are
+        // recognised without parsing them twice
+        guard payload.prefix(64).range(of: Data(formatName.utf8)) != nil else {
+            return try JSONDecoder().decode(type, from: payload)
+        }
+
+        let document = try JSONDecoder().decode(Document.self, from: payload)
+        guard document.format == formatName else {
+            throw DataLoaderError.invalidJSON(filename)
+        }
+        guard let root = document.root else {
+            throw DataLoaderError.unsupportedFormat("\(filename): columnar format version \(document.formatVersion)")
+        }
+
+        try root.validate(count: 1, codingPath: [])
+        return try T(from: CellDecoder(cell: .row(root, 0), codingPath: []))
+    }
+
+    // MARK: - Containers
+
+    private static func unwrapContainer(_ data: Data, filename: String) throws -> Data {
+        if data.starts(with: zstdMagic) {
+            throw DataLoaderError.unsupportedFormat("\(filename): zstd container")
+        }
+        guard data.starts(with: gzipMagic) else {
+            return data
+        }
+        guard let deflated = gzipPayload(data),
+              let inflated = try? (deflated as NSData).decompressed(using: .zlib) as Data else {
+            throw DataLoaderError.invalidJSON(filename)
+        }
+        return inflated
+    }
+
+    /// Raw deflate stream inside a gzip member (RFC 1952 header and trailer stripped)
+    private static func gzipPayload(_ data: Data) -> Data? {
+        let bytes = [UInt8](data)
+        guard bytes.count >= 18, bytes[2] == 8 else { return nil }
+
+        let flags = bytes[3]
+        var offset = 10
+        if flags & 0x04 != 0 {
+            guard offset + 2 <= bytes.count else { return nil }
+            offset += 2 + Int(bytes[offset]) + Int(bytes[offset + 1]) << 8
+        }
+        for flag: UInt8 in [0x08, 0x10] where flags & flag != 0 {
+            guard offset < bytes.count, let end = bytes[offset...].firstIndex(of: 0) else { return nil }
+            offset = end + 1
+        }
+        if flags & 0x02 != 0 {
+            offset += 2
+        }
+
+        guard offset <= bytes.count - 8 else { return nil }
+        return Data(bytes[offset..<(bytes.count - 8)])
+    }
+}
+
+// MARK: - Document
+
+private struct Document: Decodable {
+    let format: String
+    let formatVersion: Int
+    /// Nil for a format version this reader does not understand
+    let root: Column?
+
+    enum CodingKeys: String, CodingKey {
+        case format
+        case formatVersion = "format_version"
+        case root
+    }
+
+    init(from decoder: Decoder) throws {
+        let container = try decoder.container(keyedBy: CodingKeys.self)
+        format = try container.decode(String.self, forKey: .format)
+        formatVersion = try container.decodeIfPresent(Int.self, forKey: .formatVersion) ?? 0
+        if formatVersion == ColumnarFormat.supportedVersion {
+            root = try container.decode(Column.self, forKey: .root)
+        } else {
+            root = nil
+        }
+    }
+}
+
+/// Any JSON value, for "json" columns that hold floats, booleans, nulls or mixed types
+private enum JSONValue: Decodable {
+    case null
+    case bool(Bool)
+    case int(Int)
+    case double(Double)
+    case string(String)
+    case array([JSONValue])
+    case object([String: JSONValue])
+
+    init(from decoder: Decoder) throws {
+        let container = try decoder.singleValueContainer()
+        if container.decodeNil() {
+            self = .null
+        } else if let value = try? container.decode(Bool.self) {
+            self = .bool(value)
+        } else if let value = try? container.decode(Int.self) {
+            self = .int(value)
+        } else if let value = try? container.decode(Double.self) {
+            self = .double(value)
+        } else if let value = try? container.decode(String.self) {
+            self = .string(value)
+        } else if let value = try? container.decode([JSONValue].self) {
+            self = .array(value)
+        } else {
+            self = .object(try container.decode([String: JSONValue].self))
+        }
+    }
+}
+
+// MARK: - Columns
+
+/// One column of a columnar document, as described in scripts/compact_format.py
+private indirect enum Column: Decodable {
+    case ints([Int])
+    case strings([String])
+    case enumerated(dictionary: [String], codes: [Int])
+    case json([JSONValue])
+    case record(keys: [String], columns: [Column])
+    /// offsets[row]..<offsets[row + 1] are the row's positions in keys and values
+    case map(offsets: [Int], keys: [String], values: Column)
+    case list(offsets: [Int], values: Column)
+
+    enum CodingKeys: String, CodingKey {
+        case type = "t"
+        case dictionary = "dict"
+        case codes
+        case values
+        case keys
+        case columns
+        case lengths
+    }
+
+    init(from decoder: Decoder) throws {
+        let container = try decoder.container(keyedBy: CodingKeys.self)
+        let type = try container.decode(String.self, forKey: .type)
+
+        switch type {
+        case "int":
+            self = .ints(try PackedInts(from: decoder).values)
+        case "enum":
+            let dictionary = try container.decode([String].self, forKey: .dictionary)
+            let codes = try container.decode(PackedInts.self, forKey: .codes).values
+            guard codes.allSatisfy({ dictionary.indices.contains($0) }) else {
+                throw DecodingError.dataCorruptedError(forKey: .codes, in: container,
+                                                       debugDescription: "Enum code outside its \(dictionary.count)-entry dictionary")
+            }
+            self = .enumerated(dictionary: dictionary, codes: codes)
+        case "str":
+            self = .strings(try container.decode([String].self, forKey: .values))
+        case "json":
+            self = .json(try container.decode([JSONValue].self, forKey: .values))
+        case "record":
+            let keys = try container.decode([String].self, forKey: .keys)
+            let columns = try container.decode([Column].self, forKey: .columns)
+            guard keys.count == columns.count else {
+                throw DecodingError.dataCorruptedError(forKey: .columns, in: container,
+                                                       debugDescription: "\(keys.count) keys but \(columns.count) columns")
+            }
+            self = .record(keys: keys, columns: columns)
+        case "map", "list":
+            let lengths = try container.decode(PackedInts.self, forKey: .lengths).values
+            guard lengths.allSatisfy({ $0 >= 0 }) else {
+                throw DecodingError.dataCorruptedError(forKey: .lengths, in: container, debugDescription: "Negative length")
+            }
+            let offsets = lengths.reduce(into: [0]) { offsets, length in offsets.append(offsets[offsets.count - 1] + length) }
+            let values = try container.decode(Column.self, forKey: .values)
+
+            if type == "list" {
+                self = .list(offsets: offsets, values: values)
+            } else {
+                guard let keys = try container.decode(Column.self, forKey: .keys).stringValues else {
+                    throw DecodingError.dataCorruptedError(forKey: .keys, in: container, debugDescription: "Map keys are not strings")
+                }
+                self = .map(offsets: offsets, keys: keys, values: values)
+            }
+        default:
+            throw DecodingError.dataCorruptedError(forKey: .type, in: container, debugDescription: "Unknown column type \(type)")
+        }
+    }
+
+    /// Every value as a string, or nil if the column holds anything else
+    var stringValues: [String]? {
+        switch self {
+        case .strings(let values):
+            return values
+        case .enumerated(let dictionary, let codes):
+            return codes.map { dictionary[$0] }
+        case .json(let values):
+            let strings = values.compactMap { value -> String? in
+                if case .string(let string) = value { return string }
+                return nil
+            }
+            return strings.count == values.count ? strings : nil
+        default:
+            return nil
+        }
+    }
+
+    /// Check that the column and its children hold exactly the rows their parent implies
+    func validate(count: Int, codingPath: [CodingKey]) throws {
+        let found: Int
+        switch self {
+        case .ints(let values):
+            found = values.count
+        case .strings(let values):
+            found = values.count
+        case .enumerated(_, let codes):
+            found = codes.count
+        case .json(let values):
+            found = values.count
+        case .record(_, let columns):
+            for column in columns {
+                try column.validate(count: count, codingPath: codingPath)
+            }
+            found = count
+        case .map(let offsets, let keys, let values):
+            guard keys.count == offsets[offsets.count - 1] else {
+                throw DecodingError.dataCorrupted(DecodingError.Context(
+                    codingPath: codingPath, debugDescription: "Map has \(keys.count) keys for \(offsets[offsets.count - 1]) values"))
+            }
+            try values.validate(count: keys.count, codingPath: codingPath)
+            found = offsets.count - 1
+        case .list(let offsets, let values):
+            try values.validate(count: offsets[offsets.count - 1], codingPath: codingPath)
+            found = offsets.count - 1
+        }
+
+        guard found == count else {
+            throw DecodingError.dataCorrupted(DecodingError.Context(
+                codingPath: codingPath, debugDescription: "Expected \(count) values, found \(found)"))
+        }
+    }
+}
+
+/// Little-endian int32/int64 values packed as base64
+private struct PackedInts: Decodable {
+    let values: [Int]
+
+    enum CodingKeys: String, CodingKey {
+        case width = "w"
+        case data
+    }
+
+    init(from decoder: Decoder) throws {
+        let container = try decoder.container(keyedBy: CodingKeys.self)
+        let width = try container.decode(Int.self, forKey: .width)
+        guard width == 4 || width == 8,
+              let data = Data(base64Encoded: try container.decode(String.self, forKey: .data)),
+              data.count % width == 0 else {
+            throw DecodingError.dataCorruptedError(forKey: .data, in: container, debugDescription: "Malformed packed integers")
+        }
+
+        values = data.withUnsafeBytes { raw in
+            (0..<(data.count / width)).map { index in
+                width == 4
+                    ? Int(Int32(littleEndian: raw.loadUnaligned(fromByteOffset: index * 4, as: Int32.self)))
+                    : Int(Int64(littleEndian: raw.loadUnaligned(fromByteOffset: index * 8, as: Int64.self)))
+            }
+        }
+    }
+}
+
+// MARK: - Decoder
+
+/// A value inside the document: one row of a column, or part of a verbatim JSON value
+private enum Cell {
+    case row(Column, Int)
+    case value(JSONValue)
+
+    /// Scalar value, or nil for objects and arrays
+    var scalar: JSONValue? {
+        switch self {
+        case .row(.ints(let values), let row):
+            return .int(values[row])
+        case .row(.strings(let values), let row):
+            return .string(values[row])
+        case .row(.enumerated(let dictionary, let codes), let row):
+            return .string(dictionary[codes[row]])
+        case .row(.json(let values), let row):
+            return Cell.value(values[row]).scalar
+        case .row:
+            return nil
+        case .value(.array), .value(.object):
+            return nil
+        case .value(let value):
+            return value
+        }
+    }
+
+    var isNull: Bool {
+        if case .null? = scalar { return true }
+        return false
+    }
+
+    /// Members of an object, or nil if the cell is not one
+    var members: [String: Cell]? {
+        switch self {
+        case .row(.record(let keys, let columns), let row):
+            return Dictionary(zip(keys, columns.map { Cell.row($0, row) }), uniquingKeysWith: { first, _ in first })
+        case .row(.map(let offsets, let keys, let values), let row):
+            var members: [String: Cell] = [:]
+            for position in offsets[row]..<offsets[row + 1] {
+                members[keys[position]] = .row(values, position)
+            }
+            return members
+        case .row(.json(let values), let row):
+            return Cell.value(values[row]).members
+        case .value(.object(let object)):
+            return object.mapValues { Cell.value($0) }
+        default:
+            return nil
+        }
+    }
+
+    /// Elements of an array, or nil if the cell is not one
+    var elements: [Cell]? {
+        switch self {
+        case .row(.list(let offsets, let values), let row):
+            return (offsets[row]..<offsets[row + 1]).map { Cell.row(values, $0) }
+        case .row(.json(let values), let row):
+            return Cell.value(values[row]).elements
+        case .value(.array(let array)):
+            return array.map { Cell.value($0) }
+        default:
+            return nil
+        }
+    }
+}
+
+private struct IndexKey: CodingKey {
+    let stringValue: String
+    let intValue: Int?
+
+    init(stringValue: String) {
+        self.stringValue = stringValue
+        intValue = nil
+    }
+
+    init(intValue: Int) {
+        stringValue = "Index \(intValue)"
+        self.intValue = intValue
+    }
+}
+
+private func typeMismatch(_ type: Any.Type, expected: String, at codingPath: [CodingKey]) -> DecodingError {
+    DecodingError.typeMismatch(type, DecodingError.Context(codingPath: codingPath, debugDescription: "Expected \(expected)"))
+}
+
+private struct CellDecoder: Decoder {
+    let cell: Cell
+    let codingPath: [CodingKey]
+    var userInfo: [CodingUserInfoKey: Any] { [:] }
+
+    func container<Key: CodingKey>(keyedBy type: Key.Type) throws -> KeyedDecodingContainer<Key> {
+        guard let members = cell.members else {
+            throw typeMismatch([String: Any].self, expected: "an object", at: codingPath)
+        }
+        return KeyedDecodingContainer(KeyedCells<Key>(members: members, codingPath: codingPath))
+    }
+
+    func unkeyedContainer() throws -> UnkeyedDecodingContainer {
+        guard let elements = cell.elements else {
+            throw typeMismatch([Any].self, expected: "an array", at: codingPath)
+        }
+        return UnkeyedCells(elements: elements, codingPath: codingPath)
+    }
+
+    func singleValueContainer() throws -> SingleValueDecodingContainer {
+        SingleCell(cell: cell, codingPath: codingPath)
+    }
+}
+
+private struct KeyedCells<Key: CodingKey>: KeyedDecodingContainerProtocol {
+    let members: [String: Cell]
+    let codingPath: [CodingKey]
+
+    var allKeys: [Key] { members.keys.compactMap { Key(stringValue: $0) } }
+
+    func contains(_ key: Key) -> Bool { members[key.stringValue] != nil }
+
+    private func decoder(for key: CodingKey) throws -> CellDecoder {
+        guard let cell = members[key.stringValue] else {
+            throw DecodingError.keyNotFound(key, DecodingError.Context(
+                codingPath: codingPath, debugDescription: "No value associated with key \(key.stringValue)"))
+        }
+        return CellDecoder(cell: cell, codingPath: codingPath + [key])
+    }
+
+    private func value<T: Decodable>(_ type: T.Type, forKey key: Key) throws -> T {
+        try T(from: decoder(for: key))
+    }
+
+    func decodeNil(forKey key: Key) throws -> Bool { try decoder(for: key).cell.isNull }
+    func decode(_ type: Bool.Type, forKey key: Key) throws -> Bool { try value(type, forKey: key) }
+    func decode(_ type: String.Type, forKey key: Key) throws -> String { try value(type, forKey: key) }
+    func decode(_ type: Double.Type, forKey key: Key) throws -> Double { try value(type, forKey: key) }
+    func decode(_ type: Float.Type, forKey key: Key) throws -> Float { try value(type, forKey: key) }
+    func decode(_ type: Int.Type, forKey key: Key) throws -> Int { try value(type, forKey: key) }
+    func decode(_ type: Int8.Type, forKey key: Key) throws -> Int8 { try value(type, forKey: key) }
+    func decode(_ type: Int16.Type, forKey key: Key) throws -> Int16 { try value(type, forKey: key) }
+    func decode(_ type: Int32.Type, forKey key: Key) throws -> Int32 { try value(type, forKey: key) }
+    func decode(_ type: Int64.Type, forKey key: Key) throws -> Int64 { try value(type, forKey: key) }
+    func decode(_ type: UInt.Type, forKey key: Key) throws -> UInt { try value(type, forKey: key) }
+    func decode(_ type: UInt8.Type, forKey key: Key) throws -> UInt8 { try value(type, forKey: key) }
+    func decode(_ type: UInt16.Type, forKey key: Key) throws -> UInt16 { try value(type, forKey: key) }
+    func decode(_ type: UInt32.Type, forKey key: Key) throws -> UInt32 { try value(type, forKey: key) }
+    func decode(_ type: UInt64.Type, forKey key: Key) throws -> UInt64 { try value(type, forKey: key) }
+    func decode<T: Decodable>(_ type: T.Type, forKey key: Key) throws -> T { try value(type, forKey: key) }
+
+    func nestedContainer<NestedKey: CodingKey>(keyedBy type: NestedKey.Type,
+                                               forKey key: Key) throws -> KeyedDecodingContainer<NestedKey> {
+        try decoder(for: key).container(keyedBy: type)
+    }
+
+    func nestedUnkeyedContainer(forKey key: Key) throws -> UnkeyedDecodingContainer {
+        try decoder(for: key).unkeyedContainer()
+    }
+
+    func superDecoder() throws -> Decoder {
+        CellDecoder(cell: members["super"] ?? .value(.null), codingPath: codingPath + [IndexKey(stringValue: "super")])
+    }
+
+    func superDecoder(forKey key: Key) throws -> Decoder {
+        CellDecoder(cell: members[key.stringValue] ?? .value(.null), codingPath: codingPath + [key])
+    }
+}
+
+private struct UnkeyedCells: UnkeyedDecodingContainer {
+    let elements: [Cell]
+    let codingPath: [CodingKey]
+    private(set) var currentIndex = 0
+
+    init(elements: [Cell], codingPath: [CodingKey]) {
+        self.elements = elements
+        self.codingPath = codingPath
+    }
+
+    var count: Int? { elements.count }
+    var isAtEnd: Bool { currentIndex >= elements.count }
+
+    private func currentDecoder(_ type: Any.Type) throws -> CellDecoder {
+        guard !isAtEnd else {
+            throw DecodingError.valueNotFound(type, DecodingError.Context(
+                codingPath: codingPath + [IndexKey(intValue: currentIndex)], debugDescription: "Unkeyed container is at end"))
+        }
+        return CellDecoder(cell: elements[currentIndex], codingPath: codingPath + [IndexKey(intValue: currentIndex)])
+    }
+
+    private mutating func next<T: Decodable>(_ type: T.Type) throws -> T {
+        let value = try T(from: currentDecoder(type))
+        currentIndex += 1
+        return value
+    }
+
+    mutating func decodeNil() throws -> Bool {
+        guard try currentDecoder(Any?.self).cell.isNull else { return false }
+        currentIndex += 1
+        return true
+    }
+
+    mutating func decode(_ type: Bool.Type) throws -> Bool { try next(type) }
+    mutating func decode(_ type: String.Type) throws -> String { try next(type) }
+    mutating func decode(_ type: Double.Type) throws -> Double { try next(type) }
+    mutating func decode(_ type: Float.Type) throws -> Float { try next(type) }
+    mutating func decode(_ type: Int.Type) throws -> Int { try next(type) }
+    mutating func decode(_ type: Int8.Type) throws -> Int8 { try next(type) }
+    mutating func decode(_ type: Int16.Type) throws -> Int16 { try next(type) }
+    mutating func decode(_ type: Int32.Type) throws -> Int32 { try next(type) }
+    mutating func decode(_ type: Int64.Type) throws -> Int64 { try next(type) }
+    mutating func decode(_ type: UInt.Type) throws -> UInt { try next(type) }
+    mutating func decode(_ type: UInt8.Type) throws -> UInt8 { try next(type) }
+    mutating func decode(_ type: UInt16.Type) throws -> UInt16 { try next(type) }
+    mutating func decode(_ type: UInt32.Type) throws -> UInt32 { try next(type) }
+    mutating func decode(_ type: UInt64.Type) throws -> UInt64 { try next(type) }
+    mutating func decode<T: Decodable>(_ type: T.Type) throws -> T { try next(type) }
+
+    mutating func nestedContainer<NestedKey: CodingKey>(keyedBy type: NestedKey.Type) throws -> KeyedDecodingContainer<NestedKey> {
+        let container = try currentDecoder(KeyedDecodingContainer<NestedKey>.self).container(keyedBy: type)
+        currentIndex += 1
+        return container
+    }
+
+    mutating func nestedUnkeyedContainer() throws -> UnkeyedDecodingContainer {
+        let container = try currentDecoder(UnkeyedDecodingContainer.self).unkeyedContainer()
+        currentIndex += 1
+        return container
+    }
+
+    mutating func superDecoder() throws -> Decoder {
+        let decoder = try currentDecoder(Decoder.self)
+        currentIndex += 1
+        return decoder
+    }
+}
+
+private struct SingleCell: SingleValueDecodingContainer {
+    let cell: Cell
+    let codingPath: [CodingKey]
+
+    private func integer<T: FixedWidthInteger>(_ type: T.Type) throws -> T {
+        switch cell.scalar {
+        case .int(let value)?:
+            if let exact = T(exactly: value) { return exact }
+        case .double(let value)?:
+            if let exact = T(exactly: value) { return exact }
+        default:
+            break
+        }
+        throw typeMismatch(type, expected: "a number that fits \(type)", at: codingPath)
+    }
+
+    private func floatingPoint<T: BinaryFloatingPoint>(_ type: T.Type) throws -> T {
+        switch cell.scalar {
+        case .int(let value)?:
+            return T(value)
+        case .double(let value)?:
+            return T(value)
+        default:
+            throw typeMismatch(type, expected: "a number", at: codingPath)
+        }
+    }
+
+    func decodeNil() -> Bool { cell.isNull }
+
+    func decode(_ type: Bool.Type) throws -> Bool {
+        guard case .bool(let value)? = cell.scalar else {
+            throw typeMismatch(type, expected: "a boolean", at: codingPath)
+        }
+        return value
+    }
+
+    func decode(_ type: String.Type) throws -> String {
+        guard case .string(let value)? = cell.scalar else {
+            throw typeMismatch(type, expected: "a string", at: codingPath)
+        }
+        return value
+    }
+
+    func decode(_ type: Double.Type) throws -> Double { try floatingPoint(type) }
+    func decode(_ type: Float.Type) throws -> Float { try floatingPoint(type) }
+    func decode(_ type: Int.Type) throws -> Int { try integer(type) }
+    func decode(_ type: Int8.Type) throws -> Int8 { try integer(type) }
+    func decode(_ type: Int16.Type) throws -> Int16 { try integer(type) }
+    func decode(_ type: Int32.Type) throws -> Int32 { try integer(type) }
+    func decode(_ type: Int64.Type) throws -> Int64 { try integer(type) }
+    func decode(_ type: UInt.Type) throws -> UInt { try integer(type) }
+    func decode(_ type: UInt8.Type) throws -> UInt8 { try integer(type) }
+    func decode(_ type: UInt16.Type) throws -> UInt16 { try integer(type) }
+    func decode(_ type: UInt32.Type) throws -> UInt32 { try integer(type) }
+    func decode(_ type: UInt64.Type) throws -> UInt64 { try integer(type) }
+
+    func decode<T: Decodable>(_ type: T.Type) throws -> T {
+        try T(from: CellDecoder(cell: cell, codingPath: codingPath))
+    }
+}
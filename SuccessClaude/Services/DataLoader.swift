@@ -11,6 +11,7 @@ enum DataLoaderError: Error {
     case fileNotFound(String)
     case invalidJSON(String)
     case decodingError(String)
+    case unsupportedFormat(String)
 
     var localizedDescription: String {
         switch self {
@@ -20,6 +21,8 @@ enum DataLoaderError: Error {
             return "Invalid JSON in file: \(filename)"
         case .decodingError(let message):
             return "Failed to decode data: \(message)"
+        case .unsupportedFormat(let message):
+            return "Unsupported data format: \(message)"
         }
     }
 }
@@ -31,6 +34,10 @@ struct CountryDataSet {
     var regionData: RegionIncomeData?
     var nationalData: NationalStatisticsData?
     var automationRiskData: AutomationRiskData?
+    var percentileTables: PercentileTableData?
+    var rankIndexes: RankIndexData?
+    var wageHistory: WageHistoryData?
+    var searchIndex: OccupationSearchIndex?
 }
 
 class DataLoader {
@@ -49,6 +56,14 @@ class DataLoader {
     private var fapToSocMapping: SOCMapping?
     private var cnoToSocMapping: SOCMapping?
 
+    // Build-time resolution of every code to its automation risk (see scripts/risk_index.py)
+    private var automationRiskIndex: AutomationRiskIndex?
+
+    // Occupation detail shards loaded on demand, keyed by "<country>/<shard>" (see scripts/occupation_shards.py).
+    // getOccupationData is called from concurrent tasks, so the cache is guarded by a lock
+    private var occupationShards: [String: [String: OccupationDetail]] = [:]
+    private let occupationShardsLock = NSLock()
+
     // Legacy properties for backward compatibility
     private var occupationsData: BLSOEWSData? {
         countryDataSets[currentCountryCode]?.occupationsData
@@ -91,9 +106,11 @@ class DataLoader {
         // Load SOC mapping
         try await loadSOCMapping()
 
-        // Always load US data first (needed for automation risk for all countries)
-        if currentCountryCode != "us" {
-            try await loadCountryData(countryCode: "us")
+        // Optional: without the index, automation risk falls back to scanning the risk files
+        do {
+            try await loadAutomationRiskIndex()
+        } catch {
+            print("⚠️ No automation risk index: \(error)")
         }
 
         // Load data for current country
@@ -125,16 +142,52 @@ class DataLoader {
             print("⚠️ Failed to load national data: \(error)")
         }
 
-        // Load automation risk data
+        // The risk index answers every country; the row files are only scanned without it, and
+        // for the UK's 2-digit prefix lookup. Rows loaded earlier as a fallback are kept.
+        dataSet.automationRiskData = countryDataSets[countryCode]?.automationRiskData
+        if dataSet.automationRiskData == nil && (automationRiskIndex == nil || countryCode == "uk") {
+            do {
+                dataSet.automationRiskData = try await loadAutomationRiskData(countryCode: countryCode)
+                print("✅ Loaded automation risk data for \(countryCode)")
+            } catch {
+                print("⚠️ Failed to load automation risk data for \(countryCode): \(error)")
+            }
+        }
+
+        // Percentile tables are optional; without them percentiles are approximated from median/mean
         do {
-            dataSet.automationRiskData = try await loadAutomationRiskData(countryCode: countryCode)
-            print("✅ Loaded automation risk data for \(countryCode)")
+            dataSet.percentileTables = try await loadPercentileTables(countryCode: countryCode)
         } catch {
-            print("⚠️ Failed to load automation risk data for \(countryCode): \(error)")
+            print("⚠️ No percentile tables for \(countryCode): \(error)")
+        }
+
+        // Rank indexes are optional too; without them rankings are sorted on demand
+        do {
+            dataSet.rankIndexes = try await loadRankIndexes(countryCode: countryCode)
+        } catch {
+            print("⚠️ No rank indexes for \(countryCode): \(error)")
+        }
+
+        // Without a search index the occupation picker filters titles by substring
+        do {
+            dataSet.searchIndex = try await loadSearchIndex(countryCode: countryCode)
+        } catch {
+            print("⚠️ No search index for \(countryCode): \(error)")
+        }
+
+        // Wage history only exists for the US (multi-year OEWS); the forecast works without it
+        if countryCode == "us" {
+            do {
+                dataSet.wageHistory = try await loadWageHistory(countryCode: countryCode)
+            } catch {
+                print("⚠️ No wage history for \(countryCode): \(error)")
+            }
         }
 
-        // For non-US countries, also ensure US automation data is loaded (as fallback)
-        if countryCode != "us" && countryDataSets["us"]?.automationRiskData == nil {
+        // US risk rows are only needed for the crosswalk fallback: without the index, or for
+        // UK codes; nothing else from the US dataset is loaded
+        let needsUSRiskData = automationRiskIndex == nil || countryCode == "uk"
+        if countryCode != "us" && needsUSRiskData && countryDataSets["us"]?.automationRiskData == nil {
             do {
                 let usAutomationData = try await loadAutomationRiskData(countryCode: "us")
                 if var usDataSet = countryDataSets["us"] {
@@ -184,9 +237,27 @@ class DataLoader {
         print("🗺️ CNO→SOC mapping loaded: \(cnoToSocMapping?.mappings.count ?? 0) mappings")
     }
 
+    func loadAutomationRiskIndex() async throws {
+        let index: AutomationRiskIndex = try await load(filename: "automation_risk_index", extension: "json", subdirectory: nil)
+        guard index.formatVersion == AutomationRiskIndex.supportedVersion else {
+            throw DataLoaderError.unsupportedFormat("automation_risk_index.json: version \(index.formatVersion)")
+        }
+        automationRiskIndex = index
+        print("🗺️ Automation risk index loaded: \(index.rows.count) rows for \(index.lookup.count) countries")
+    }
+
     // MARK: - Individual Loaders (Country-specific)
 
     private func loadOccupationsData(countryCode: String) async throws -> BLSOEWSData {
+        // The index carries every occupation without its detail blocks; those are loaded per shard
+        do {
+            let index = try await load(filename: "\(countryCode)_occupation_index", extension: "json", subdirectory: countryCode) as BLSOEWSData
+            print("✅ Loaded \(index.occupations.count) occupations for \(countryCode) from the occupation index")
+            return index
+        } catch {
+            print("⚠️ No occupation index for \(countryCode), loading the full file: \(error)")
+        }
+
         let filename: String
         switch countryCode {
         case "us":
@@ -215,17 +286,38 @@ class DataLoader {
         try await load(filename: "\(countryCode)_automation_risk_data", extension: "json", subdirectory: countryCode)
     }
 
+    private func loadPercentileTables(countryCode: String) async throws -> PercentileTableData {
+        try await load(filename: "\(countryCode)_percentile_tables", extension: "json", subdirectory: countryCode)
+    }
+
+    private func loadRankIndexes(countryCode: String) async throws -> RankIndexData {
+        try await load(filename: "\(countryCode)_rank_indexes", extension: "json", subdirectory: countryCode)
+    }
+
+    private func loadSearchIndex(countryCode: String) async throws -> OccupationSearchIndex {
+        try await load(filename: "\(countryCode)_search_index", extension: "json", subdirectory: countryCode)
+    }
+
+    private func loadWageHistory(countryCode: String) async throws -> WageHistoryData {
+        try await load(filename: "\(countryCode)_wage_history", extension: "json", subdirectory: countryCode)
+    }
+
     // MARK: - Generic JSON Loader
 
     private func load<T: Decodable>(filename: String, extension ext: String, subdirectory: String?) async throws -> T {
+        try decodeFile(filename: filename, extension: ext, subdirectory: subdirectory)
+    }
+
+    private func decodeFile<T: Decodable>(filename: String, extension ext: String, subdirectory: String?) throws -> T {
         let url = try getFileURL(filename: filename, extension: ext, subdirectory: subdirectory)
-        let data = try Data(contentsOf: url)
-        print("📊 Loaded file size: \(data.count) bytes from \(url.lastPathComponent)")
+        let fileData = try Data(contentsOf: url)
+        print("📊 Loaded file size: \(fileData.count) bytes from \(url.lastPathComponent)")
 
-        let decoder = JSONDecoder()
+        // Generated files may be shipped in the compact columnar format (see scripts/compact_format.py)
         do {
-            let result = try decoder.decode(T.self, from: data)
-            return result
+            return try ColumnarFormat.decode(T.self, from: fileData, filename: "\(filename).\(ext)")
+        } catch let error as DataLoaderError {
+            throw error
         } catch {
             throw DataLoaderError.decodingError("\(filename).\(ext): \(error.localizedDescription)")
         }
@@ -277,7 +369,34 @@ class DataLoader {
 
     func getOccupationData(for socCode: String, countryCode: String? = nil) -> OccupationData? {
         let country = countryCode ?? currentCountryCode
-        return countryDataSets[country]?.occupationsData?.occupations.first { $0.socCode == socCode }
+        guard var occupation = countryDataSets[country]?.occupationsData?.occupations.first(where: { $0.socCode == socCode }) else {
+            return nil
+        }
+
+        // Index entries get their by-region and age blocks from the shard named in the entry
+        if let shard = occupation.shard, let detail = occupationDetail(for: socCode, shard: shard, countryCode: country) {
+            occupation.byState = detail.byState
+            occupation.ageDistribution = detail.ageDistribution
+        }
+        return occupation
+    }
+
+    private func occupationDetail(for socCode: String, shard: String, countryCode: String) -> OccupationDetail? {
+        occupationShardsLock.lock()
+        defer { occupationShardsLock.unlock() }
+
+        let key = "\(countryCode)/\(shard)"
+        if occupationShards[key] == nil {
+            do {
+                let data: OccupationShardData = try decodeFile(filename: "\(countryCode)_occupation_shard_\(shard)",
+                                                               extension: "json", subdirectory: countryCode)
+                occupationShards[key] = data.occupations
+            } catch {
+                print("⚠️ Failed to load occupation shard \(shard) for \(countryCode): \(error)")
+                return nil
+            }
+        }
+        return occupationShards[key]?[socCode]
     }
 
     func getRegionData(for regionCode: String, countryCode: String? = nil) -> RegionData? {
@@ -285,6 +404,47 @@ class DataLoader {
         return countryDataSets[country]?.regionData?.regions.first { $0.code == regionCode }
     }
 
+    /// Quantile table for an occupation, for one region when regionCode is given
+    func getOccupationQuantiles(for socCode: String, regionCode: String? = nil, countryCode: String? = nil) -> (quantiles: [Double], values: [Double])? {
+        let country = countryCode ?? currentCountryCode
+        guard let tables = countryDataSets[country]?.percentileTables,
+              let occupation = tables.occupations[socCode] else {
+            return nil
+        }
+
+        if let regionCode = regionCode {
+            guard let values = occupation.byState[regionCode] else { return nil }
+            return (tables.quantiles, values)
+        }
+        return (tables.quantiles, occupation.national)
+    }
+
+    /// Regions ordered by median for an occupation, precomputed by scripts/rank_indexes.py
+    func getStateRankingIndex(for socCode: String, countryCode: String? = nil) -> StateRankingIndex? {
+        let country = countryCode ?? currentCountryCode
+        return countryDataSets[country]?.rankIndexes?.stateRankings[socCode]
+    }
+
+    /// Best-paid occupations in the same category, precomputed by scripts/rank_indexes.py
+    func getSimilarOccupationsIndex(for socCode: String, countryCode: String? = nil) -> [SimilarOccupationIndexEntry]? {
+        let country = countryCode ?? currentCountryCode
+        return countryDataSets[country]?.rankIndexes?.similarOccupations[socCode]
+    }
+
+    /// Compound annual growth of an occupation's median and the years it spans, from scripts/oews_history.py
+    func getWageGrowth(for socCode: String, countryCode: String? = nil) -> (rate: Double, firstYear: Int, lastYear: Int)? {
+        let country = countryCode ?? currentCountryCode
+        guard let history = countryDataSets[country]?.wageHistory,
+              let occupation = history.occupations[socCode],
+              let rate = occupation.medianGrowth,
+              let first = occupation.median.firstIndex(where: { $0 != nil }),
+              let last = occupation.median.lastIndex(where: { $0 != nil }),
+              last < history.years.count else {
+            return nil
+        }
+        return (rate, history.years[first], history.years[last])
+    }
+
     func getStateData(for state: USState) -> StateData? {
         return getRegionData(for: state.rawValue, countryCode: "us")
     }
@@ -311,6 +471,13 @@ class DataLoader {
         return allOccupations
     }
 
+    /// Occupations matching a picker query from the prebuilt index (scripts/search_index.py),
+    /// best first, or nil when the country has none
+    func searchOccupations(_ query: String, countryCode: String? = nil) -> [OccupationSearchIndex.Match]? {
+        let country = countryCode ?? currentCountryCode
+        return countryDataSets[country]?.searchIndex?.search(query)
+    }
+
     func getAllRegions(countryCode: String? = nil) -> [RegionData] {
         let country = countryCode ?? currentCountryCode
         return countryDataSets[country]?.regionData?.regions ?? []
@@ -328,6 +495,12 @@ class DataLoader {
         let country = countryCode ?? currentCountryCode
         print("🤖 Looking for automation risk: SOC=\(socCode), country=\(country)")
 
+        // Single probe into the build-time index; the scans below are the fallback
+        if let risk = automationRiskIndex?.risk(for: socCode, countryCode: country) {
+            print("✅ Found automation risk in index for \(socCode): \(risk.overallRisk)%")
+            return risk
+        }
+
         // First, try country's own automation risk data (with 2-digit prefix matching for UK)
         if let countryAutomationData = countryDataSets[country]?.automationRiskData {
             // For UK: use 2-digit prefix (e.g., "5434" → "54")
@@ -429,8 +602,12 @@ class DataLoader {
     }
 
     func getAutomationRiskMetadata(countryCode: String? = nil) -> RiskMetadata? {
-        // Always return US metadata since we use US automation data for all countries
-        return countryDataSets["us"]?.automationRiskData?.metadata
+        // Country files are derived from US scores (scripts/crosswalk_risk.py); US metadata is the fallback
+        let country = countryCode ?? currentCountryCode
+        return automationRiskIndex?.metadata[country]
+            ?? countryDataSets[country]?.automationRiskData?.metadata
+            ?? automationRiskIndex?.metadata["us"]
+            ?? countryDataSets["us"]?.automationRiskData?.metadata
     }
 
     // MARK: - Occupation Categories
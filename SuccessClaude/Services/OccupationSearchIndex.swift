@@ -0,0 +1,202 @@
+//
+//  OccupationSearchIndex.swift
+//  SuccessClaude
+//
+//  Created by Claude on 12/28/25.
+//
+
+import Foundation
+
+/// Prebuilt occupation search index written by scripts/search_index.py (format 3).
+///
+/// Queries follow SearchIndex in the script: every query word as a prefix of a title or
+/// code token, then the whole query as a substring of the title, category or code (the
+/// picker's original filter, answered from trigram postings), then every query word as a
+/// prefix of an alias token taken from the SOC crosswalks.
+struct OccupationSearchIndex: Decodable {
+    static let supportedVersion = 3
+
+    /// One result, with what the picker needs to show it
+    struct Match {
+        let code: String
+        let title: String
+        let category: String
+    }
+
+    let formatVersion: Int
+    let codes: [String]
+    let titles: [String]
+    let categories: [String]
+    let categoryIds: [Int]
+    /// Sorted by Unicode scalar value, as Python sorts strings
+    let vocabulary: [String]
+    /// Document ids per vocabulary entry, decoded from the file's gap encoding
+    let postings: [[Int]]
+    let aliasPostings: [[Int]]
+    /// Sorted like the vocabulary; three-character substrings of the normalized titles and codes
+    let trigrams: [String]
+    let trigramPostings: [[Int]]
+
+    /// Normalized title and code of each document, to confirm trigram candidates
+    private let fields: [[String]]
+    private let normalizedCategories: [String]
+    /// Documents of each category
+    private let facets: [[Int]]
+
+    enum CodingKeys: String, CodingKey {
+        case formatVersion = "format_version"
+        case codes
+        case titles
+        case categories
+        case categoryIds = "category_ids"
+        case vocabulary
+        case postings
+        case aliasPostings = "alias_postings"
+        case trigrams
+        case trigramPostings = "trigram_postings"
+    }
+
+    init(from decoder: Decoder) throws {
+        let container = try decoder.container(keyedBy: CodingKeys.self)
+        formatVersion = try container.decode(Int.self, forKey: .formatVersion)
+        guard formatVersion == Self.supportedVersion else {
+            throw DecodingError.dataCorruptedError(forKey: .formatVersion, in: container,
+                                                   debugDescription: "Unsupported search index version \(formatVersion)")
+        }
+        codes = try container.decode([String].self, forKey: .codes)
+        titles = try container.decode([String].self, forKey: .titles)
+        categories = try container.decode([String].self, forKey: .categories)
+        categoryIds = try container.decode([Int].self, forKey: .categoryIds)
+        vocabulary = try container.decode([String].self, forKey: .vocabulary)
+        postings = try container.decode([[Int]].self, forKey: .postings).map(Self.ungap)
+        aliasPostings = try container.decode([[Int]].self, forKey: .aliasPostings).map(Self.ungap)
+        trigrams = try container.decode([String].self, forKey: .trigrams)
+        trigramPostings = try container.decode([[Int]].self, forKey: .trigramPostings).map(Self.ungap)
+
+        guard postings.count == vocabulary.count, aliasPostings.count == vocabulary.count,
+              trigramPostings.count == trigrams.count,
+              titles.count == codes.count, categoryIds.count == codes.count,
+              categoryIds.allSatisfy({ categories.indices.contains($0) }) else {
+            throw DecodingError.dataCorrupted(DecodingError.Context(
+                codingPath: decoder.codingPath, debugDescription: "Search index columns do not line up"))
+        }
+
+        fields = zip(titles, codes).map { [Self.normalize($0), Self.normalize($1)] }
+        normalizedCategories = categories.map(Self.normalize)
+        var facets = Array(repeating: [Int](), count: categories.count)
+        for (position, categoryId) in categoryIds.enumerated() {
+            facets[categoryId].append(position)
+        }
+        self.facets = facets
+    }
+
+    // MARK: - Text
+
+    private static let wordCharacters = CharacterSet.alphanumerics.union(CharacterSet(charactersIn: "_"))
+
+    /// Case-folded text without diacritics, as normalize() in the script
+    static func normalize(_ text: String) -> String {
+        let scalars = text.decomposedStringWithCompatibilityMapping.unicodeScalars
+            .filter { $0.properties.canonicalCombiningClass == .notReordered }
+        return String(String.UnicodeScalarView(scalars)).folding(options: .caseInsensitive, locale: nil)
+    }
+
+    static func tokenize(_ text: String) -> [String] {
+        normalize(text).components(separatedBy: wordCharacters.inverted).filter { !$0.isEmpty }
+    }
+
+    /// Every three-character substring, by Unicode scalar as the script slices strings
+    static func trigrams(_ text: String) -> Set<String> {
+        let scalars = Array(text.unicodeScalars)
+        guard scalars.count >= 3 else { return [] }
+        return Set((0...(scalars.count - 3)).map { String(String.UnicodeScalarView(scalars[$0..<($0 + 3)])) })
+    }
+
+    private static func ungap(_ gaps: [Int]) -> [Int] {
+        var position = 0
+        return gaps.map { gap in
+            position += gap
+            return position
+        }
+    }
+
+    // MARK: - Query
+
+    /// Matching occupations: token matches first, then substring, then alias matches,
+    /// each group alphabetical by title
+    func search(_ query: String) -> [Match] {
+        let terms = Self.tokenize(query)
+        let tiers = [
+            intersect(terms.map { prefixMatches($0, in: postings) }),
+            substringMatches(query),
+            intersect(terms.map { prefixMatches($0, in: aliasPostings) }),
+        ]
+
+        var seen = Set<Int>()
+        var results: [Match] = []
+        for ids in tiers {
+            let fresh = ids.subtracting(seen).sorted { (fields[$0][0], codes[$0]) < (fields[$1][0], codes[$1]) }
+            results.append(contentsOf: fresh.map { Match(code: codes[$0], title: titles[$0], category: categories[categoryIds[$0]]) })
+            seen.formUnion(ids)
+        }
+        return results
+    }
+
+    /// Documents with a token starting with term, walking the vocabulary from its insertion point
+    private func prefixMatches(_ term: String, in postings: [[Int]]) -> Set<Int> {
+        var matches = Set<Int>()
+        var position = lowerBound(term, in: vocabulary)
+        while position < vocabulary.count && vocabulary[position].unicodeScalars.starts(with: term.unicodeScalars) {
+            matches.formUnion(postings[position])
+            position += 1
+        }
+        return matches
+    }
+
+    /// First position in a sorted list not ordered before term, comparing Unicode scalar values
+    private func lowerBound(_ term: String, in sorted: [String]) -> Int {
+        let key = Array(term.unicodeScalars)
+        var low = 0
+        var high = sorted.count
+        while low < high {
+            let middle = (low + high) / 2
+            if sorted[middle].unicodeScalars.lexicographicallyPrecedes(key, by: { $0.value < $1.value }) {
+                low = middle + 1
+            } else {
+                high = middle
+            }
+        }
+        return low
+    }
+
+    /// Documents whose title, category or code contains the query. Only the documents holding
+    /// every trigram of the query are checked; shorter queries match category names only
+    private func substringMatches(_ query: String) -> Set<Int> {
+        let needle = Self.normalize(query).trimmingCharacters(in: .whitespaces)
+        guard !needle.isEmpty else { return Set(codes.indices) }
+
+        var matches = Set<Int>()
+        for (categoryId, category) in normalizedCategories.enumerated() where category.contains(needle) {
+            matches.formUnion(facets[categoryId])
+        }
+
+        let grams = Self.trigrams(needle)
+        guard !grams.isEmpty else { return matches }
+        let candidates = intersect(grams.map { gram -> Set<Int> in
+            let position = lowerBound(gram, in: trigrams)
+            guard position < trigrams.count, trigrams[position].unicodeScalars.elementsEqual(gram.unicodeScalars) else { return [] }
+            return Set(trigramPostings[position])
+        })
+        matches.formUnion(candidates.filter { position in fields[position].contains { $0.contains(needle) } })
+        return matches
+    }
+
+    private func intersect(_ sets: [Set<Int>]) -> Set<Int> {
+        let ordered = sets.sorted { $0.count < $1.count }
+        guard var result = ordered.first else { return [] }
+        for other in ordered.dropFirst() {
+            result.formIntersection(other)
+        }
+        return result
+    }
+}
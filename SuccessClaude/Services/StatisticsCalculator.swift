@@ -174,11 +174,16 @@ class StatisticsCalculator {
         print("✅ Occupation data found: \(occupationData.title)")
 
         let income = profile.annualIncome
-        let percentile = calculatePercentile(
-            income: income,
-            median: occupationData.nationalMedian,
-            mean: occupationData.nationalMean
-        )
+        let percentile: Double
+        if let table = dataLoader.getOccupationQuantiles(for: occupationData.socCode, countryCode: profile.countryCode) {
+            percentile = calculatePercentile(income: income, quantiles: table.quantiles, values: table.values)
+        } else {
+            percentile = calculatePercentile(
+                income: income,
+                median: occupationData.nationalMedian,
+                mean: occupationData.nationalMean
+            )
+        }
         let percentageDiff = ((income - occupationData.nationalMedian) / occupationData.nationalMedian) * 100
 
         return ComparisonResult(
@@ -227,11 +232,21 @@ class StatisticsCalculator {
         let finalStats = regionSpecificStats ?? stats
 
         let income = profile.annualIncome
-        let percentile = calculatePercentile(
-            income: income,
-            median: finalStats.median,
-            mean: finalStats.mean
-        )
+        let percentile: Double
+        if regionSpecificStats != nil,
+           let table = dataLoader.getOccupationQuantiles(
+               for: occupationData.socCode,
+               regionCode: profile.region.code,
+               countryCode: profile.countryCode
+           ) {
+            percentile = calculatePercentile(income: income, quantiles: table.quantiles, values: table.values)
+        } else {
+            percentile = calculatePercentile(
+                income: income,
+                median: finalStats.median,
+                mean: finalStats.mean
+            )
+        }
         let percentageDiff = ((income - finalStats.median) / finalStats.median) * 100
 
         // Estimate sample size (rough approximation)
@@ -288,6 +303,44 @@ class StatisticsCalculator {
         }
     }
 
+    /// Percentile from a build-time quantile table (see scripts/percentile_tables.py).
+    /// Binary search for the bracket, then linear interpolation; the top tail above the
+    /// last point follows a Pareto curve fitted to the last two points.
+    func calculatePercentile(income: Double, quantiles: [Double], values: [Double]) -> Double {
+        guard !values.isEmpty, values.count == quantiles.count else { return 0 }
+
+        if income <= 0 {
+            return 0
+        }
+
+        if income <= values[0] {
+            return values[0] > 0 ? quantiles[0] * income / values[0] : quantiles[0]
+        }
+
+        let last = values.count - 1
+        if income >= values[last] {
+            guard last > 0, values[last] > values[last - 1] else { return quantiles[last] }
+            let alpha = log((100 - quantiles[last - 1]) / (100 - quantiles[last])) / log(values[last] / values[last - 1])
+            return min(99.5, 100 - (100 - quantiles[last]) * pow(income / values[last], -alpha))
+        }
+
+        // values[low] <= income < values[high]
+        var low = 0
+        var high = last
+        while high - low > 1 {
+            let mid = (low + high) / 2
+            if values[mid] <= income {
+                low = mid
+            } else {
+                high = mid
+            }
+        }
+
+        let span = values[high] - values[low]
+        guard span > 0 else { return quantiles[low] }
+        return quantiles[low] + (income - values[low]) / span * (quantiles[high] - quantiles[low])
+    }
+
     // MARK: - Statistical Helper Methods
 
     func calculateMean(values: [Double]) -> Double {
@@ -376,13 +429,16 @@ class StatisticsCalculator {
         let peakGroup = ageGroups.max { $0.median < $1.median }
         let peakAge = peakGroup?.ageRange ?? "45-54"
         let peakIncome = peakGroup?.median ?? occupationData.nationalMedian
+        let growth = dataLoader.getWageGrowth(for: profile.occupation.socCode, countryCode: profile.countryCode)
 
         return CareerForecast(
             currentAge: profile.age,
             userIncome: profile.annualIncome,
             ageGroups: ageGroups,
             peakAge: peakAge,
-            peakIncome: peakIncome
+            peakIncome: peakIncome,
+            medianGrowth: growth?.rate,
+            growthYears: growth.map { $0.firstYear...$0.lastYear }
         )
     }
 
@@ -418,15 +474,17 @@ class StatisticsCalculator {
             throw StatisticsError.dataNotAvailable("Occupation data not available")
         }
 
-        // Get all states with data for this occupation
+        // Get all states with data for this occupation, by median descending
         var stateIncomes: [(code: String, median: Double)] = []
-        for (stateCode, stats) in occupationData.byState {
-            stateIncomes.append((code: stateCode, median: stats.median))
+        if let index = dataLoader.getStateRankingIndex(for: occupationData.socCode, countryCode: profile.countryCode) {
+            stateIncomes = zip(index.codes, index.medians).map { (code: $0, median: $1) }
+        } else {
+            for (stateCode, stats) in occupationData.byState {
+                stateIncomes.append((code: stateCode, median: stats.median))
+            }
+            stateIncomes.sort { $0.median > $1.median }
         }
 
-        // Sort by median descending
-        stateIncomes.sort { $0.median > $1.median }
-
         // Get top 5
         let topStates = stateIncomes.prefix(5).enumerated().map { index, item in
             let stateName = USState.fromCode(item.code)?.fullName ?? item.code
@@ -454,6 +512,17 @@ class StatisticsCalculator {
             throw StatisticsError.dataNotAvailable("Occupation data not available")
         }
 
+        if let index = dataLoader.getSimilarOccupationsIndex(for: currentOccupation.socCode, countryCode: profile.countryCode) {
+            return index.prefix(5).map { entry in
+                SimilarOccupation(
+                    title: entry.title,
+                    socCode: entry.socCode,
+                    median: entry.median,
+                    percentageDifference: entry.percentageDifference
+                )
+            }
+        }
+
         // Get all occupations from same category
         let allOccupations = dataLoader.getAllOccupations(countryCode: profile.countryCode)
         let sameCategory = allOccupations.filter {
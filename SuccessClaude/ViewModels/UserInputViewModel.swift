@@ -91,6 +91,18 @@ class UserInputViewModel: ObservableObject {
         return regions
     }
 
+    /// Ranked index matches for the picker, or nil when the country has no search index
+    func searchOccupations(_ query: String) -> [OccupationCategory]? {
+        dataLoader.searchOccupations(query, countryCode: userProfile.countryCode)?.map { match in
+            OccupationCategory(
+                socCode: match.code,
+                title: match.title,
+                category: match.category,
+                countryCode: userProfile.countryCode
+            )
+        }
+    }
+
     var availableOccupations: [OccupationCategory] {
         print("🔍 availableOccupations called for country: \(userProfile.countryCode)")
         let rawOccupations = dataLoader.getAllOccupations(countryCode: userProfile.countryCode)
@@ -16,18 +16,22 @@ struct OccupationPickerView: View {
     @State private var expandedCategories: Set<String> = []
 
     var body: some View {
+        // Computed once per render; the search runs through the index when the country has one
+        let sections = self.sections
+
         NavigationStack {
             List {
-                if filteredOccupations.isEmpty {
+                if sections.isEmpty {
                     Section {
                         Text("No occupations found")
                             .foregroundColor(.textSecondary)
                     }
                 } else {
-                    ForEach(sortedCategories, id: \.self) { category in
+                    ForEach(sections, id: \.category) { section in
+                        let category = section.category
                         Section {
                             if expandedCategories.contains(category) {
-                                ForEach(occupationsForCategory(category), id: \.socCode) { occupation in
+                                ForEach(section.occupations, id: \.socCode) { occupation in
                                     Button(action: {
                                         selectedOccupation = occupation
                                         viewModel.updateOccupation(occupation)
@@ -89,7 +93,7 @@ struct OccupationPickerView: View {
             .onChange(of: searchText) { newValue in
                 // Auto-expand categories when searching
                 if !newValue.isEmpty {
-                    expandedCategories = Set(sortedCategories)
+                    expandedCategories = Set(self.sections.map { $0.category })
                 } else {
                     // Clear expanded categories when search is cleared
                     expandedCategories.removeAll()
@@ -100,27 +104,40 @@ struct OccupationPickerView: View {
 
     // MARK: - Computed Properties
 
-    private var filteredOccupations: [OccupationCategory] {
+    private struct CategorySection {
+        let category: String
+        let occupations: [OccupationCategory]
+    }
+
+    private var sections: [CategorySection] {
         if searchText.isEmpty {
-            return viewModel.availableOccupations
-        } else {
-            return viewModel.availableOccupations.filter {
-                $0.title.localizedCaseInsensitiveContains(searchText) ||
-                $0.category.localizedCaseInsensitiveContains(searchText) ||
-                $0.socCode.localizedCaseInsensitiveContains(searchText)
+            return alphabeticalSections(viewModel.availableOccupations)
+        }
+
+        if let matches = viewModel.searchOccupations(searchText) {
+            // Keep the index's ranking: sections in order of their best match, rows in result order
+            var categories: [String] = []
+            var rows: [String: [OccupationCategory]] = [:]
+            for occupation in matches {
+                if rows[occupation.category] == nil {
+                    categories.append(occupation.category)
+                }
+                rows[occupation.category, default: []].append(occupation)
             }
+            return categories.map { CategorySection(category: $0, occupations: rows[$0] ?? []) }
         }
-    }
 
-    private var sortedCategories: [String] {
-        let categories = Set(filteredOccupations.map { $0.category })
-        return categories.sorted()
+        return alphabeticalSections(viewModel.availableOccupations.filter {
+            $0.title.localizedCaseInsensitiveContains(searchText) ||
+            $0.category.localizedCaseInsensitiveContains(searchText) ||
+            $0.socCode.localizedCaseInsensitiveContains(searchText)
+        })
     }
 
-    private func occupationsForCategory(_ category: String) -> [OccupationCategory] {
-        filteredOccupations
-            .filter { $0.category == category }
-            .sorted { $0.title < $1.title }
+    private func alphabeticalSections(_ occupations: [OccupationCategory]) -> [CategorySection] {
+        Dictionary(grouping: occupations) { $0.category }
+            .map { CategorySection(category: $0.key, occupations: $0.value.sorted { $0.title < $1.title }) }
+            .sorted { $0.category < $1.category }
     }
 }
 
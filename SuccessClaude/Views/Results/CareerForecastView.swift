@@ -51,6 +51,20 @@ struct CareerForecastView: View {
                     .fill(Color.yellow.opacity(0.1))
             )
 
+            // Occupation-wide pay trend from past OEWS releases
+            if let growth = careerForecast.medianGrowth, let years = careerForecast.growthYears {
+                HStack {
+                    Image(systemName: growth >= 0 ? "arrow.up.right" : "arrow.down.right")
+                        .foregroundColor(growth >= 0 ? .green : .red)
+
+                    Text("Median pay in this occupation changed \(String(format: "%+.1f", growth * 100))% a year (\(String(years.lowerBound))–\(String(years.upperBound)))")
+                        .font(.caption)
+                        .foregroundColor(.textSecondary)
+
+                    Spacer()
+                }
+            }
+
             // Chart
             Chart {
                 ForEach(Array(careerForecast.ageGroups.enumerated()), id: \.offset) { index, ageGroup in
@@ -231,7 +245,9 @@ struct CareerForecastView: View {
                 AgeGroupIncome(ageRange: "55-64", median: 145000, mean: 165000)
             ],
             peakAge: "45-54",
-            peakIncome: 150000
+            peakIncome: 150000,
+            medianGrowth: 0.041,
+            growthYears: 2015...2024
         )
     )
     .padding()
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Vectorized after-tax engine for build-time precomputation
+
+A port of TaxCalculator.swift that taxes whole arrays of incomes at once.
+Every tax in the app is one of three kinds, so the rules are tables here:
+
+    Brackets      marginal schedule (the US federal table keeps the app's own
+                  per-bracket base amounts rather than recomputing them)
+    BandRates     one flat rate on the whole taxable amount, picked by the
+                  band gross income falls in, per region (US state tax,
+                  Canadian provincial tax)
+    formulas      the German income tax zones and solidarity surcharge
+
+Each country combines its components for an array of incomes, region codes
+and filing statuses (married or not); countries without rules, and US rows
+with an unknown state, are untaxed, as in the app.
+
+As a pipeline step this adds after-tax values to the occupation files for a
+single filer, the app's default:
+
+    by_state.<region>.after_tax_median / after_tax_mean
+    after_tax_median / after_tax_mean   (only where tax does not depend on region)
+
+Tax is monotonic in income, so the after-tax median is the median's after-tax
+value; the after-tax mean is the mean's after-tax value, an approximation.
+
+Usage:
+    python after_tax.py            # annotate every non-US country (us is annotated by fetch_bls_data.py)
+    python after_tax.py ca de      # selected countries
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import json_layout
+from percentile_tables import DATA_DIR, occupations_path
+
+TAX_YEAR = 2024
+
+# Countries whose taxes differ by region; their national figures are not annotated
+REGIONAL_COUNTRIES = {"us", "ca"}
+
+class Brackets:
+    """Marginal schedule: tax = bases[k] + (amount - thresholds[k]) * rates[k] for thresholds[k] < amount <= thresholds[k + 1]"""
+
+    def __init__(self, thresholds, rates, bases=None):
+        self.thresholds = np.array(thresholds, dtype=float)
+        self.rates = np.array(rates, dtype=float)
+        if bases is None:
+            bases = np.concatenate([[0.0], np.cumsum(np.diff(self.thresholds) * self.rates[:-1])])
+        self.bases = np.array(bases, dtype=float)
+
+    def __repr__(self):
+        return f"Brackets({self.thresholds.tolist()}, {self.rates.tolist()}, {self.bases.tolist()})"
+
+    def tax(self, amount):
+        bracket = np.searchsorted(self.thresholds, amount, side='left') - 1
+        inside = bracket >= 0
+        bracket = np.maximum(bracket, 0)
+        return np.where(inside, self.bases[bracket] + (amount - self.thresholds[bracket]) * self.rates[bracket], 0.0)
+
+class BandRates:
+    """Per-region flat rates: income <= bounds[i] gets rates[i], above every bound the last rate"""
+
+    def __init__(self, table, default_rate, uppercase=False):
+        self.regions = pd.Index(list(table), dtype=object)
+        self.uppercase = uppercase
+        width = max(len(rates) for _, rates in table.values())
+        # The last row is the default for unknown regions
+        self.bounds = np.full((len(table) + 1, width - 1), np.inf)
+        self.rates = np.full((len(table) + 1, width), float(default_rate))
+        for row, (bounds, rates) in enumerate(table.values()):
+            self.bounds[row, :len(bounds)] = bounds
+            self.rates[row, :len(rates)] = rates
+            self.rates[row, len(rates):] = rates[-1]
+
+    def __repr__(self):
+        return (f"BandRates({self.regions.tolist()}, {self.bounds.tolist()}, {self.rates.tolist()}, "
+                f"uppercase={self.uppercase})")
+
+    def rows(self, regions):
+        """Table row for each element of a region Categorical; unknown and missing codes get the default row"""
+        categories = regions.categories.str.upper() if self.uppercase else regions.categories
+        rows = self.regions.get_indexer(categories)
+        # Missing codes are -1, which picks the appended default
+        return np.append(np.where(rows < 0, len(self.regions), rows), len(self.regions))[regions.codes]
+
+    def rate(self, income, rows):
+        band = (income[:, None] > self.bounds[rows]).sum(axis=1)
+        return self.rates[rows, band]
+
+# ============================================================================
+# United States
+# ============================================================================
+
+US_FEDERAL = {
+    # Married filing jointly
+    True: Brackets([0, 22_000, 89_075, 190_750, 364_200, 462_500, 693_750],
+                   [0.10, 0.12, 0.22, 0.24, 0.32, 0.35, 0.37],
+                   [0, 2_200, 10_249, 32_617, 74_208, 105_664, 186_601]),
+    False: Brackets([0, 11_000, 44_725, 95_375, 182_100, 231_250, 578_125],
+                    [0.10, 0.12, 0.22, 0.24, 0.32, 0.35, 0.37],
+                    [0, 1_100, 5_147, 16_290, 37_104, 52_832, 174_238]),
+}
+US_STANDARD_DEDUCTION = {True: 29_200, False: 14_600}
+
+# Simplified effective rates: (income bounds, rates)
+US_STATE_RATES = BandRates({
+    **{state: ([], [0.0]) for state in ["AK", "FL", "NV", "SD", "TN", "TX", "WA", "WY", "NH"]},
+    "CO": ([], [0.044]), "IL": ([], [0.0495]), "IN": ([], [0.0315]), "KY": ([], [0.045]),
+    "MA": ([], [0.05]), "MI": ([], [0.0425]), "NC": ([], [0.0475]), "PA": ([], [0.0307]),
+    "UT": ([], [0.0485]), "AL": ([], [0.04]), "LA": ([], [0.04]), "MS": ([], [0.05]),
+    "MO": ([], [0.048]), "ND": ([], [0.029]), "OH": ([], [0.038]), "OK": ([], [0.0475]),
+    "AZ": ([100_000], [0.035, 0.045]), "AR": ([100_000], [0.04, 0.055]),
+    "CA": ([75_000, 100_000, 150_000], [0.04, 0.065, 0.08, 0.093]),
+    "CT": ([100_000], [0.05, 0.065]), "DE": ([100_000], [0.055, 0.066]),
+    "GA": ([100_000], [0.05, 0.0575]), "HI": ([100_000], [0.07, 0.09]),
+    "ID": ([100_000], [0.05, 0.058]), "IA": ([100_000], [0.048, 0.06]),
+    "KS": ([100_000], [0.046, 0.057]), "ME": ([100_000], [0.06, 0.075]),
+    "MD": ([100_000], [0.0475, 0.0575]), "MN": ([100_000], [0.07, 0.0985]),
+    "MT": ([100_000], [0.055, 0.0675]), "NE": ([100_000], [0.05, 0.0684]),
+    "NJ": ([100_000], [0.065, 0.0897]), "NM": ([100_000], [0.045, 0.059]),
+    "NY": ([100_000, 150_000], [0.055, 0.065, 0.0882]),
+    "OR": ([100_000], [0.075, 0.099]), "RI": ([100_000], [0.0475, 0.0599]),
+    "SC": ([100_000], [0.055, 0.065]), "VT": ([100_000], [0.065, 0.0875]),
+    "VA": ([100_000], [0.05, 0.0575]), "WV": ([100_000], [0.055, 0.065]),
+    "WI": ([100_000], [0.06, 0.0765]), "DC": ([100_000], [0.07, 0.0895]),
+}, default_rate=0.0)
+
+US_SOCIAL_SECURITY = Brackets([0, 168_600], [0.062, 0.0])
+# Medicare plus the additional 0.9% above $200,000
+US_MEDICARE = Brackets([0, 200_000], [0.0145, 0.0145 + 0.009])
+
+def us_taxes(income, regions, married):
+    taxable = np.maximum(0, income - np.where(married, US_STANDARD_DEDUCTION[True], US_STANDARD_DEDUCTION[False]))
+    federal = np.where(married, US_FEDERAL[True].tax(taxable), US_FEDERAL[False].tax(taxable))
+
+    # The app computes nothing for a region that is not a US state
+    rows = US_STATE_RATES.rows(regions)
+    known = rows < len(US_STATE_RATES.regions)
+    components = {
+        "federal": federal,
+        "state": income * US_STATE_RATES.rate(income, rows),
+        "fica": US_SOCIAL_SECURITY.tax(income) + US_MEDICARE.tax(income),
+    }
+    return {name: np.where(known, amount, 0.0) for name, amount in components.items()}
+
+# ============================================================================
+# United Kingdom, Canada, Australia, New Zealand
+# ============================================================================
+
+UK_INCOME_TAX = Brackets([12_570, 50_270, 125_140], [0.20, 0.40, 0.45])
+UK_NATIONAL_INSURANCE = Brackets([12_570, 50_270], [0.12, 0.02])
+
+def uk_taxes(income, regions, married):
+    return {"income_tax": UK_INCOME_TAX.tax(income), "national_insurance": UK_NATIONAL_INSURANCE.tax(income)}
+
+CA_BASIC_PERSONAL_AMOUNT = 15_000
+CA_FEDERAL = Brackets([0, 55_867, 111_733, 173_205, 246_752], [0.15, 0.205, 0.26, 0.29, 0.33])
+
+# Simplified rates applied to all income above the provincial basic amount
+CA_PROVINCIAL_RATES = BandRates({
+    "AB": ([142_292, 170_751, 227_668, 341_502], [0.10, 0.12, 0.13, 0.14, 0.15]),
+    "BC": ([47_937, 95_875, 110_076, 133_664, 181_232, 252_752], [0.0506, 0.077, 0.105, 0.1229, 0.147, 0.168, 0.205]),
+    "MB": ([47_000, 100_000], [0.108, 0.1275, 0.174]),
+    "NB": ([49_958, 99_916, 185_064], [0.094, 0.14, 0.16, 0.195]),
+    "NL": ([43_198, 86_395, 154_244, 215_943], [0.087, 0.145, 0.158, 0.178, 0.208]),
+    "NS": ([29_590, 59_180, 93_000, 150_000], [0.0879, 0.1495, 0.1667, 0.175, 0.21]),
+    "NT": ([50_597, 101_198, 164_525], [0.059, 0.086, 0.122, 0.1405]),
+    "NU": ([53_268, 106_537, 173_205], [0.04, 0.07, 0.09, 0.115]),
+    "ON": ([51_446, 102_894, 150_000, 220_000], [0.0505, 0.0915, 0.1116, 0.1216, 0.1316]),
+    "PE": ([32_656, 64_313, 105_000], [0.098, 0.138, 0.167, 0.187]),
+    "QC": ([51_780, 103_545, 126_000], [0.14, 0.19, 0.24, 0.2575]),
+    "SK": ([52_057, 148_734], [0.105, 0.125, 0.145]),
+    "YT": ([55_867, 111_733, 173_205, 500_000], [0.064, 0.09, 0.109, 0.128, 0.15]),
+}, default_rate=0.10, uppercase=True)
+CA_PROVINCIAL_BASIC_AMOUNTS = {
+    "AB": 21_885, "BC": 12_580, "MB": 15_000, "NB": 13_044, "NL": 10_382, "NS": 8_744, "NT": 16_593,
+    "NU": 18_767, "ON": 11_865, "PE": 13_500, "QC": 17_183, "SK": 17_661, "YT": 15_000,
+}
+CA_DEFAULT_BASIC_AMOUNT = 15_000
+# By CA_PROVINCIAL_RATES row, the default last
+CA_BASIC_AMOUNTS = np.array([CA_PROVINCIAL_BASIC_AMOUNTS[code] for code in CA_PROVINCIAL_RATES.regions]
+                            + [CA_DEFAULT_BASIC_AMOUNT], dtype=float)
+CA_CPP = Brackets([3_500, 68_500], [0.0595, 0.0])
+CA_EI = Brackets([0, 63_200], [0.0166, 0.0])
+
+def ca_taxes(income, regions, married):
+    rows = CA_PROVINCIAL_RATES.rows(regions)
+    return {
+        "federal": CA_FEDERAL.tax(np.maximum(0, income - CA_BASIC_PERSONAL_AMOUNT)),
+        "provincial": np.maximum(0, income - CA_BASIC_AMOUNTS[rows]) * CA_PROVINCIAL_RATES.rate(income, rows),
+        "cpp": CA_CPP.tax(income),
+        "ei": CA_EI.tax(income),
+    }
+
+AU_INCOME_TAX = Brackets([18_200, 45_000, 135_000, 190_000], [0.16, 0.30, 0.37, 0.45])
+AU_MEDICARE_LEVY = Brackets([0], [0.02])
+
+def au_taxes(income, regions, married):
+    return {"federal": AU_INCOME_TAX.tax(income), "medicare_levy": AU_MEDICARE_LEVY.tax(income)}
+
+NZ_INCOME_TAX = Brackets([0, 14_000, 48_000, 70_000, 180_000], [0.105, 0.175, 0.30, 0.33, 0.39])
+NZ_ACC_LEVY = Brackets([0, 142_283], [0.0139, 0.0])
+
+def nz_taxes(income, regions, married):
+    return {"income_tax": NZ_INCOME_TAX.tax(income), "acc_levy": NZ_ACC_LEVY.tax(income)}
+
+# ============================================================================
+# Germany, France, Spain
+# ============================================================================
+
+def german_income_tax(income):
+    """Einkommensteuer 2024 zone formulas"""
+    y = (income - 11_604) / 10_000
+    z = (income - 17_005) / 10_000
+    return np.select(
+        [income <= 11_604, income <= 17_005, income <= 66_760, income <= 277_825],
+        [0.0, (979.18 * y + 1400) * y, (192.59 * z + 2397) * z + 966.53, 0.42 * income - 10_602.13],
+        0.45 * income - 18_936.88,
+    )
+
+def solidarity_surcharge(income_tax, married):
+    """Solidaritätszuschlag: phased in at 11.9% above the threshold, then 5.5% of the income tax"""
+    threshold = np.where(married, 36_260.0, 18_130.0)
+    phase_out_end = np.where(married, 67_902.0, 33_951.0)
+    return np.select([income_tax <= threshold, income_tax <= phase_out_end],
+                     [0.0, (income_tax - threshold) * 0.119], income_tax * 0.055)
+
+# Pension and unemployment up to €90,600; health and care up to €62,100
+DE_SOCIAL_INSURANCE = Brackets([0, 62_100, 90_600], [0.093 + 0.013 + 0.0815 + 0.017, 0.093 + 0.013, 0.0])
+
+def de_taxes(income, regions, married):
+    # Ehegattensplitting: tax on half the income, doubled
+    income_tax = np.where(married, german_income_tax(income / 2) * 2, german_income_tax(income))
+    return {
+        "income_tax": income_tax,
+        "solidarity_surcharge": solidarity_surcharge(income_tax, married),
+        "social_insurance": DE_SOCIAL_INSURANCE.tax(income),
+    }
+
+FR_INCOME_TAX = Brackets([11_294, 28_797, 82_341, 177_106], [0.11, 0.30, 0.41, 0.45])
+# CSG (9.2%) and CRDS (0.5%) on 98.25% of gross
+FR_SOCIAL_CONTRIBUTIONS = Brackets([0], [0.9825 * (0.092 + 0.005)])
+
+def fr_taxes(income, regions, married):
+    # 10% professional expenses deduction, capped; quotient familial of 2 parts when married
+    taxable = np.maximum(0, income - np.minimum(income * 0.10, 13_522))
+    parts = np.where(married, 2.0, 1.0)
+    return {
+        "income_tax": FR_INCOME_TAX.tax(taxable / parts) * parts,
+        "social_contributions": FR_SOCIAL_CONTRIBUTIONS.tax(income),
+    }
+
+# Combined state and average regional IRPF rates
+ES_INCOME_TAX = Brackets([0, 12_450, 20_200, 35_200, 60_000, 300_000], [0.19, 0.24, 0.30, 0.37, 0.45, 0.47])
+ES_SOCIAL_SECURITY = Brackets([0, 56_646], [0.0635, 0.0])
+
+def es_taxes(income, regions, married):
+    # Joint filing adds €3,400 to the personal allowance
+    allowance = np.where(married, 5_550.0 + 3_400.0, 5_550.0)
+    return {
+        "income_tax": ES_INCOME_TAX.tax(np.maximum(0, income - allowance)),
+        "social_security": ES_SOCIAL_SECURITY.tax(income),
+    }
+
+COUNTRY_TAXES = {
+    "us": us_taxes, "uk": uk_taxes, "ca": ca_taxes, "au": au_taxes,
+    "nz": nz_taxes, "de": de_taxes, "fr": fr_taxes, "es": es_taxes,
+}
+
+# ============================================================================
+# Engine
+# ============================================================================
+
+def region_codes(regions, shape):
+    """Region codes as a Categorical, so the tables look up each distinct code once"""
+    if isinstance(regions, pd.Categorical):
+        return regions
+    regions = np.broadcast_to(np.asarray("" if regions is None else regions, dtype=object), shape)
+    return pd.Categorical(regions.ravel())
+
+def taxes(country_code, income, regions=None, married=False):
+    """{component: tax array} for arrays of gross income, region codes and married flags
+
+    regions may be a flat pd.Categorical from region_codes, to share the lookup between calls.
+    """
+    income = np.asarray(income, dtype=float)
+    shape = income.shape
+    regions = region_codes(regions, shape)
+    married = np.broadcast_to(np.asarray(married, dtype=bool), shape).ravel()
+
+    calculate = COUNTRY_TAXES.get(country_code)
+    if calculate is None:
+        return {}
+    components = calculate(income.ravel(), regions, married)
+    return {name: amount.reshape(shape) for name, amount in components.items()}
+
+def after_tax(country_code, income, regions=None, married=False):
+    """After-tax income for arrays of gross income, region codes and married flags"""
+    income = np.asarray(income, dtype=float)
+    components = taxes(country_code, income, regions, married)
+    return income - sum(components.values(), np.zeros(income.shape))
+
+# ============================================================================
+# Occupation files
+# ============================================================================
+
+def annotate_occupations(occupations, country_code):
+    """Add single-filer after-tax medians and means to occupation dicts in the output schema, in place"""
+    for field in ("median", "mean"):
+        # (dict to annotate, region code, gross value) for every value present
+        entries = []
+        for occ in occupations:
+            if country_code not in REGIONAL_COUNTRIES and occ.get(f"national_{field}") is not None:
+                entries.append((occ, "", occ[f"national_{field}"]))
+            for region, stats in (occ.get("by_state") or {}).items():
+                if stats.get(field) is not None:
+                    entries.append((stats, region, stats[field]))
+        if not entries:
+            continue
+
+        targets, regions, gross = zip(*entries)
+        net = after_tax(country_code, np.array(gross, dtype=float), np.array(regions, dtype=object))
+        for target, value in zip(targets, net.tolist()):
+            target[f"after_tax_{field}"] = int(round(value))
+    return occupations
+
+def after_tax_metadata(country_code):
+    return {
+        "tax_year": TAX_YEAR,
+        "filing_status": "single",
+        "regional": country_code in REGIONAL_COUNTRIES,
+        "method": "TaxCalculator rules applied to the median and mean",
+    }
+
+def annotate_country(country_code, data_dir=DATA_DIR):
+    """Annotate one country's bundled occupation file in place; returns the number of entries annotated"""
+    path = occupations_path(country_code, data_dir)
+    with open(path, 'r', encoding='utf-8') as f:
+        original = f.read()
+    data = json.loads(original)
+    layout = json_layout.detect(original, data)
+    if layout is None:
+        print("⚠ Unrecognized layout, rewriting with indent=2")
+        layout = {**json_layout.DEFAULT_LAYOUT, "ensure_ascii": original.isascii()}
+
+    annotate_occupations(data["occupations"], country_code)
+    data.setdefault("metadata", {})["after_tax"] = after_tax_metadata(country_code)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json_layout.dumps(data, layout))
+
+    return sum(("after_tax_median" in occ) + sum("after_tax_median" in stats for stats in (occ.get("by_state") or {}).values())
+               for occ in data["occupations"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Add after-tax medians and means to the occupation files")
+    parser.add_argument("countries", nargs="*",
+                        help="country codes (default: every country except us, annotated by fetch_bls_data.py)")
+    args = parser.parse_args()
+
+    countries = args.countries or sorted(
+        entry for entry in COUNTRY_TAXES
+        if entry != "us" and os.path.exists(occupations_path(entry))
+    )
+
+    for country_code in countries:
+        if country_code not in COUNTRY_TAXES:
+            print(f"⚠ {country_code}: no tax rules")
+            continue
+        if not os.path.exists(occupations_path(country_code)):
+            print(f"⚠ {country_code}: no occupation file at {occupations_path(country_code)}")
+            continue
+
+        count = annotate_country(country_code)
+        print(f"✓ {country_code}: after-tax median and mean on {count:,} entries → {occupations_path(country_code)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Vectorized batch scoring over the generated datasets
+
+Scores whole cohorts (survey exports, HR datasets) with the same logic the
+app runs for one profile: calculatePercentile, the region, national,
+occupation and peer comparisons in StatisticsCalculator.swift, and the
+SuccessScore tier. A country's occupation, region, national and quantile
+files are loaded once into NumPy arrays indexed by occupation and region
+position, so each call is a handful of array lookups and np.select over all
+rows instead of a per-row port.
+
+Input rows:
+
+    income            annual personal income (UserProfile.annualIncome)
+    occupation        occupation code as in the country's occupation file
+    region            region code (state, province, ...)
+    age               whole years
+    gender            Male / Female (optional)
+    marital_status    Single / Married / Divorced / Widowed (optional)
+    household_income  (optional) used for married rows, as in the app
+    children          (optional) for the Australian equivalence scale
+
+Each scored row gets a percentile and percentage difference from the median
+for the region, national, occupation and peer comparisons, their mean as
+success_score, its tier, and the median for the row's gender in its region.
+After-tax columns come from after_tax.py: after_tax_income and
+effective_tax_rate as the app's tax summary shows them, and
+peer_after_tax_difference comparing income with the peer median, both taxed
+as a single filer in the row's region.
+Rows whose occupation or region is not in the data (where the app would show
+no results) get NaN scores and no tier.
+
+Usage:
+    python batch_scoring.py cohort.csv scored.csv --country ca
+    python batch_scoring.py cohort.parquet scored.parquet --country uk --chunk-size 500000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import after_tax
+import compact_format
+import instrumentation
+from percentile_tables import DATA_DIR, occupations_path, tables_path
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+CHUNK_SIZE = 1_000_000
+
+MARITAL_STATUSES = ["Single", "Married", "Divorced", "Widowed"]
+GENDERS = ["Male", "Female"]
+
+# (first age, last age, label) as in DataLoader.getAgeRangeKey; ages outside every range get the last label
+AGE_RANGES = {
+    "uk": [(18, 21, "18-21"), (22, 29, "22-29"), (30, 39, "30-39"), (40, 49, "40-49"), (50, 59, "50-59"),
+           (None, None, "60+")],
+    "ca": [(18, 24, "18-24"), (25, 34, "25-34"), (35, 44, "35-44"), (45, 54, "45-54"), (55, 64, "55-64"),
+           (None, None, "65+")],
+    "us": [(16, 19, "16-19"), (20, 24, "20-24"), (25, 34, "25-34"), (35, 44, "35-44"), (45, 54, "45-54"),
+           (55, 64, "55-64"), (None, None, "65+")],
+}
+AGE_RANGES["au"] = AGE_RANGES["fr"] = AGE_RANGES["es"] = AGE_RANGES["ca"]
+MAX_AGE = 130
+
+# SuccessScore.tier: lower bound of each tier, highest first
+TIERS = [(90, "Elite"), (75, "Upper Middle"), (60, "Middle Class"), (40, "Lower Middle"),
+         (25, "Working Poor"), (0, "Low Income")]
+
+COMPARISONS = ["region", "national", "occupation", "peer"]
+
+def region_path(country_code, data_dir=DATA_DIR):
+    # Same file names DataLoader.loadRegionData uses
+    filename = "state_income_data" if country_code == "us" else "regions"
+    return os.path.join(data_dir, country_code, f"{country_code}_{filename}.json")
+
+def national_path(country_code, data_dir=DATA_DIR):
+    return os.path.join(data_dir, country_code, f"{country_code}_national_statistics.json")
+
+def missing_files(country_code, data_dir=DATA_DIR):
+    """Files CountryData.load needs that are not on disk"""
+    paths = [occupations_path(country_code, data_dir), region_path(country_code, data_dir),
+             national_path(country_code, data_dir)]
+    return [path for path in paths if not os.path.exists(path)]
+
+# ============================================================================
+# Percentiles (StatisticsCalculator.calculatePercentile, over arrays)
+# ============================================================================
+
+def percentile_from_median_mean(income, median, mean):
+    """Piecewise approximation from median and mean; NaN where median is missing"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.select(
+            [income <= 0, income < median, income >= mean * 3, income >= mean * 2, income >= mean],
+            [0.0,
+             income / median * 50.0,
+             np.minimum(99.5, 95 + (income - mean * 3) / (mean * 10) * 4.5),
+             84 + (income - mean * 2) / mean * 11.0,
+             65 + (income - mean) / mean * 19.0],
+            # Between median and mean
+            50 + (income - median) / (mean - median) * 15.0,
+        )
+    return np.where(np.isnan(median), np.nan, result)
+
+def percentile_from_quantiles(income, quantiles, values):
+    """Interpolate each income in its row of a quantile table (rows × quantiles), Pareto tail above the last point"""
+    if len(quantiles) < 2:
+        return np.full(len(income), np.nan)
+    rows = np.arange(len(income))
+    first, previous, last = values[:, 0], values[:, -2], values[:, -1]
+
+    # The bracket values[low] <= income < values[low + 1] the app finds by binary search
+    low = np.clip((values <= income[:, None]).sum(axis=1) - 1, 0, len(quantiles) - 2)
+    low_value, high_value = values[rows, low], values[rows, low + 1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        span = high_value - low_value
+        inner = np.where(span > 0,
+                         quantiles[low] + (income - low_value) / span * (quantiles[low + 1] - quantiles[low]),
+                         quantiles[low])
+        below = np.where(first > 0, quantiles[0] * income / first, quantiles[0])
+
+        alpha = np.log((100 - quantiles[-2]) / (100 - quantiles[-1])) / np.log(last / previous)
+        tail = np.where(last > previous,
+                        np.minimum(99.5, 100 - (100 - quantiles[-1]) * (income / last) ** -alpha),
+                        quantiles[-1])
+
+    result = np.select([income <= 0, income <= first, income >= last], [0.0, below, tail], inner)
+    return np.where(np.isnan(first), np.nan, result)
+
+def percentage_difference(income, median):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (income - median) / median * 100
+
+def tiers(scores):
+    """SuccessScore tier names as a categorical; missing scores get no tier"""
+    names = [name for _, name in TIERS]
+    codes = np.select([scores >= bound for bound, _ in TIERS[:-1]], list(range(len(TIERS) - 1)), len(TIERS) - 1)
+    codes = np.where(np.isnan(scores), -1, codes)
+    return pd.Categorical.from_codes(codes, categories=names)
+
+# ============================================================================
+# Country data as arrays
+# ============================================================================
+
+def _load(path):
+    # Bundled files may be in the compact columnar format
+    return compact_format.load_document(path)
+
+def _positions(index, values):
+    """Positions of values in a pandas Index, -1 where absent"""
+    return index.get_indexer(pd.Index(values, dtype=object))
+
+def _take(array, *positions):
+    """array[positions...], NaN wherever any position is -1"""
+    missing = np.zeros(len(positions[0]), dtype=bool)
+    for position in positions:
+        missing |= position < 0
+    taken = array[tuple(np.where(position < 0, 0, position) for position in positions)]
+    if taken.ndim > 1:
+        missing = missing.reshape(-1, *([1] * (taken.ndim - 1)))
+    return np.where(missing, np.nan, taken)
+
+class CountryData:
+    """One country's datasets, indexed by occupation, region, age group and marital status position"""
+
+    def __init__(self, country_code, occupations, regions, national, tables=None):
+        self.country_code = country_code
+
+        # DataLoader takes the first entry for a code
+        occupations = list({occ["soc_code"]: occ for occ in reversed(occupations)}.values())[::-1]
+        regions = list({region["code"]: region for region in reversed(regions)}.values())[::-1]
+
+        self.occupations = pd.Index([occ["soc_code"] for occ in occupations], dtype=object)
+        self.regions = pd.Index([region["code"] for region in regions], dtype=object)
+        self.age_ranges = AGE_RANGES.get(country_code, AGE_RANGES["us"])
+        self.age_groups = pd.Index([label for _, _, label in self.age_ranges], dtype=object)
+
+        n_occ, n_reg, n_age = len(self.occupations), len(self.regions), len(self.age_groups)
+
+        self.occupation_median = np.array([occ["national_median"] for occ in occupations], dtype=float)
+        self.occupation_mean = np.array([occ["national_mean"] for occ in occupations], dtype=float)
+
+        self.state_median = np.full((n_occ, n_reg), np.nan)
+        self.state_mean = np.full((n_occ, n_reg), np.nan)
+        self.age_median = np.full((n_occ, n_age), np.nan)
+        self.age_mean = np.full((n_occ, n_age), np.nan)
+        for i, occ in enumerate(occupations):
+            for region, stats in occ.get("by_state", {}).items():
+                j = self.regions.get_indexer([region])[0]
+                if j >= 0:
+                    self.state_median[i, j], self.state_mean[i, j] = stats["median"], stats["mean"]
+            for label, stats in occ.get("age_distribution", {}).items():
+                j = self.age_groups.get_indexer([label])[0]
+                if j >= 0:
+                    self.age_median[i, j], self.age_mean[i, j] = stats["median"], stats["mean"]
+
+        self.region_median = np.array([region["overall"]["median"] for region in regions], dtype=float)
+        self.region_mean = np.array([region["overall"]["mean"] for region in regions], dtype=float)
+        self.marital_median = np.full((n_reg, len(MARITAL_STATUSES)), np.nan)
+        self.marital_mean = np.full((n_reg, len(MARITAL_STATUSES)), np.nan)
+        self.gender_median = np.full((n_reg, len(GENDERS)), np.nan)
+        for i, region in enumerate(regions):
+            for j, status in enumerate(MARITAL_STATUSES):
+                stats = (region.get("by_marital_status") or {}).get(status)
+                if stats:
+                    self.marital_median[i, j], self.marital_mean[i, j] = stats["median"], stats["mean"]
+            # Capitalized or lowercase keys, depending on the country's file
+            for j, gender in enumerate(GENDERS):
+                stats = region["by_gender"].get(gender) or region["by_gender"].get(gender.lower())
+                if stats:
+                    self.gender_median[i, j] = stats["median"]
+
+        overall = national["national"]["overall"]
+        self.national_median = float(overall["median_individual_income"])
+        if overall.get("mean_individual_income") is not None:
+            self.national_mean = float(overall["mean_individual_income"])
+        else:
+            household_median = overall["median_household_income"]
+            # Household and individual medians this close mean the file is already individual-level
+            is_individual = abs(household_median - self.national_median) / max(household_median, 1) < 0.1
+            self.national_mean = overall["mean_household_income"] / (1 if is_individual else 2.5)
+
+        self.quantiles = np.array((tables or {}).get("quantiles") or [50], dtype=float)
+        n_q = len(self.quantiles)
+        self.national_values = np.full((n_occ, n_q), np.nan)
+        self.state_values = np.full((n_occ, n_reg, n_q), np.nan)
+        for code, table in (tables or {}).get("occupations", {}).items():
+            i = self.occupations.get_indexer([code])[0]
+            if i < 0:
+                continue
+            self.national_values[i] = table["national"]
+            for region, values in table["by_state"].items():
+                j = self.regions.get_indexer([region])[0]
+                if j >= 0:
+                    self.state_values[i, j] = values
+
+        # Age → age group position, as a lookup table
+        self.age_lookup = np.full(MAX_AGE + 2, n_age - 1)
+        for position, (first, last, _) in enumerate(self.age_ranges):
+            if first is not None:
+                self.age_lookup[first:last + 1] = position
+
+    @classmethod
+    def load(cls, country_code, data_dir=DATA_DIR):
+        """Load a country's bundled files; quantile tables are optional, as in DataLoader"""
+        occupations = _load(occupations_path(country_code, data_dir))["occupations"]
+        regions = _load(region_path(country_code, data_dir))["regions"]
+        national = _load(national_path(country_code, data_dir))
+
+        tables = None
+        if os.path.exists(tables_path(country_code, data_dir)):
+            tables = _load(tables_path(country_code, data_dir))
+        return cls(country_code, occupations, regions, national, tables)
+
+    def age_positions(self, ages):
+        ages = np.nan_to_num(np.asarray(ages, dtype=float), nan=-1)
+        # Out-of-range ages land on the last entry, which is always the catch-all group
+        return self.age_lookup[np.clip(ages, -1, MAX_AGE + 1).astype(int)]
+
+# ============================================================================
+# Scoring
+# ============================================================================
+
+def _column(frame, name, default):
+    if name in frame.columns:
+        return frame[name]
+    return pd.Series(default, index=frame.index)
+
+def _married(frame):
+    return (_column(frame, "marital_status", "").fillna("") == "Married").to_numpy()
+
+def effective_income(frame):
+    """UserProfile.effectiveIncome: household income for married rows that have one"""
+    income = _column(frame, "income", np.nan).to_numpy(dtype=float)
+    household = _column(frame, "household_income", 0).fillna(0).to_numpy(dtype=float)
+    return np.where(_married(frame) & (household > 0), household, income)
+
+def comparison_income(frame, country_code):
+    """UserProfile.comparisonIncome: household income for married rows, OECD-equivalised in Australia"""
+    household = _column(frame, "household_income", 0).fillna(0).to_numpy(dtype=float)
+    children = _column(frame, "children", 0).fillna(0).to_numpy(dtype=float)
+
+    has_household = _married(frame) & (household > 0)
+    effective = effective_income(frame)
+    if country_code == "au":
+        return np.where(has_household, household / (1.5 + 0.3 * children), effective)
+    return effective
+
+def score(frame, data):
+    """Score a DataFrame of input rows; returns a frame of result columns on the same index"""
+    income = _column(frame, "income", np.nan).to_numpy(dtype=float)
+    household_income = comparison_income(frame, data.country_code)
+
+    occ = _positions(data.occupations, _column(frame, "occupation", "").fillna("").astype(str))
+    region_codes = _column(frame, "region", "").fillna("").astype(str)
+    region = _positions(data.regions, region_codes)
+    age = data.age_positions(_column(frame, "age", np.nan))
+    marital = _positions(pd.Index(MARITAL_STATUSES, dtype=object), _column(frame, "marital_status", "").fillna(""))
+    gender = _positions(pd.Index(GENDERS, dtype=object),
+                        _column(frame, "gender", "").fillna("").astype(str).str.capitalize())
+
+    results = {}
+
+    # Region: marital-status stats where the region has them, compared with household income
+    marital_median = _take(data.marital_median, region, marital)
+    has_marital = ~np.isnan(marital_median)
+    median = np.where(has_marital, marital_median, _take(data.region_median, region))
+    mean = np.where(has_marital, _take(data.marital_mean, region, marital), _take(data.region_mean, region))
+    results["region"] = (percentile_from_median_mean(household_income, median, mean),
+                         percentage_difference(household_income, median))
+
+    # National: individual income statistics
+    median = np.full(len(income), data.national_median)
+    results["national"] = (percentile_from_median_mean(income, median, np.full(len(income), data.national_mean)),
+                           percentage_difference(income, median))
+
+    # Occupation: the national quantile table, otherwise median and mean
+    median, mean = _take(data.occupation_median, occ), _take(data.occupation_mean, occ)
+    values = _take(data.national_values, occ)
+    percentile = np.where(np.isnan(values[:, 0]), percentile_from_median_mean(income, median, mean),
+                          percentile_from_quantiles(income, data.quantiles, values))
+    results["occupation"] = (percentile, percentage_difference(income, median))
+
+    # Peers: the occupation in this region, otherwise the occupation at this age, otherwise nationally
+    age_median, age_mean = _take(data.age_median, occ, age), _take(data.age_mean, occ, age)
+    has_age = ~np.isnan(age_median)
+    state_median, state_mean = _take(data.state_median, occ, region), _take(data.state_mean, occ, region)
+    has_state = ~np.isnan(state_median)
+    median = np.where(has_state, state_median, np.where(has_age, age_median, median))
+    mean = np.where(has_state, state_mean, np.where(has_age, age_mean, mean))
+    values = _take(data.state_values, occ, region)
+    has_table = has_state & ~np.isnan(values[:, 0])
+    percentile = np.where(has_table, percentile_from_quantiles(income, data.quantiles, values),
+                          percentile_from_median_mean(income, median, mean))
+    results["peer"] = (percentile, percentage_difference(income, median))
+    peer_median = median
+
+    scored = {}
+    for name in COMPARISONS:
+        scored[f"{name}_percentile"], scored[f"{name}_difference"] = results[name]
+
+    # The app shows no results at all when any comparison is unavailable
+    success_score = np.mean([results[name][0] for name in COMPARISONS], axis=0)
+    scored["success_score"] = success_score
+    scored["tier"] = tiers(success_score)
+    scored["gender_median"] = _take(data.gender_median, region, gender)
+
+    # After tax as calculateAfterTaxIncome: effective income, filed by marital status;
+    # the peer median is taxed as a single filer, like the occupation files' after_tax_median
+    regions = after_tax.region_codes(region_codes.to_numpy(dtype=object), len(frame))
+    gross = effective_income(frame)
+    net = after_tax.after_tax(data.country_code, gross, regions, _married(frame))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(gross > 0, (gross - net) / gross * 100, 0.0)
+    scored["after_tax_income"] = net
+    scored["effective_tax_rate"] = np.where(np.isnan(gross), np.nan, rate)
+    scored["peer_after_tax_difference"] = percentage_difference(
+        after_tax.after_tax(data.country_code, income, regions), after_tax.after_tax(data.country_code, peer_median, regions))
+    return pd.DataFrame(scored, index=frame.index)
+
+# ============================================================================
+# Chunked IO
+# ============================================================================
+
+# Codes stay strings even when they look numeric (UK SOC codes, Canadian NOC codes)
+TEXT_COLUMNS = {"occupation": str, "region": str, "gender": str, "marital_status": str}
+
+def _is_parquet(path):
+    return path.endswith((".parquet", ".pq"))
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    """Yield a CSV or Parquet file as DataFrames of at most chunk_size rows"""
+    if _is_parquet(path):
+        if pq is None:
+            raise RuntimeError("Reading Parquet requires pyarrow")
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=TEXT_COLUMNS)
+
+class ChunkWriter:
+    """Write scored chunks to CSV or Parquet; the output only appears once the writer closes cleanly"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._parquet = _is_parquet(path)
+        if self._parquet and pq is None:
+            raise RuntimeError("Writing Parquet requires pyarrow")
+        self._writer = None
+        self._tmp_path = None
+
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, self._tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        return self
+
+    def write(self, chunk):
+        if self._parquet:
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self._tmp_path, pa.Schema.from_pandas(chunk, preserve_index=False))
+            self._writer.write_table(pa.Table.from_pandas(chunk, schema=self._writer.schema, preserve_index=False))
+        else:
+            chunk.to_csv(self._tmp_path, mode='a', header=self.rows == 0, index=False)
+        self.rows += len(chunk)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._writer is not None:
+            self._writer.close()
+        if exc_type is None:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
+        return False
+
+def score_file(input_path, output_path, data, chunk_size=CHUNK_SIZE):
+    """Score a file chunk by chunk, writing input columns plus results; returns (rows, rows scored)"""
+    scored_rows = 0
+    with ChunkWriter(output_path) as writer:
+        for chunk in read_chunks(input_path, chunk_size):
+            with instrumentation.stage("score", rows_in=len(chunk)) as record:
+                results = score(chunk, data)
+                record.rows_out = int(results["success_score"].notna().sum())
+            scored_rows += record.rows_out
+            writer.write(pd.concat([chunk, results], axis=1))
+    return writer.rows, scored_rows
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Score a cohort file with the app's percentile and Success Score logic")
+    parser.add_argument("input", help="CSV or Parquet file of rows to score")
+    parser.add_argument("output", help="CSV or Parquet file to write (format from the extension)")
+    parser.add_argument("--country", default="us", help="country whose datasets to score against (default: us)")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help=f"rows scored per chunk (default: {CHUNK_SIZE:,})")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    instrumentation.start("batch_scoring", args)
+
+    # Fail before reading any input: the US occupation file is generated by
+    # fetch_bls_data.py and not every checkout has it
+    missing = missing_files(args.country, args.data_dir)
+    if missing:
+        print(f"✗ Missing {args.country} data files:")
+        for path in missing:
+            print(f"    {path}")
+        if args.country == "us":
+            print("  Run fetch_bls_data.py to generate the US occupation file, or pass --country")
+        sys.exit(1)
+
+    with instrumentation.stage("load", detail=args.country):
+        data = CountryData.load(args.country, args.data_dir)
+    print(f"✓ Loaded {args.country}: {len(data.occupations)} occupations, {len(data.regions)} regions")
+
+    rows, scored_rows = score_file(args.input, args.output, data, args.chunk_size)
+    print(f"✓ Scored {scored_rows:,} of {rows:,} rows → {args.output}")
+    if scored_rows < rows:
+        print(f"⚠ {rows - scored_rows:,} rows have an occupation or region missing from the {args.country} data")
+
+if __name__ == "__main__":
+    main()
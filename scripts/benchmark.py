@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Benchmark the data pipeline on synthetic fixtures, with no network access
+
+Stages measured:
+
+    fetch_national_data          download + parse the national OEWS archive
+    fetch_state_data             download + parse the state OEWS archive and merge it
+    add_age_distribution         age curves for every occupation
+    fetch_state_overall_income   Census ACS overall income request + parse
+    fetch_age_gender_income      Census ACS age/gender request + parse
+    combine_risks                fetch_ai_risk_data combine + output document
+
+Fixtures are generated per scale: 1x is BASE_OCCUPATIONS occupations (about
+4k state rows), 10x is roughly the size of the real May 2023 files and 100x
+(about 430k state rows) stress-tests the parsers. The OEWS archives use the
+real column layout, group rows and BLS special codes (*, #, **); the Census
+stand-in answers any ACS query with state rows repeated scale times,
+including the -666666666 and null annotations. Everything is served from a
+local HTTP server that the scripts' URLs are pointed at, and each run gets an
+empty HTTP cache and intermediate store so every stage starts cold.
+
+Wall time is the best of --repeat untraced runs; peak memory comes from one
+extra run under tracemalloc. Baselines are committed in
+benchmark_baseline.json, one entry per scale (and --stream variant); the run
+fails if any stage is more than --tolerance slower or larger than its
+baseline, or if a requested scale has no baseline to compare against.
+
+Usage:
+    python benchmark.py                           # 1x, compare against the stored baseline
+    python benchmark.py --scale 10 --save-baseline
+    python benchmark.py --scale 1 10 100 --stream --report results.json
+"""
+
+import argparse
+import contextlib
+import copy
+import functools
+import http.server
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+from urllib.parse import parse_qs, urlparse
+
+import openpyxl
+
+import fetch_ai_risk_data
+import fetch_bls_data
+import fetch_census_data
+import http_cache
+import intermediate_store
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(SCRIPTS_DIR, ".cache", "benchmark")
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+# Tracked, unlike the fixtures and caches under .cache/
+BASELINE_PATH = os.path.join(SCRIPTS_DIR, "benchmark_baseline.json")
+
+# Bump when the generators change so cached fixtures are rebuilt
+FIXTURE_VERSION = 1
+
+BASE_OCCUPATIONS = 100
+SCALES = [1, 10, 100]
+SEED = 2023
+
+TOLERANCE = 0.25
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.05
+MIN_BYTES = 1024 * 1024
+
+OEWS_COLUMNS = [
+    'AREA', 'AREA_TITLE', 'AREA_TYPE', 'PRIM_STATE', 'NAICS', 'NAICS_TITLE', 'I_GROUP', 'OWN_CODE',
+    'OCC_CODE', 'OCC_TITLE', 'O_GROUP', 'TOT_EMP', 'EMP_PRSE', 'JOBS_1000', 'LOC_QUOTIENT', 'PCT_TOTAL',
+    'PCT_RPT', 'H_MEAN', 'A_MEAN', 'MEAN_PRSE', 'H_PCT10', 'H_PCT25', 'H_MEDIAN', 'H_PCT75', 'H_PCT90',
+    'A_PCT10', 'A_PCT25', 'A_MEDIAN', 'A_PCT75', 'A_PCT90', 'ANNUAL', 'HOURLY',
+]
+
+# Share of detailed occupations published for a state, and how often BLS suppresses a value
+STATE_COVERAGE = 0.85
+NATIONAL_SUPPRESSED = 0.02
+STATE_SUPPRESSED = 0.05
+
+# BLS top-codes annual wages at this value ('#')
+TOP_CODE = 239200
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+def occupation_codes(count):
+    """Distinct detailed SOC codes spread across the major groups"""
+    majors = sorted(fetch_bls_data.CATEGORIES)
+    return [f"{majors[i % len(majors)]}-{1011 + i // len(majors):04d}" for i in range(count)]
+
+def _wage_columns(rng, median, suppressed):
+    """Hourly/annual means and percentiles around a median, with BLS special codes"""
+    points = [median * factor for factor in (0.55, 0.75, 1.0, 1.35, 1.8)]
+    annual = ['#' if value >= TOP_CODE else int(value) for value in points]
+    mean = int(median * rng.uniform(1.02, 1.25))
+
+    if rng.random() < suppressed:
+        annual = ['*'] * 5
+        mean = '*'
+    hourly = [value if isinstance(value, str) else round(value / 2080, 2) for value in annual]
+    hourly_mean = mean if isinstance(mean, str) else round(mean / 2080, 2)
+
+    # H_MEAN, A_MEAN, MEAN_PRSE, H_PCT10..H_PCT90, A_PCT10..A_PCT90, ANNUAL, HOURLY
+    return [hourly_mean, mean, round(rng.uniform(0.2, 5.0), 1)] + hourly + annual + [None, None]
+
+def _employment(rng, national, suppressed):
+    if rng.random() < suppressed:
+        return '**'
+    return int(national * rng.uniform(0.001, 0.12)) if national else rng.randint(1000, 3000000)
+
+def national_rows(codes, rng):
+    """National file rows: the all-occupations total, major groups and detailed occupations"""
+    prefix = [99, 'U.S.', 1, 'US', '000000', 'Cross-industry', 'cross-industry', 1235]
+    rows = [prefix + ['00-0000', 'All Occupations', 'total', 151853870, 0.1, None, None, None, None]
+            + _wage_columns(rng, 48060, 0)]
+
+    for major, category in sorted(fetch_bls_data.CATEGORIES.items()):
+        rows.append(prefix + [f"{major}-0000", f"{category} Occupations", 'major',
+                              rng.randint(500000, 20000000), 0.3, None, None, None, None]
+                    + _wage_columns(rng, rng.uniform(30000, 110000), 0))
+
+    medians = {}
+    for i, code in enumerate(codes):
+        medians[code] = rng.lognormvariate(10.9, 0.45)
+        rows.append(prefix + [code, f"Synthetic Occupation {i + 1}", 'detailed',
+                              _employment(rng, 0, NATIONAL_SUPPRESSED / 2), round(rng.uniform(0.5, 9.0), 1),
+                              None, None, None, None]
+                    + _wage_columns(rng, medians[code], NATIONAL_SUPPRESSED))
+    return rows, medians
+
+def state_rows(codes, medians, rng):
+    """State file rows for every state, with uneven coverage and suppression"""
+    rows = []
+    for fips, state in sorted(fetch_bls_data.STATE_FIPS.items()):
+        name = next(name for name, code in fetch_bls_data.STATE_NAMES.items() if code == state and name != state)
+        state_factor = rng.uniform(0.82, 1.25)
+        for i, code in enumerate(codes):
+            if rng.random() > STATE_COVERAGE:
+                continue
+            rows.append([int(fips), name, 2, state, '000000', 'Cross-industry', 'cross-industry', 1235,
+                         code, f"Synthetic Occupation {i + 1}", 'detailed',
+                         _employment(rng, 0, STATE_SUPPRESSED), round(rng.uniform(0.5, 20.0), 1),
+                         round(rng.uniform(0.01, 30.0), 3), round(rng.uniform(0.2, 3.0), 2), None, None]
+                        + _wage_columns(rng, medians[code] * state_factor * rng.uniform(0.9, 1.1), STATE_SUPPRESSED))
+    return rows
+
+def write_archive(path, member, rows):
+    """Write rows as the single sheet of an xlsx inside a BLS-style ZIP archive"""
+    book = openpyxl.Workbook(write_only=True)
+    sheet = book.create_sheet()
+    sheet.append(OEWS_COLUMNS)
+    for row in rows:
+        sheet.append(row)
+
+    workbook = io.BytesIO()
+    book.save(workbook)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(member, workbook.getvalue())
+
+def fixture_dir(scale, seed=SEED):
+    return os.path.join(FIXTURE_DIR, f"x{scale}-s{seed}-v{FIXTURE_VERSION}")
+
+def build_fixtures(scale, seed=SEED):
+    """Generate (or reuse) the OEWS archives for a scale; returns the fixture directory"""
+    directory = fixture_dir(scale, seed)
+    if os.path.exists(os.path.join(directory, "complete")):
+        return directory
+
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    codes = occupation_codes(BASE_OCCUPATIONS * scale)
+
+    started = time.monotonic()
+    national, medians = national_rows(codes, rng)
+    write_archive(os.path.join(directory, "oesm23nat.zip"), "oesm23nat/national_M2023_dl.xlsx", national)
+    states = state_rows(codes, medians, rng)
+    write_archive(os.path.join(directory, "oesm23st.zip"), "oesm23st/state_M2023_dl.xlsx", states)
+
+    with open(os.path.join(directory, "complete"), 'w') as f:
+        json.dump({"national_rows": len(national), "state_rows": len(states)}, f)
+    print(f"  Generated {scale}x fixtures: {len(national):,} national rows, {len(states):,} state rows "
+          f"({time.monotonic() - started:.1f}s)")
+    return directory
+
+def census_response(variables, scale, seed=SEED):
+    """ACS rows for every state (plus Puerto Rico), repeated scale times"""
+    rng = random.Random(f"{seed}:{','.join(variables)}")
+    fips_codes = sorted(fetch_census_data.STATE_FIPS) + ["72"]
+
+    rows = [list(variables) + ["state"]]
+    for _ in range(scale):
+        for fips in fips_codes:
+            households = rng.randint(200000, 13000000)
+            row = []
+            for variable in variables:
+                if variable == "NAME":
+                    row.append(fetch_census_data.STATE_NAMES.get(fetch_census_data.STATE_FIPS.get(fips), "Puerto Rico"))
+                elif rng.random() < 0.01:
+                    row.append(None)
+                elif rng.random() < 0.01:
+                    row.append("-666666666")
+                elif variable == "B19001_001E":
+                    row.append(str(households))
+                elif variable == "B19025_001E":
+                    row.append(str(households * rng.randint(60000, 130000)))
+                elif variable == "B19013_001E":
+                    row.append(str(rng.randint(45000, 100000)))
+                else:
+                    row.append(str(rng.randint(15000, 80000)))
+            rows.append(row + [fips])
+    return rows
+
+# ============================================================================
+# Local stand-in for BLS and the Census API
+# ============================================================================
+
+class FixtureHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves fixture files by name and answers ACS queries under /data/"""
+
+    scale = 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.startswith("/data/"):
+            return super().do_GET()
+
+        query = parse_qs(url.query)
+        body = json.dumps(census_response(query["get"][0].split(","), self.scale)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@contextlib.contextmanager
+def serve_fixtures(directory, scale):
+    """Serve a fixture directory and point the scripts' source URLs at it"""
+    handler = type("ScaledFixtureHandler", (FixtureHandler,), {"scale": scale})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=directory))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    saved = (fetch_bls_data.NATIONAL_URL, fetch_bls_data.STATE_URL, fetch_census_data.BASE_URL)
+    fetch_bls_data.NATIONAL_URL = f"{base}/oesm23nat.zip"
+    fetch_bls_data.STATE_URL = f"{base}/oesm23st.zip"
+    fetch_census_data.BASE_URL = f"{base}/data/2022/acs/acs5"
+    try:
+        yield base
+    finally:
+        fetch_bls_data.NATIONAL_URL, fetch_bls_data.STATE_URL, fetch_census_data.BASE_URL = saved
+        server.shutdown()
+        server.server_close()
+
+# ============================================================================
+# Stages
+# ============================================================================
+
+# Each stage takes the results of earlier stages and returns the callable to measure
+
+def stage_national(context):
+    return lambda: fetch_bls_data.fetch_national_data(stream=context["stream"])
+
+def stage_state(context):
+    occupations = context["fetch_national_data"]
+    return lambda: fetch_bls_data.fetch_state_data(copy.deepcopy(occupations), stream=context["stream"])
+
+def stage_age_distribution(context):
+    occupations = context["fetch_state_data"]
+    return lambda: fetch_bls_data.add_age_distribution(copy.deepcopy(occupations))
+
+def stage_census_overall(context):
+    return fetch_census_data.fetch_state_overall_income
+
+def stage_census_age_gender(context):
+    return fetch_census_data.fetch_age_gender_income
+
+def stage_combine(context):
+    occupations = {soc_code: {'title': occ['title'], 'category': occ['category']}
+                   for soc_code, occ in context["fetch_national_data"].items()}
+    # Exposure for most codes; the rest fall back to category scores, as in the real inputs
+    rng = random.Random(SEED)
+    ai_data = {soc_code: {'ai_exposure': rng.random(), 'source': 'synthetic'}
+               for soc_code in occupations if rng.random() < 0.8}
+    ai_data.update({category: rng.randint(10, 80) for category in fetch_bls_data.CATEGORIES.values()})
+    automation_data = fetch_ai_risk_data.fetch_frey_osborne_automation()
+
+    return lambda: fetch_ai_risk_data.build_output(
+        fetch_ai_risk_data.combine_risks(occupations, ai_data, automation_data))
+
+STAGES = [
+    ("fetch_national_data", stage_national),
+    ("fetch_state_data", stage_state),
+    ("add_age_distribution", stage_age_distribution),
+    ("fetch_state_overall_income", stage_census_overall),
+    ("fetch_age_gender_income", stage_census_age_gender),
+    ("combine_risks", stage_combine),
+]
+
+@contextlib.contextmanager
+def cold_caches():
+    """An empty HTTP cache and intermediate store for one run"""
+    root = tempfile.mkdtemp(prefix="bench_", dir=BENCH_DIR)
+    saved_store = intermediate_store.STORE_DIR
+    http_cache.configure(root=os.path.join(root, "http"), offline=False)
+    intermediate_store.STORE_DIR = os.path.join(root, "parquet")
+    os.makedirs(intermediate_store.STORE_DIR)
+    try:
+        yield
+    finally:
+        intermediate_store.STORE_DIR = saved_store
+        http_cache.configure()
+        shutil.rmtree(root, ignore_errors=True)
+
+def _run(run, quiet):
+    output = io.StringIO() if quiet else sys.stdout
+    with cold_caches(), contextlib.redirect_stdout(output):
+        return run()
+
+def measure(run, repeat=1, quiet=True):
+    """(result, best wall seconds, peak traced bytes)"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        _run(run, quiet)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        result = _run(run, quiet)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+def run_scale(scale, stream=False, repeat=1, quiet=True):
+    """Measure every stage at one scale; returns {stage: {"seconds", "peak_bytes"}}"""
+    directory = build_fixtures(scale)
+    context = {"stream": stream}
+    results = {}
+
+    with serve_fixtures(directory, scale):
+        for name, stage in STAGES:
+            with contextlib.redirect_stdout(io.StringIO() if quiet else sys.stdout):
+                run = stage(context)
+            context[name], seconds, peak = measure(run, repeat, quiet)
+            if not context[name]:
+                raise RuntimeError(f"{name} produced no data at {scale}x")
+            results[name] = {"seconds": round(seconds, 4), "peak_bytes": peak}
+            print(f"  {name:<28} {seconds:>9.3f}s {peak / 1024 ** 2:>10.1f} MiB")
+    return results
+
+# ============================================================================
+# Baselines
+# ============================================================================
+
+def baseline_key(scale, stream):
+    return f"{scale}x{'-stream' if stream else ''}"
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_baseline(baseline, path=BASELINE_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def regressions(results, baseline, tolerance=TOLERANCE):
+    """Stages slower or larger than the baseline by more than tolerance"""
+    found = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric, floor in (("seconds", MIN_SECONDS), ("peak_bytes", MIN_BYTES)):
+            limit = previous[metric] * (1 + tolerance)
+            if current[metric] > limit and current[metric] - previous[metric] > floor:
+                found.append(f"{name}: {metric} {current[metric]:,} vs baseline {previous[metric]:,} "
+                             f"(+{current[metric] / previous[metric] - 1:.0%})")
+    return found
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the data pipeline on synthetic fixtures")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1], choices=SCALES,
+                        help="fixture sizes to run (default: 1)")
+    parser.add_argument("--stream", action="store_true", help="benchmark the streaming OEWS ingest")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per stage; the best is kept")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help=f"allowed slowdown/growth before failing (default: {TOLERANCE:.0%})")
+    parser.add_argument("--report", help="also write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="show the scripts' own output")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    os.makedirs(BENCH_DIR, exist_ok=True)
+
+    print("=" * 60)
+    print("Pipeline benchmark")
+    print("=" * 60)
+
+    baseline = load_baseline(args.baseline)
+    report = {"python": platform.python_version(), "machine": platform.machine(), "results": {}}
+    failures = []
+
+    for scale in args.scale:
+        key = baseline_key(scale, args.stream)
+        print(f"\n{key}:")
+        results = run_scale(scale, args.stream, args.repeat, quiet=not args.verbose)
+        report["results"][key] = results
+
+        if args.save_baseline:
+            baseline[key] = results
+        elif key in baseline:
+            failures += [f"{key} {line}" for line in regressions(results, baseline[key], args.tolerance)]
+        else:
+            failures.append(f"{key}: no baseline in {args.baseline}; run with --save-baseline to record one")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Wrote {args.report}")
+
+    print("\n" + "=" * 60)
+    if args.save_baseline:
+        save_baseline(baseline, args.baseline)
+        print(f"✓ Saved baseline to {args.baseline}")
+    elif failures:
+        for failure in failures:
+            print(f"✗ {failure}")
+        print("=" * 60)
+        sys.exit(1)
+    else:
+        print("✓ No regressions")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
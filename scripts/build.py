@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+Incremental build of the generated data files
+
+The pipeline is modelled as a DAG of stages:
+
+    fetch_national ─ parse_national ─┐
+    fetch_state ─────────────────────┴─ parse_state ─ enrich_age ─ emit_occupations ─┬─ emit_occupation_shards
+                                                   ├─ emit_percentile_tables        │
+                                                   └─ emit_rank_indexes             │
+    fetch_ai_exposure ───────────────────────────────────────────────────────────────┴─ emit_automation_risk ─┐
+    read_crosswalks ─────────────────────────────────────────────────────────────────────────────────────────┴─ emit_country_risk
+    fetch_msa ──────────────┐
+    fetch_area_definitions ─┤
+    read_zip_codes ─────────┴─ (parse_national) ─ emit_metro_shards
+    (parse_national) ─────────┐
+    (read_crosswalks) ────────┤
+    (emit_automation_risk) ───┴─ emit_search_index
+    fetch_census_overall ─────┐
+    fetch_census_age_gender ──┴─ parse_census ─ enrich_marital ─ emit_state_income
+    fetch_census_zcta ────────┐
+    (read_zip_codes) ─────────┴─ emit_zip_income
+
+Each stage is keyed by a hash of its code (the stage function plus every
+function and constant it reaches in the script it calls into) and of the
+outputs of the stages it depends on. A stage whose key matches the last
+successful run is skipped and its stored result reused; independent stages
+run in parallel. Fetch stages always run, but go through the HTTP cache, so
+an unchanged source produces the same output hash and nothing downstream of
+it re-runs.
+
+Usage:
+    python build.py                       # build everything that is stale
+    python build.py emit_state_income     # build one target and its inputs
+    python build.py --dry-run             # show what would run
+    python build.py --force parse_state   # re-run a stage even if it is fresh
+    python build.py --trace-memory        # also record peak memory per stage in the run report
+"""
+
+import argparse
+import copy
+import hashlib
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import types
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import after_tax
+import fetch_ai_risk_data
+import fetch_bls_data
+import crosswalk_risk
+import fetch_census_data
+import http_cache
+import instrumentation
+import json_emitter
+import metro_wages
+import occupation_shards
+import percentile_tables
+import rank_indexes
+import risk_index
+import search_index
+import zip_income
+from http_cache import fetch_cached
+from intermediate_store import file_sha256
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.path.join(SCRIPTS_DIR, ".cache", "build")
+STATE_PATH = os.path.join(BUILD_DIR, "state.json")
+
+JOBS = 4
+
+# Set from --stream
+STREAM = False
+
+class BuildError(Exception):
+    """A stage could not produce its output"""
+
+class Stage:
+    """One node of the build graph"""
+
+    def __init__(self, name, func, deps=(), code=(), outputs=(), always=False):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        # Functions in the scripts whose code (and reachable helpers/constants) the stage depends on
+        self.code = tuple(code)
+        # Files written by the stage; a missing or modified file makes the stage stale
+        self.outputs = tuple(outputs)
+        # Stages that read external sources run every time
+        self.always = always
+
+def _stable_repr(value):
+    if isinstance(value, (set, frozenset)):
+        return repr(sorted(value, key=repr))
+    return repr(value)
+
+def _names(code):
+    """Global and attribute names used by a code object and its nested code objects"""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _names(const)
+    return names
+
+def code_fingerprint(*functions):
+    """Hash functions together with the same-module functions, classes and constants they reach"""
+    hasher = hashlib.sha256()
+    seen = set()
+
+    def visit(obj):
+        # Instrumented functions are hashed (and followed) through to the function they wrap
+        obj = inspect.unwrap(obj)
+        if id(obj) in seen:
+            return
+        seen.add(id(obj))
+        hasher.update(inspect.getsource(obj).encode())
+
+        if not inspect.isfunction(obj):
+            return
+
+        module = obj.__module__
+        for name in sorted(_names(obj.__code__)):
+            if name not in obj.__globals__:
+                continue
+            value = obj.__globals__[name]
+            if (inspect.isfunction(value) or inspect.isclass(value)) and value.__module__ == module:
+                visit(value)
+            elif isinstance(value, dict) and any(inspect.isfunction(item) for item in value.values()):
+                # Dispatch tables: hash the keys and follow the functions
+                hasher.update(f"{name}={_stable_repr(list(value))}".encode())
+                for item in value.values():
+                    if inspect.isfunction(item) and item.__module__ == module:
+                        visit(item)
+            elif isinstance(value, (dict, list, tuple, set, frozenset, str, int, float, bool)):
+                hasher.update(f"{name}={_stable_repr(value)}".encode())
+            elif type(value).__module__ == module:
+                # Module-level table objects hash through their (content) repr
+                hasher.update(f"{name}={value!r}".encode())
+
+    for function in functions:
+        visit(function)
+    return hasher.hexdigest()
+
+def _emitted(path):
+    return {"path": os.path.relpath(path, SCRIPTS_DIR), "sha256": file_sha256(path)}
+
+# Stages
+
+def fetch_national(inputs):
+    path = fetch_cached(fetch_bls_data.NATIONAL_URL, headers=fetch_bls_data.HEADERS, timeout=60)
+    return {"sha256": file_sha256(path)}
+
+def fetch_state(inputs):
+    path = fetch_cached(fetch_bls_data.STATE_URL, headers=fetch_bls_data.HEADERS, timeout=60)
+    return {"sha256": file_sha256(path)}
+
+def parse_national(inputs):
+    occupations = fetch_bls_data.fetch_national_data(stream=STREAM)
+    if not occupations:
+        raise BuildError("No national data fetched")
+    return occupations
+
+def parse_state(inputs):
+    occupations = copy.deepcopy(inputs["parse_national"])
+    return fetch_bls_data.fetch_state_data(occupations, stream=STREAM)
+
+def enrich_age(inputs):
+    return fetch_bls_data.add_age_distribution(copy.deepcopy(inputs["parse_state"]))
+
+def emit_occupations(inputs):
+    fetch_bls_data.save_output(fetch_bls_data.build_output(inputs["enrich_age"]))
+    return _emitted(fetch_bls_data.OUTPUT_PATH)
+
+def emit_occupation_shards(inputs):
+    with open(fetch_bls_data.OUTPUT_PATH, 'r') as f:
+        occupation_shards.write(json.load(f), "us", fetch_bls_data.SHARDS_OUTPUT_DIR)
+    return _emitted(occupation_shards.manifest_path("us", fetch_bls_data.SHARDS_OUTPUT_DIR))
+
+def emit_percentile_tables(inputs):
+    tables = fetch_bls_data.build_percentile_tables(inputs["parse_state"])
+    percentile_tables.save_tables(tables, fetch_bls_data.PERCENTILES_OUTPUT_PATH)
+    return _emitted(fetch_bls_data.PERCENTILES_OUTPUT_PATH)
+
+def emit_search_index(inputs):
+    index = fetch_bls_data.build_search_index(inputs["parse_national"])
+    search_index.save_index(index, fetch_bls_data.SEARCH_INDEX_OUTPUT_PATH)
+    return _emitted(fetch_bls_data.SEARCH_INDEX_OUTPUT_PATH)
+
+def emit_rank_indexes(inputs):
+    indexes = fetch_bls_data.build_rank_indexes(inputs["parse_state"])
+    rank_indexes.save_indexes(indexes, fetch_bls_data.RANK_INDEXES_OUTPUT_PATH)
+    return _emitted(fetch_bls_data.RANK_INDEXES_OUTPUT_PATH)
+
+def fetch_msa(inputs):
+    path = fetch_cached(metro_wages.MSA_URL, headers=fetch_bls_data.HEADERS, timeout=60)
+    return {"sha256": file_sha256(path)}
+
+def fetch_area_definitions(inputs):
+    # Both map ZIP codes to OEWS areas (metro_wages.zip_areas_by_state)
+    return {
+        name: file_sha256(fetch_cached(url, headers=fetch_bls_data.HEADERS, timeout=60))
+        for name, url in [("area_definitions", metro_wages.AREA_DEFINITIONS_URL),
+                          ("zcta_counties", metro_wages.ZCTA_COUNTY_URL)]
+    }
+
+def emit_metro_shards(inputs):
+    paths = metro_wages.run(inputs["parse_national"])
+    return {state: _emitted(path) for state, path in paths.items()}
+
+def fetch_census_overall(inputs):
+    data = fetch_census_data.fetch_census_data(fetch_census_data.VARIABLE_GROUPS["overall"])
+    if not data:
+        raise BuildError("Census overall income request failed")
+    return data
+
+def fetch_census_age_gender(inputs):
+    data = fetch_census_data.fetch_census_data(fetch_census_data.VARIABLE_GROUPS["age_gender"])
+    if not data:
+        raise BuildError("Census age/gender request failed")
+    return data
+
+def parse_census(inputs):
+    return fetch_census_data.merge_state_data(
+        fetch_census_data.parse_state_overall_income(inputs["fetch_census_overall"]),
+        fetch_census_data.parse_age_gender_income(inputs["fetch_census_age_gender"]),
+    )
+
+def enrich_marital(inputs):
+    return fetch_census_data.add_marital_status_estimates(copy.deepcopy(inputs["parse_census"]))
+
+def emit_state_income(inputs):
+    fetch_census_data.save_output(fetch_census_data.build_output(inputs["enrich_marital"]))
+    return _emitted(fetch_census_data.OUTPUT_PATH)
+
+def fetch_census_zcta(inputs):
+    data = zip_income.fetch_zcta_income()
+    if not data["zctas"]:
+        raise BuildError("Census ZCTA income request failed")
+    return data
+
+def read_zip_codes(inputs):
+    # zip_code_data.json, read by both emit_zip_income and emit_metro_shards
+    return {"sha256": file_sha256(zip_income.LEGACY_PATH)}
+
+def emit_zip_income(inputs):
+    zip_income.build(inputs["fetch_census_zcta"])
+    return _emitted(zip_income.OUTPUT_PATH)
+
+def fetch_ai_exposure(inputs):
+    return fetch_ai_risk_data.fetch_openai_gpt_impact()
+
+def emit_automation_risk(inputs):
+    combined = fetch_ai_risk_data.combine_risks(
+        fetch_ai_risk_data.load_our_occupations(),
+        inputs["fetch_ai_exposure"],
+        fetch_ai_risk_data.fetch_frey_osborne_automation(),
+    )
+    fetch_ai_risk_data.save_output(fetch_ai_risk_data.build_output(combined))
+    return _emitted(fetch_ai_risk_data.OUTPUT_PATH)
+
+def read_crosswalks(inputs):
+    # Inputs of the country risk files and the index that no stage writes: the SOC
+    # mapping files, the other countries' occupation files and the UK's own risk data
+    paths = {os.path.join(percentile_tables.DATA_DIR, f"{name}.json") for name in risk_index.MAPPING_FILES.values()}
+    paths.update(percentile_tables.occupations_path(country_code) for country_code in risk_index.MAPPING_FILES)
+    paths.add(risk_index.risk_path("uk"))
+    return {os.path.basename(path): file_sha256(path) for path in sorted(paths) if os.path.exists(path)}
+
+def emit_country_risk(inputs):
+    with open(fetch_ai_risk_data.OUTPUT_PATH, 'r') as f:
+        us_risk = json.load(f)
+    crosswalk_risk.materialize(us_risk["automation_risks"], us_risk["metadata"])
+
+    # The app resolves risk through the index first; rebuild it from the files just written
+    index, _ = risk_index.build_index(risk_index.available_countries())
+    risk_index.save_index(index)
+
+    emitted = {country_code: _emitted(crosswalk_risk.risk_path(country_code))
+               for country_code in crosswalk_risk.COUNTRIES}
+    emitted["index"] = _emitted(risk_index.OUTPUT_PATH)
+    return emitted
+
+STAGES = [
+    Stage("fetch_national", fetch_national, always=True),
+    Stage("fetch_state", fetch_state, always=True),
+    Stage("parse_national", parse_national, deps=["fetch_national"],
+          code=[fetch_bls_data.fetch_national_data]),
+    Stage("parse_state", parse_state, deps=["parse_national", "fetch_state"],
+          code=[fetch_bls_data.fetch_state_data]),
+    Stage("enrich_age", enrich_age, deps=["parse_state"],
+          code=[fetch_bls_data.add_age_distribution]),
+    Stage("emit_occupations", emit_occupations, deps=["enrich_age"],
+          code=[fetch_bls_data.build_output, fetch_bls_data.save_output, after_tax.annotate_occupations,
+                json_emitter.emit],
+          outputs=[fetch_bls_data.OUTPUT_PATH]),
+    Stage("emit_occupation_shards", emit_occupation_shards, deps=["emit_occupations"],
+          code=[occupation_shards.write],
+          outputs=[occupation_shards.manifest_path("us", fetch_bls_data.SHARDS_OUTPUT_DIR),
+                   occupation_shards.index_path("us", fetch_bls_data.SHARDS_OUTPUT_DIR)]),
+    Stage("emit_percentile_tables", emit_percentile_tables, deps=["parse_state"],
+          code=[fetch_bls_data.build_percentile_tables, percentile_tables.build_tables,
+                percentile_tables.save_tables],
+          outputs=[fetch_bls_data.PERCENTILES_OUTPUT_PATH]),
+    Stage("emit_rank_indexes", emit_rank_indexes, deps=["parse_state"],
+          code=[fetch_bls_data.build_rank_indexes, rank_indexes.build_indexes, rank_indexes.save_indexes],
+          outputs=[fetch_bls_data.RANK_INDEXES_OUTPUT_PATH]),
+    Stage("emit_search_index", emit_search_index,
+          # Aliases come from the crosswalks, the other countries' titles and the US risk titles
+          deps=["parse_national", "read_crosswalks", "emit_automation_risk"],
+          code=[fetch_bls_data.build_search_index, search_index.alias_table, search_index.build_index,
+                search_index.save_index],
+          outputs=[fetch_bls_data.SEARCH_INDEX_OUTPUT_PATH]),
+    Stage("fetch_msa", fetch_msa, always=True),
+    Stage("fetch_area_definitions", fetch_area_definitions, always=True),
+    Stage("emit_metro_shards", emit_metro_shards,
+          deps=["parse_national", "fetch_msa", "fetch_area_definitions", "read_zip_codes"],
+          code=[metro_wages.run],
+          outputs=[metro_wages.shard_path(state) for state in sorted(set(fetch_bls_data.STATE_FIPS.values()))]),
+    Stage("fetch_census_overall", fetch_census_overall, always=True),
+    Stage("fetch_census_age_gender", fetch_census_age_gender, always=True),
+    Stage("parse_census", parse_census, deps=["fetch_census_overall", "fetch_census_age_gender"],
+          code=[fetch_census_data.parse_state_overall_income, fetch_census_data.parse_age_gender_income,
+                fetch_census_data.merge_state_data]),
+    Stage("enrich_marital", enrich_marital, deps=["parse_census"],
+          code=[fetch_census_data.add_marital_status_estimates]),
+    Stage("emit_state_income", emit_state_income, deps=["enrich_marital"],
+          code=[fetch_census_data.build_output, fetch_census_data.save_output, json_emitter.emit],
+          outputs=[fetch_census_data.OUTPUT_PATH]),
+    Stage("fetch_census_zcta", fetch_census_zcta, always=True,
+          code=[zip_income.fetch_zcta_income, fetch_census_data.fetch_census_table]),
+    Stage("read_zip_codes", read_zip_codes, always=True),
+    Stage("emit_zip_income", emit_zip_income, deps=["fetch_census_zcta", "read_zip_codes"],
+          code=[zip_income.build],
+          outputs=[zip_income.OUTPUT_PATH]),
+    Stage("fetch_ai_exposure", fetch_ai_exposure, always=True,
+          code=[fetch_ai_risk_data.fetch_openai_gpt_impact]),
+    Stage("emit_automation_risk", emit_automation_risk, deps=["emit_occupations", "fetch_ai_exposure"],
+          code=[fetch_ai_risk_data.load_our_occupations, fetch_ai_risk_data.fetch_frey_osborne_automation,
+                fetch_ai_risk_data.combine_risks, fetch_ai_risk_data.build_output,
+                fetch_ai_risk_data.save_output, json_emitter.emit],
+          outputs=[fetch_ai_risk_data.OUTPUT_PATH]),
+    Stage("read_crosswalks", read_crosswalks, always=True),
+    Stage("emit_country_risk", emit_country_risk, deps=["emit_automation_risk", "read_crosswalks"],
+          code=[crosswalk_risk.materialize, risk_index.build_index, risk_index.save_index],
+          outputs=[crosswalk_risk.risk_path(country_code) for country_code in crosswalk_risk.COUNTRIES]
+                  + [risk_index.OUTPUT_PATH]),
+]
+
+class Builder:
+    """Runs the stale part of the stage graph, recording keys and output hashes in STATE_PATH"""
+
+    def __init__(self, stages, jobs=JOBS, force=(), dry_run=False):
+        self.stages = {stage.name: stage for stage in stages}
+        self.jobs = jobs
+        self.force = set(force)
+        self.dry_run = dry_run
+        self.state = self._load_state()
+        self.output_hashes = {}
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def _load_state(self):
+        try:
+            with open(STATE_PATH, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        os.makedirs(BUILD_DIR, exist_ok=True)
+        tmp_path = STATE_PATH + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, STATE_PATH)
+
+    def _result_path(self, name, key):
+        return os.path.join(BUILD_DIR, "results", f"{name}.{key[:16]}.json")
+
+    def closure(self, targets):
+        """Targets plus everything they depend on"""
+        selected = set()
+        stack = list(targets or self.stages)
+        while stack:
+            name = stack.pop()
+            if name not in self.stages:
+                raise BuildError(f"Unknown stage: {name}")
+            if name not in selected:
+                selected.add(name)
+                stack.extend(self.stages[name].deps)
+        return selected
+
+    def key(self, stage):
+        hasher = hashlib.sha256()
+        hasher.update(stage.name.encode())
+        hasher.update(code_fingerprint(stage.func, *stage.code).encode())
+        for dep in stage.deps:
+            hasher.update(f"{dep}={self.output_hashes[dep]}".encode())
+        return hasher.hexdigest()
+
+    def is_fresh(self, stage, key):
+        if stage.always or stage.name in self.force:
+            return False
+
+        record = self.state.get(stage.name)
+        if not record or record["key"] != key:
+            return False
+        if not os.path.exists(self._result_path(stage.name, key)):
+            return False
+
+        for path, digest in record.get("outputs", {}).items():
+            if not os.path.exists(path) or file_sha256(path) != digest:
+                return False
+        return True
+
+    def result(self, name):
+        with self._lock:
+            if name not in self._results:
+                with open(self._result_path(name, self.state[name]["key"]), 'r') as f:
+                    self._results[name] = json.load(f)
+            return self._results[name]
+
+    def execute(self, stage, key):
+        inputs = {dep: self.result(dep) for dep in stage.deps}
+
+        started = time.monotonic()
+        with instrumentation.stage(stage.name) as record:
+            value = stage.func(inputs)
+            for output_path in stage.outputs:
+                if os.path.exists(output_path):
+                    record.wrote(output_path)
+        elapsed = time.monotonic() - started
+
+        text = json.dumps(value, sort_keys=True)
+        output_hash = hashlib.sha256(text.encode()).hexdigest()
+
+        path = self._result_path(stage.name, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+
+        with self._lock:
+            previous = self.state.get(stage.name)
+            if previous and previous["key"] != key:
+                old_path = self._result_path(stage.name, previous["key"])
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+
+            self._results[stage.name] = value
+            self.state[stage.name] = {
+                "key": key,
+                "output_hash": output_hash,
+                "outputs": {path: file_sha256(path) for path in stage.outputs},
+                "built_at": time.time(),
+                "seconds": round(elapsed, 3),
+            }
+            self._save_state()
+
+        changed = "unchanged" if previous and previous["output_hash"] == output_hash else "changed"
+        print(f"✓ {stage.name} ({elapsed:.1f}s, output {changed})")
+        return output_hash
+
+    def run(self, targets=None):
+        pending = self.closure(targets)
+        failed = set()
+        ran = []
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            running = {}
+            while pending or running:
+                progress = True
+                while progress:
+                    progress = False
+                    for name in sorted(pending):
+                        stage = self.stages[name]
+                        if any(dep in failed for dep in stage.deps):
+                            print(f"✗ {name} (skipped: an input failed)")
+                            failed.add(name)
+                            pending.discard(name)
+                            progress = True
+                            continue
+                        if not all(dep in self.output_hashes for dep in stage.deps):
+                            continue
+
+                        pending.discard(name)
+                        progress = True
+                        key = self.key(stage)
+                        if self.is_fresh(stage, key):
+                            self.output_hashes[name] = self.state[name]["output_hash"]
+                            print(f"· {name} (up to date)")
+                        elif self.dry_run:
+                            # Without running, downstream stages can only be judged against the last run
+                            self.output_hashes[name] = self.state.get(name, {}).get("output_hash", "")
+                            print(f"→ {name} (would run)")
+                        else:
+                            print(f"→ {name}")
+                            running[executor.submit(self.execute, stage, key)] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.output_hashes[name] = future.result()
+                        ran.append(name)
+                    except Exception as e:
+                        print(f"✗ {name}: {e}")
+                        failed.add(name)
+
+        return ran, failed
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Incrementally rebuild the generated data files")
+    parser.add_argument("targets", nargs="*", help="stages to build (default: all)")
+    parser.add_argument("--force", nargs="+", default=[], metavar="STAGE",
+                        help="re-run these stages even if they are up to date")
+    parser.add_argument("--jobs", type=int, default=JOBS, help=f"stages to run in parallel (default: {JOBS})")
+    parser.add_argument("--dry-run", action="store_true", help="show which stages are stale without running them")
+    parser.add_argument("--offline", action="store_true", help="serve downloads only from the local HTTP cache")
+    parser.add_argument("--stream", action="store_true", help="use streaming OEWS ingest")
+    parser.add_argument("--list", action="store_true", help="list the stages and exit")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    global STREAM
+    args = parse_args()
+
+    # The scripts write to paths relative to this directory
+    os.chdir(SCRIPTS_DIR)
+
+    if args.list:
+        for stage in STAGES:
+            deps = f" <- {', '.join(stage.deps)}" if stage.deps else ""
+            print(f"  {stage.name}{deps}")
+        return
+
+    if args.offline:
+        http_cache.configure(offline=True)
+    STREAM = args.stream
+    if not args.dry_run:
+        instrumentation.start("build", args)
+
+    print("=" * 60)
+    print("Data pipeline build")
+    print("=" * 60)
+
+    started = time.monotonic()
+    builder = Builder(STAGES, jobs=args.jobs, force=args.force, dry_run=args.dry_run)
+    ran, failed = builder.run(args.targets)
+
+    print("\n" + "=" * 60)
+    print(f"✓ Ran {len(ran)} stages in {time.monotonic() - started:.1f}s")
+    if failed:
+        print(f"✗ Failed: {', '.join(sorted(failed))}")
+    print("=" * 60)
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
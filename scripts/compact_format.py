@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Compact columnar encoding for the generated occupation/region JSON files
+
+The row-oriented outputs repeat every key ("median", "mean", "employment", the
+region codes...) for every state of every occupation. This format stores each
+field once as a column instead:
+
+    int     integers packed little-endian (int32 or int64) and base64-encoded
+    str     plain list of strings
+    enum    repeated strings as a dictionary plus packed integer codes
+            (region codes, age groups, categories)
+    record  objects that all share the same keys, one column per key
+    map     objects with varying keys: per-row lengths, a key column and a value column
+    list    arrays: per-row lengths and one column for all elements
+    json    anything else (floats, booleans, nulls, mixed types) stored verbatim
+
+Row counts are implied by the parent, so a document is just its root column
+(a one-row record). Key order, int/float types and empty containers all
+survive, so decode(encode(doc)) == doc and re-serializes to the same text.
+
+The encoded document may be wrapped in a gzip or zstd container; readers
+detect the container from its magic bytes and the format from FORMAT_NAME and
+FORMAT_VERSION, which DataLoader.swift checks before decoding.
+
+Usage:
+    python compact_format.py encode ca/ca_occupations.json out.json --compress gzip
+    python compact_format.py decode out.json ca_occupations.json
+    python compact_format.py check                 # round-trip every bundled file
+"""
+
+import argparse
+import base64
+import glob
+import gzip
+import json
+import os
+import sys
+from array import array
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FORMAT_NAME = "successclaude-columnar"
+FORMAT_VERSION = 1
+
+DATA_DIR = "../SuccessClaude/Data/JSON"
+
+# Files the app decodes on launch; these are what `check` round-trips by default
+BUNDLED_PATTERNS = ["*/*_occupations*.json", "*/*_regions.json", "*/*_state_income_data.json",
+                    "*/*_percentile_tables.json", "*/*_rank_indexes.json"]
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+class FormatError(Exception):
+    """Raised for documents that are not in a supported columnar format"""
+
+# ============================================================================
+# Encoding
+# ============================================================================
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _pack_ints(values):
+    width = 4 if all(INT32_MIN <= v <= INT32_MAX for v in values) else 8
+    packed = array('i' if width == 4 else 'q', values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return {"t": "int", "w": width, "data": base64.b64encode(packed.tobytes()).decode('ascii')}
+
+def encode_column(values):
+    """Encode a list of JSON values as one column"""
+    if not values:
+        return {"t": "json", "values": []}
+
+    if all(_is_int(v) for v in values) and all(INT64_MIN <= v <= INT64_MAX for v in values):
+        return _pack_ints(values)
+
+    if all(isinstance(v, str) for v in values):
+        dictionary = list(dict.fromkeys(values))
+        if len(dictionary) * 2 <= len(values):
+            codes = {value: code for code, value in enumerate(dictionary)}
+            return {"t": "enum", "dict": dictionary, "codes": _pack_ints([codes[v] for v in values])}
+        return {"t": "str", "values": list(values)}
+
+    if all(isinstance(v, dict) for v in values):
+        keys = list(values[0])
+        # A lone object whose values are all arrays, or objects with the same keys, is a
+        # lookup table keyed by code, not a record: store it as a map so the values share columns
+        members = list(values[0].values())
+        lookup = len(values) == 1 and len(keys) > 1 and (
+            all(isinstance(m, list) for m in members)
+            or all(isinstance(m, dict) and list(m) == list(members[0]) for m in members)
+        )
+        if not lookup and all(list(v) == keys for v in values):
+            return {"t": "record", "keys": keys,
+                    "columns": [encode_column([v[key] for v in values]) for key in keys]}
+        return {
+            "t": "map",
+            "lengths": _pack_ints([len(v) for v in values]),
+            "keys": encode_column([key for v in values for key in v]),
+            "values": encode_column([item for v in values for item in v.values()]),
+        }
+
+    if all(isinstance(v, list) for v in values):
+        return {
+            "t": "list",
+            "lengths": _pack_ints([len(v) for v in values]),
+            "values": encode_column([item for v in values for item in v]),
+        }
+
+    return {"t": "json", "values": list(values)}
+
+def encode(document):
+    """Encode a JSON document (as loaded by json.load) in the columnar format"""
+    return {"format": FORMAT_NAME, "format_version": FORMAT_VERSION, "root": encode_column([document])}
+
+# ============================================================================
+# Decoding
+# ============================================================================
+
+def _unpack_ints(column):
+    packed = array('i' if column["w"] == 4 else 'q')
+    packed.frombytes(base64.b64decode(column["data"]))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tolist()
+
+def decode_column(column, count):
+    """Decode a column back into a list of count JSON values"""
+    kind = column["t"]
+
+    if kind == "int":
+        values = _unpack_ints(column)
+    elif kind == "enum":
+        values = [column["dict"][code] for code in _unpack_ints(column["codes"])]
+    elif kind in ("str", "json"):
+        values = column["values"]
+    elif kind == "record":
+        columns = [decode_column(c, count) for c in column["columns"]]
+        values = [dict(zip(column["keys"], row)) for row in zip(*columns)] if columns else [{} for _ in range(count)]
+    elif kind in ("map", "list"):
+        lengths = _unpack_ints(column["lengths"])
+        total = sum(lengths)
+        items = decode_column(column["values"], total)
+        if kind == "map":
+            items = list(zip(decode_column(column["keys"], total), items))
+        values = []
+        start = 0
+        for length in lengths:
+            row = items[start:start + length]
+            values.append(dict(row) if kind == "map" else row)
+            start += length
+    else:
+        raise FormatError(f"Unknown column type: {kind}")
+
+    if len(values) != count:
+        raise FormatError(f"{kind} column has {len(values)} values, expected {count}")
+    return values
+
+def is_columnar(document):
+    return isinstance(document, dict) and document.get("format") == FORMAT_NAME
+
+def decode(encoded):
+    """Decode a columnar document back into the original JSON structure"""
+    if not is_columnar(encoded):
+        raise FormatError("Not a columnar document")
+    if encoded.get("format_version") != FORMAT_VERSION:
+        raise FormatError(f"Unsupported format version: {encoded.get('format_version')}")
+    return decode_column(encoded["root"], 1)[0]
+
+# ============================================================================
+# Containers
+# ============================================================================
+
+def compress_bytes(payload, compression=None):
+    if compression is None:
+        return payload
+    if compression == "gzip":
+        # mtime=0 keeps the output reproducible across builds
+        return gzip.compress(payload, compresslevel=9, mtime=0)
+    if compression == "zstd":
+        if zstandard is None:
+            raise FormatError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor(level=19).compress(payload)
+    raise FormatError(f"Unknown compression: {compression}")
+
+def decompress_bytes(payload):
+    """Strip a gzip or zstd container, detected from its magic bytes"""
+    if payload.startswith(GZIP_MAGIC):
+        return gzip.decompress(payload)
+    if payload.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise FormatError("zstd container requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return payload
+
+def dumps(document, compression=None):
+    """Serialize a JSON document as compact columnar bytes"""
+    payload = json.dumps(encode(document), separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return compress_bytes(payload, compression)
+
+def loads(payload):
+    """Load row-oriented or columnar JSON, in any container, as the original document"""
+    document = json.loads(decompress_bytes(payload))
+    return decode(document) if is_columnar(document) else document
+
+def save_document(document, output_path, compression=None):
+    with open(output_path, 'wb') as f:
+        f.write(dumps(document, compression))
+
+def load_document(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+# ============================================================================
+# Converter
+# ============================================================================
+
+def _as_text(document):
+    return json.dumps(document, indent=2, ensure_ascii=False)
+
+def round_trip(path, compression=None):
+    """Encode and decode a file, returning (original bytes, encoded bytes, lossless)"""
+    original = load_document(path)
+
+    encoded = dumps(original, compression)
+    restored = loads(encoded)
+    lossless = restored == original and _as_text(restored) == _as_text(original)
+    return os.path.getsize(path), len(encoded), lossless
+
+def bundled_files(data_dir=DATA_DIR):
+    paths = set()
+    for pattern in BUNDLED_PATTERNS:
+        paths.update(glob.glob(os.path.join(data_dir, pattern)))
+    return sorted(paths)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert generated data files to and from the columnar format")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    encode_parser = commands.add_parser("encode", help="write a columnar copy of a JSON file")
+    encode_parser.add_argument("input")
+    encode_parser.add_argument("output")
+    encode_parser.add_argument("--compress", choices=["gzip", "zstd"], help="wrap the output in a container")
+
+    decode_parser = commands.add_parser("decode", help="restore the original indented JSON")
+    decode_parser.add_argument("input")
+    decode_parser.add_argument("output")
+
+    check_parser = commands.add_parser("check", help="verify files round-trip losslessly")
+    check_parser.add_argument("paths", nargs="*", help=f"files to check (default: bundled files in {DATA_DIR})")
+    check_parser.add_argument("--compress", choices=["gzip", "zstd"])
+
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    if args.command == "encode":
+        save_document(load_document(args.input), args.output, args.compress)
+        print(f"✓ {args.input} ({os.path.getsize(args.input):,} bytes) → "
+              f"{args.output} ({os.path.getsize(args.output):,} bytes)")
+
+    elif args.command == "decode":
+        with open(args.output, 'w') as f:
+            json.dump(load_document(args.input), f, indent=2)
+        print(f"✓ Restored {args.output}")
+
+    elif args.command == "check":
+        paths = args.paths or bundled_files()
+        failures = 0
+        total_original = total_encoded = 0
+
+        for path in paths:
+            original, encoded, lossless = round_trip(path, args.compress)
+            total_original += original
+            total_encoded += encoded
+            if not lossless:
+                failures += 1
+            print(f"  {'✓' if lossless else '✗'} {os.path.relpath(path, DATA_DIR):<40} "
+                  f"{original:>10,} → {encoded:>9,} bytes ({encoded / original:.0%})")
+
+        print(f"\nTotal: {total_original:,} → {total_encoded:,} bytes")
+        if failures:
+            print(f"✗ {failures} file(s) did not round-trip")
+            sys.exit(1)
+        print(f"✓ All {len(paths)} files round-trip losslessly")
+
+if __name__ == "__main__":
+    main()
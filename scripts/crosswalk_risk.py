@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Materialize per-country automation risk files through the SOC crosswalks
+
+Only the US has occupation-level automation risk scores (combine_risks /
+calculate_combined_risk in fetch_ai_risk_data.py). Every other country's codes
+are joined to US SOC through its *_to_soc_mapping.json crosswalk in one
+vectorized pass, falling back to the US minor group (XX-XXX0) and broad group
+(XX-X000) exactly as DataLoader.getAutomationRisk does at runtime, and written
+as <cc>/<cc>_automation_risk_data.json in the same schema as the US file.
+
+The files feed risk_index.py and are not bundled: the app reads the index,
+and without it falls back to the US rows through the same crosswalks.
+
+Each run reports coverage per country and the many-to-one conflicts: US codes
+that several local occupations collapse onto, which therefore share one score.
+
+Usage:
+    python crosswalk_risk.py                      # from the bundled US risk file
+    python crosswalk_risk.py --source automation_risk_data.json ca de
+"""
+
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from percentile_tables import DATA_DIR, occupations_path
+from risk_index import MAPPING_FILES, load_mapping, risk_path
+
+COUNTRIES = ["ca", "au", "nz", "de", "fr", "es"]
+
+SCORE_COLUMNS = ['ai_risk', 'robotics_risk', 'overall_risk']
+
+# Conflicts listed per country in the report
+CONFLICT_EXAMPLES = 3
+
+def _load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def crosswalk_frame(countries, data_dir=DATA_DIR):
+    """One row per local occupation: country_code, soc_code, title, category, us_code"""
+    frames = []
+    for country_code in countries:
+        occupations = _load_json(occupations_path(country_code, data_dir))["occupations"]
+        frame = pd.DataFrame(occupations, columns=['soc_code', 'title', 'category'])
+        frame.insert(0, 'country_code', country_code)
+        frame['us_code'] = frame['soc_code'].map(load_mapping(country_code, data_dir))
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+def resolve_frame(crosswalk, us_risks):
+    """Join local codes to US scores: exact code, then minor group, then broad group"""
+    risk = pd.DataFrame(us_risks).drop_duplicates('soc_code', keep='first').set_index('soc_code')
+
+    us_code = crosswalk['us_code']
+    detailed = us_code.str.len() == 7
+    candidates = [
+        ("exact", us_code),
+        ("parent", (us_code.str[:-1] + "0").where(detailed)),
+        ("parent", (us_code.str[:4] + "000").where(detailed)),
+    ]
+
+    matched = pd.Series(None, index=crosswalk.index, dtype=object)
+    method = pd.Series("no_risk_data", index=crosswalk.index, dtype=object)
+    method[us_code.isna()] = "unmapped"
+
+    for name, codes in candidates:
+        hit = matched.isna() & codes.isin(risk.index)
+        matched[hit] = codes[hit]
+        method[hit] = name
+
+    resolved = crosswalk.assign(matched_code=matched, method=method)
+    scores = risk.reindex(matched.fillna(""))[SCORE_COLUMNS].reset_index(drop=True)
+    scores.index = crosswalk.index
+    return pd.concat([resolved, scores], axis=1)
+
+def conflicts(resolved):
+    """US codes that more than one local occupation of a country maps onto"""
+    matched = resolved[resolved['matched_code'].notna()]
+    sizes = matched.groupby(['country_code', 'matched_code']).size()
+    return sizes[sizes > 1].sort_values(ascending=False)
+
+def build_country_output(rows, country_code, us_metadata, total):
+    """A risk document in the schema of us_automation_risk_data.json"""
+    mapping_name = MAPPING_FILES[country_code]
+    return {
+        'automation_risks': [
+            {
+                'soc_code': row.soc_code,
+                'title': row.title,
+                'category': row.category,
+                'ai_risk': row.ai_risk,
+                'robotics_risk': row.robotics_risk,
+                'overall_risk': row.overall_risk,
+                'us_soc_code': row.matched_code,
+            }
+            for row in rows.itertuples(index=False)
+        ],
+        'metadata': {
+            'version': us_metadata.get('version', ''),
+            'last_updated': us_metadata.get('last_updated', ''),
+            'sources': us_metadata.get('sources', []) + [f'{mapping_name}.json crosswalk to US SOC'],
+            'note': (f"{us_metadata.get('note', '')} Derived from US SOC scores; "
+                     f"{len(rows)} of {total} occupations covered.").strip(),
+        }
+    }
+
+def materialize(us_risks, us_metadata, countries=COUNTRIES, data_dir=DATA_DIR):
+    """Resolve and write every country's risk file, returning the resolved frame"""
+    resolved = resolve_frame(crosswalk_frame(countries, data_dir), us_risks)
+
+    for country_code, rows in resolved.groupby('country_code', sort=False):
+        covered = rows[rows['matched_code'].notna()]
+        output = build_country_output(covered, country_code, us_metadata, len(rows))
+        with open(risk_path(country_code, data_dir), 'w') as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+
+    return resolved
+
+def print_report(resolved):
+    duplicate_targets = conflicts(resolved)
+
+    for country_code, rows in resolved.groupby('country_code', sort=False):
+        counts = rows['method'].value_counts()
+        covered = int(rows['matched_code'].notna().sum())
+        detail = ", ".join(f"{method}: {count}" for method, count in sorted(counts.items()))
+        print(f"\n{country_code}: {covered}/{len(rows)} occupations covered ({detail})")
+
+        if country_code not in duplicate_targets.index.get_level_values(0):
+            continue
+        country_conflicts = duplicate_targets.loc[country_code]
+        print(f"  Many-to-one: {len(country_conflicts)} US codes shared by "
+              f"{int(country_conflicts.sum())} occupations")
+        for us_code, size in country_conflicts.head(CONFLICT_EXAMPLES).items():
+            titles = rows.loc[rows['matched_code'] == us_code, 'title'].tolist()
+            print(f"    {us_code} ← {size}: {'; '.join(titles[:3])}{' ...' if size > 3 else ''}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Write per-country automation risk files via the SOC crosswalks")
+    parser.add_argument("countries", nargs="*", default=COUNTRIES, help=f"countries (default: {' '.join(COUNTRIES)})")
+    parser.add_argument("--source", default=risk_path("us"),
+                        help="US risk document produced by fetch_ai_risk_data.py (default: bundled US file)")
+    args = parser.parse_args()
+
+    source = _load_json(args.source)
+    print("=" * 60)
+    print(f"Crosswalking {len(source['automation_risks'])} US risk rows to {', '.join(args.countries)}")
+    print("=" * 60)
+
+    resolved = materialize(source['automation_risks'], source['metadata'], args.countries)
+    print_report(resolved)
+
+    print("\n" + "=" * 60)
+    for country_code in args.countries:
+        print(f"✓ Saved {risk_path(country_code)}")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Record-level deltas between two generated dataset releases
+
+A data refresh replaces whole files even when most medians and state rows are
+unchanged. This compares two release directories file by file and, inside
+each file, record by record: lists of objects keyed by soc_code or code are
+matched on that key, so a changed median is one op addressed as
+occupations / "15-1252" / by_state / "CA" / median rather than a rewritten file.
+
+A patch bundle (gzip container by default, see compact_format.py) holds:
+
+    {"format_version": 1, "from_version": "2024.1", "to_version": "2025.1",
+     "files": {"<relative path>": {
+         "status": "modified" | "added" | "removed",
+         "base":   {"bytes": n, "sha256": "..."},
+         "target": {"bytes": n, "sha256": "..."},
+         "layout": {...},          # json_layout layout of the target file, or
+         "encoding": {...},        # container of a compact_format columnar target
+         "ops": [op, ...]          # or "text": full target text, for added files
+     }}}                           # and layouts json_layout cannot reproduce;
+                                   # "data": base64 bytes for any other binary file
+
+Ops are arrays, applied in order to the parsed base document:
+
+    ["set", path, value]      replace the value at path, or append it if absent
+    ["del", path]             remove the dict key / keyed record at path
+    ["order", path, keys]     reorder a dict's keys or a keyed list's records
+
+Columnar files (see compact_format.py) are diffed as the documents they decode
+to and re-encoded in the target's container after patching, so converting a file
+to the columnar format costs no ops at all.
+
+Path segments are dict keys or, inside keyed lists, record keys. Every patch is
+checked against the base file's SHA-256 before it is applied and against the
+target's after. diff_file() applies its ops once before returning them and
+ships the full text instead if they do not reproduce the new file exactly.
+
+Usage:
+    python dataset_delta.py diff old/JSON new/JSON update.patch.json.gz
+    python dataset_delta.py apply update.patch.json.gz ../SuccessClaude/Data/JSON
+    python dataset_delta.py apply update.patch.json.gz old/JSON --output new/JSON
+    python dataset_delta.py check old/JSON new/JSON     # sizes only, nothing written
+"""
+
+import argparse
+import base64
+import copy
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import zlib
+
+import compact_format
+import json_layout
+
+FORMAT_VERSION = 1
+
+# Record keys of the keyed lists: occupations (soc_code), regions and countries (code)
+KEY_FIELDS = ["soc_code", "code"]
+
+class PatchError(Exception):
+    pass
+
+# ============================================================================
+# Document diff
+# ============================================================================
+
+def _key_field(*lists):
+    """The record key shared by every element of the lists, if it is unique in each"""
+    records = [record for items in lists for record in items]
+    if not records or not all(isinstance(record, dict) for record in records):
+        return None
+    for field in KEY_FIELDS:
+        if all(isinstance(record.get(field), str) for record in records) and \
+                all(len({record[field] for record in items}) == len(items) for items in lists):
+            return field
+    return None
+
+def _same(old, new):
+    # 1 == 1.0 == True in Python but not in the serialized text
+    return type(old) is type(new) and (old == new if not isinstance(old, (dict, list))
+                                       else json.dumps(old) == json.dumps(new))
+
+def _diff_mapping(old, new, path, ops):
+    for key in old:
+        if key not in new:
+            ops.append(["del", path + [key]])
+    for key, value in new.items():
+        if key not in old:
+            ops.append(["set", path + [key], value])
+        else:
+            _diff(old[key], value, path + [key], ops)
+
+    # set appends new keys, so anything else is a reorder
+    expected = [key for key in old if key in new] + [key for key in new if key not in old]
+    if expected != list(new):
+        ops.append(["order", path, list(new)])
+
+def _diff(old, new, path, ops):
+    if isinstance(old, dict) and isinstance(new, dict):
+        _diff_mapping(old, new, path, ops)
+        return
+    if isinstance(old, list) and isinstance(new, list):
+        field = _key_field(old, new)
+        if field is not None and old and new:
+            _diff_mapping({record[field]: record for record in old},
+                          {record[field]: record for record in new}, path, ops)
+            return
+    if not _same(old, new):
+        ops.append(["set", path, new])
+
+def diff_documents(old, new):
+    """Ops turning the old document into the new one"""
+    ops = []
+    _diff(old, new, [], ops)
+    return ops
+
+# ============================================================================
+# Document patch
+# ============================================================================
+
+class _Positions:
+    """Record key → position for the keyed lists of one document, built on first use"""
+
+    def __init__(self):
+        self.lists = {}
+
+    def get(self, records, record=None):
+        """(key field, {key: position}); record supplies the key field of an empty list"""
+        cached = self.lists.get(id(records))
+        # The cache holds the list itself, so its id cannot be reused while cached
+        if cached is None or cached[0] is not records:
+            field = _key_field(records) if records else _key_field([record])
+            cached = (records, field, {item[field]: i for i, item in enumerate(records)} if field else {})
+            self.lists[id(records)] = cached
+        return cached[1], cached[2]
+
+    def forget(self, records):
+        self.lists.pop(id(records), None)
+
+def _resolve(document, path, positions):
+    try:
+        for segment in path:
+            if isinstance(document, dict):
+                document = document[segment]
+            else:
+                document = document[positions.get(document)[1][segment]]
+    except (KeyError, TypeError, IndexError) as e:
+        raise PatchError(f"Path {path} not found") from e
+    return document
+
+def apply_ops(document, ops):
+    """Apply ops to a parsed document; returns the patched copy"""
+    document = copy.deepcopy(document)
+    positions = _Positions()
+    for op in ops:
+        kind, path = op[0], op[1]
+
+        if kind == "set" and not path:
+            document = copy.deepcopy(op[2])
+            continue
+
+        if kind == "order":
+            container = _resolve(document, path, positions)
+            if isinstance(container, dict):
+                reordered = {key: container[key] for key in op[2]}
+                container.clear()
+                container.update(reordered)
+            else:
+                field, _ = positions.get(container)
+                by_key = {record[field]: record for record in container}
+                container[:] = [by_key[key] for key in op[2]]
+                positions.forget(container)
+            continue
+
+        parent, segment = _resolve(document, path[:-1], positions), path[-1]
+        if kind not in ("set", "del"):
+            raise PatchError(f"Unknown op: {kind}")
+
+        if isinstance(parent, dict):
+            if kind == "set":
+                parent[segment] = copy.deepcopy(op[2])
+            elif segment in parent:
+                del parent[segment]
+            else:
+                raise PatchError(f"Path {path} not found")
+            continue
+
+        # Keyed list: set replaces the record with that key or appends it
+        _, index = positions.get(parent, op[2] if kind == "set" else None)
+        position = index.get(segment)
+        if kind == "set":
+            if position is None:
+                index[segment] = len(parent)
+                parent.append(copy.deepcopy(op[2]))
+            else:
+                parent[position] = copy.deepcopy(op[2])
+        elif position is None:
+            raise PatchError(f"Path {path} not found")
+        else:
+            del parent[position]
+            positions.forget(parent)
+    return document
+
+# ============================================================================
+# File patches
+# ============================================================================
+
+def _fingerprint(payload):
+    return {"bytes": len(payload), "sha256": hashlib.sha256(payload).hexdigest()}
+
+def _parse(payload):
+    """(document, encoding) of a file; encoding is None for plain JSON text
+
+    Columnar files come back decoded, with the container to re-encode them in.
+    Anything else (compressed plain JSON, other binary data) raises PatchError.
+    """
+    try:
+        decompressed = compact_format.decompress_bytes(payload)
+        document = json.loads(decompressed)
+        if compact_format.is_columnar(document):
+            compression = ("gzip" if payload.startswith(compact_format.GZIP_MAGIC)
+                           else "zstd" if payload.startswith(compact_format.ZSTD_MAGIC) else None)
+            return compact_format.decode(document), {"format": compact_format.FORMAT_NAME, "compression": compression}
+    except (ValueError, KeyError, OSError, EOFError, zlib.error, compact_format.FormatError) as e:
+        # OSError and EOFError: bytes that only look like a gzip member
+        raise PatchError(f"Not a JSON document: {e}") from e
+    if decompressed is not payload:
+        raise PatchError("Compressed file is not in the columnar format")
+    return document, None
+
+def _full(payload):
+    """Entry fields carrying a whole file: its text, or base64 for binary files"""
+    try:
+        return {"text": payload.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {"data": base64.b64encode(payload).decode('ascii')}
+
+def diff_file(old_payload, new_payload):
+    """Patch entry for one file; old_payload is None for an added file, new_payload for a removed one"""
+    if new_payload is None:
+        return {"status": "removed", "base": _fingerprint(old_payload)}
+
+    target = _fingerprint(new_payload)
+    if old_payload is None:
+        return {"status": "added", "target": target, **_full(new_payload)}
+
+    entry = {"status": "modified", "base": _fingerprint(old_payload), "target": target}
+    try:
+        new_document, encoding = _parse(new_payload)
+        old_document, _ = _parse(old_payload)
+    except PatchError:
+        encoding = layout = None
+    else:
+        layout = json_layout.detect(new_payload.decode('utf-8'), new_document) if encoding is None else None
+
+    if encoding is not None or layout is not None:
+        if encoding is not None:
+            entry["encoding"] = encoding
+        else:
+            entry["layout"] = layout
+        entry["ops"] = diff_documents(old_document, new_document)
+        # Never hand out ops that do not reproduce the new file
+        try:
+            if apply_file(old_payload, entry) == new_payload:
+                return entry
+        except PatchError:
+            pass
+        entry.pop("encoding", None)
+        entry.pop("layout", None)
+        del entry["ops"]
+    entry.update(_full(new_payload))
+    return entry
+
+def apply_file(old_payload, entry):
+    """The patched file's bytes, or None for a removed file"""
+    if entry["status"] != "added" and _fingerprint(old_payload) != entry["base"]:
+        raise PatchError("Base file does not match the patch")
+    if entry["status"] == "removed":
+        return None
+
+    if "text" in entry:
+        payload = entry["text"].encode('utf-8')
+    elif "data" in entry:
+        payload = base64.b64decode(entry["data"])
+    else:
+        document = apply_ops(_parse(old_payload)[0], entry["ops"])
+        if "encoding" in entry:
+            try:
+                payload = compact_format.dumps(document, entry["encoding"]["compression"])
+            except compact_format.FormatError as e:
+                raise PatchError(str(e)) from e
+        else:
+            payload = json_layout.dumps(document, entry["layout"]).encode('utf-8')
+
+    if _fingerprint(payload) != entry["target"]:
+        raise PatchError("Patched file does not match the target")
+    return payload
+
+# ============================================================================
+# Releases
+# ============================================================================
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def release_files(data_dir):
+    """Relative paths of every JSON file in a release directory"""
+    paths = glob.glob(os.path.join(data_dir, "**", "*.json"), recursive=True)
+    return sorted(os.path.relpath(path, data_dir) for path in paths)
+
+def release_version(data_dir):
+    path = os.path.join(data_dir, "metadata.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get("data_version")
+
+def diff_releases(old_dir, new_dir):
+    """Patch bundle turning the files in old_dir into those in new_dir"""
+    old_files, new_files = set(release_files(old_dir)), set(release_files(new_dir))
+    files = {}
+    for name in sorted(old_files | new_files):
+        old_payload = _read(os.path.join(old_dir, name)) if name in old_files else None
+        new_payload = _read(os.path.join(new_dir, name)) if name in new_files else None
+        if old_payload != new_payload:
+            files[name] = diff_file(old_payload, new_payload)
+
+    return {
+        "format_version": FORMAT_VERSION,
+        "from_version": release_version(old_dir),
+        "to_version": release_version(new_dir),
+        "files": files,
+    }
+
+def apply_release(bundle, data_dir, output_dir=None):
+    """Apply a bundle to data_dir, in place or into a copy at output_dir"""
+    if bundle.get("format_version") != FORMAT_VERSION:
+        raise PatchError(f"Unsupported patch format: {bundle.get('format_version')}")
+
+    # Patch everything in memory first, so a bad base leaves no file half-updated
+    patched = {}
+    for name, entry in bundle["files"].items():
+        path = os.path.join(data_dir, name)
+        if entry["status"] != "added" and not os.path.exists(path):
+            raise PatchError(f"{name}: missing from {data_dir}")
+        try:
+            patched[name] = apply_file(_read(path) if entry["status"] != "added" else None, entry)
+        except PatchError as e:
+            raise PatchError(f"{name}: {e}") from e
+
+    if output_dir is not None:
+        shutil.copytree(data_dir, output_dir, dirs_exist_ok=True)
+        data_dir = output_dir
+
+    for name, payload in patched.items():
+        path = os.path.join(data_dir, name)
+        if payload is None:
+            os.remove(path)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written next to the target and renamed over it, so readers never see a partial file
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(temp_path, path)
+    return patched
+
+def save_bundle(bundle, path, compression="gzip"):
+    payload = json.dumps(bundle, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(compact_format.compress_bytes(payload, compression))
+
+def load_bundle(path):
+    return json.loads(compact_format.decompress_bytes(_read(path)))
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def _summary(bundle, new_dir=None):
+    statuses = [entry["status"] for entry in bundle["files"].values()]
+    ops = sum(len(entry.get("ops", [])) for entry in bundle["files"].values())
+    print(f"  {bundle['from_version']} → {bundle['to_version']}: {statuses.count('modified')} modified, "
+          f"{statuses.count('added')} added, {statuses.count('removed')} removed, {ops:,} ops")
+    if new_dir is not None:
+        full = sum(entry["target"]["bytes"] for entry in bundle["files"].values() if "target" in entry)
+        print(f"  Changed files in full: {full:,} bytes")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Record-level patches between generated dataset releases")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    diff_parser = commands.add_parser("diff", help="write a patch bundle between two release directories")
+    diff_parser.add_argument("old_dir")
+    diff_parser.add_argument("new_dir")
+    diff_parser.add_argument("output")
+    diff_parser.add_argument("--compress", choices=["gzip", "zstd", "none"], default="gzip")
+
+    apply_parser = commands.add_parser("apply", help="apply a patch bundle to a release directory")
+    apply_parser.add_argument("bundle")
+    apply_parser.add_argument("data_dir")
+    apply_parser.add_argument("--output", help="write the patched release here instead of in place")
+
+    check_parser = commands.add_parser("check", help="diff two releases and verify the patch in memory")
+    check_parser.add_argument("old_dir")
+    check_parser.add_argument("new_dir")
+    check_parser.add_argument("--compress", choices=["gzip", "zstd", "none"], default="gzip")
+
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    try:
+        if args.command == "diff":
+            bundle = diff_releases(args.old_dir, args.new_dir)
+            save_bundle(bundle, args.output, None if args.compress == "none" else args.compress)
+            print(f"✓ Wrote {args.output} ({os.path.getsize(args.output):,} bytes)")
+            _summary(bundle, args.new_dir)
+
+        elif args.command == "apply":
+            bundle = load_bundle(args.bundle)
+            patched = apply_release(bundle, args.data_dir, args.output)
+            print(f"✓ Patched {len(patched)} file(s) in {args.output or args.data_dir}")
+            _summary(bundle)
+
+        elif args.command == "check":
+            # diff_file already verifies every patch against its target
+            bundle = diff_releases(args.old_dir, args.new_dir)
+            payload = json.dumps(bundle, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+            compressed = compact_format.compress_bytes(payload, None if args.compress == "none" else args.compress)
+            _summary(bundle, args.new_dir)
+            print(f"✓ Patch bundle: {len(compressed):,} bytes; every file reproduces byte for byte")
+
+    except PatchError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
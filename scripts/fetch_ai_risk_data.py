@@ -3,29 +3,51 @@
 Fetch AI/Automation risk data from multiple sources and check coverage
 """
 
+import argparse
 import requests
 import json
 import pandas as pd
 from collections import defaultdict
 
+import instrumentation
+import intermediate_store
+import json_emitter
+from http_cache import fetch_cached
+from risk_index import parent_codes
+
 # Our BLS occupations
-BLS_DATA_PATH = "../SuccessClaude/Data/JSON/bls_oews_occupations.json"
+BLS_DATA_PATH = "../SuccessClaude/Data/JSON/us/us_bls_oews_occupations.json"
+
+OUTPUT_PATH = '../SuccessClaude/Data/JSON/us/us_automation_risk_data.json'
+
+# Name of the occupation list table in the intermediate store
+OCCUPATIONS_TABLE = "occupations"
 
+@instrumentation.staged("load_occupations")
 def load_our_occupations():
     """Load our existing occupation data"""
-    with open(BLS_DATA_PATH, 'r') as f:
-        data = json.load(f)
+    # The pretty-printed JSON is only parsed once per version of the file
+    digest = intermediate_store.file_sha256(BLS_DATA_PATH)
+    table = intermediate_store.load_table(digest, OCCUPATIONS_TABLE)
+
+    if table is None:
+        with open(BLS_DATA_PATH, 'r') as f:
+            data = json.load(f)
+
+        table = pd.DataFrame(data['occupations'], columns=['soc_code', 'title', 'category'])
+        table = intermediate_store.save_table(digest, OCCUPATIONS_TABLE, table)
 
     occupations = {}
-    for occ in data['occupations']:
-        occupations[occ['soc_code']] = {
-            'title': occ['title'],
-            'category': occ['category']
+    for soc_code, title, category in zip(table['soc_code'], table['title'], table['category']):
+        occupations[soc_code] = {
+            'title': title,
+            'category': category
         }
 
     print(f"Our occupations: {len(occupations)}")
     return occupations
 
+@instrumentation.staged("ai_exposure")
 def fetch_openai_gpt_impact():
     """
     Fetch OpenAI GPT Impact on Labor data
@@ -40,15 +62,17 @@ def fetch_openai_gpt_impact():
     url = "https://raw.githubusercontent.com/openai/gpt-impact-on-labor/main/occupation_exposures.csv"
 
     try:
-        response = requests.get(url, timeout=30)
-        if response.status_code == 404:
-            print("GitHub dataset not found, trying alternative source...")
-            # Try direct link from arXiv supplementary
-            return fetch_openai_alternative()
+        try:
+            csv_path = fetch_cached(url, timeout=30)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                print("GitHub dataset not found, trying alternative source...")
+                # Try direct link from arXiv supplementary
+                return fetch_openai_alternative()
+            raise
 
         # Parse CSV
-        from io import StringIO
-        df = pd.read_csv(StringIO(response.text))
+        df = pd.read_csv(csv_path)
 
         print(f"✓ Loaded {len(df)} occupations from OpenAI study")
 
@@ -110,6 +134,7 @@ def fetch_openai_alternative():
 
     return category_exposure
 
+@instrumentation.staged("automation")
 def fetch_frey_osborne_automation():
     """
     Fetch Frey & Osborne automation probability data
@@ -159,40 +184,9 @@ def calculate_combined_risk(ai_risk, robotics_risk):
     # Weighted combination - whichever is higher gets more weight
     return min(100, (ai_risk * 0.6 + robotics_risk * 0.4))
 
-def main():
-    print("="*60)
-    print("AI & Automation Risk Data Analyzer")
-    print("="*60)
-
-    # Load our occupations
-    our_occupations = load_our_occupations()
-
-    # Fetch AI exposure data
-    ai_data = fetch_openai_gpt_impact()
-
-    # Fetch automation risk data
-    automation_data = fetch_frey_osborne_automation()
-
-    # Calculate coverage
-    print("\n" + "="*60)
-    print("Coverage Analysis")
-    print("="*60)
-
-    if isinstance(ai_data, dict) and any('-' in k for k in ai_data.keys()):
-        # SOC-code level data
-        ai_covered = len([soc for soc in our_occupations.keys() if soc in ai_data])
-        print(f"AI data coverage: {ai_covered}/{len(our_occupations)} ({ai_covered/len(our_occupations)*100:.1f}%)")
-    else:
-        # Category-level data
-        print(f"AI data: Category-level estimates for {len(ai_data)} categories")
-
-    print(f"Automation data: Category-level estimates for {len(automation_data)} categories")
-
-    # Create combined dataset
-    print("\n" + "="*60)
-    print("Creating combined risk dataset...")
-    print("="*60)
-
+@instrumentation.staged("combine", rows_in=len)
+def combine_risks(our_occupations, ai_data, automation_data):
+    """Combine AI exposure and robotics risk into one record per occupation"""
     combined = []
 
     for soc_code, occ_data in our_occupations.items():
@@ -221,9 +215,32 @@ def main():
             'overall_risk': round(overall_risk, 1)
         })
 
-    # Save to JSON
-    output = {
-        'automation_risks': combined,
+    return combined
+
+def drop_inherited_rows(rows):
+    """Rows without the detailed codes that only repeat their parent group
+
+    The app falls back from a missing code to its minor group, then its broad
+    group (DataLoader.findParentAutomationRisk), so a row whose title, category
+    and scores equal those of the first parent group present adds nothing.
+    """
+    by_code = {}
+    for row in rows:
+        by_code.setdefault(row['soc_code'], row)
+
+    def inherited(row):
+        for parent in parent_codes(row['soc_code']):
+            if parent != row['soc_code'] and parent in by_code:
+                content = {key: value for key, value in row.items() if key != 'soc_code'}
+                return content == {key: value for key, value in by_code[parent].items() if key != 'soc_code'}
+        return False
+
+    return [row for row in rows if not inherited(row)]
+
+def build_output(combined):
+    """Prepare the final JSON document"""
+    return {
+        'automation_risks': drop_inherited_rows(combined),
         'metadata': {
             'version': '2024.1',
             'last_updated': '2024-12-28',
@@ -236,11 +253,58 @@ def main():
         }
     }
 
-    output_path = '../SuccessClaude/Data/JSON/automation_risk_data.json'
-    with open(output_path, 'w') as f:
-        json.dump(output, f, indent=2)
+def save_output(output, output_path=OUTPUT_PATH):
+    return json_emitter.emit(output_path, output)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build combined AI and automation risk data")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    instrumentation.start("fetch_ai_risk_data", parse_args())
+
+    print("="*60)
+    print("AI & Automation Risk Data Analyzer")
+    print("="*60)
+
+    # Load our occupations
+    our_occupations = load_our_occupations()
+
+    # Fetch AI exposure data
+    ai_data = fetch_openai_gpt_impact()
+
+    # Fetch automation risk data
+    automation_data = fetch_frey_osborne_automation()
+
+    # Calculate coverage
+    print("\n" + "="*60)
+    print("Coverage Analysis")
+    print("="*60)
+
+    if isinstance(ai_data, dict) and any('-' in k for k in ai_data.keys()):
+        # SOC-code level data
+        ai_covered = len([soc for soc in our_occupations.keys() if soc in ai_data])
+        print(f"AI data coverage: {ai_covered}/{len(our_occupations)} ({ai_covered/len(our_occupations)*100:.1f}%)")
+    else:
+        # Category-level data
+        print(f"AI data: Category-level estimates for {len(ai_data)} categories")
+
+    print(f"Automation data: Category-level estimates for {len(automation_data)} categories")
+
+    # Create combined dataset
+    print("\n" + "="*60)
+    print("Creating combined risk dataset...")
+    print("="*60)
+
+    combined = combine_risks(our_occupations, ai_data, automation_data)
+
+    # Save to JSON
+    with instrumentation.stage("serialize", rows_in=len(combined)) as record:
+        save_output(build_output(combined))
+        record.wrote(OUTPUT_PATH)
 
-    print(f"✓ Saved combined risk data to {output_path}")
+    print(f"✓ Saved combined risk data to {OUTPUT_PATH}")
     print(f"✓ Total occupations: {len(combined)}")
 
     # Show sample statistics
@@ -4,17 +4,60 @@ Fetch real occupation wage data from BLS OEWS (Occupational Employment and Wage
 https://www.bls.gov/oes/current/oes_nat.htm
 """
 
-import requests
-import json
+import argparse
+import os
+import shutil
+import tempfile
+import zipfile
+import numpy as np
+import openpyxl
 import pandas as pd
+from contextlib import contextmanager
 from io import StringIO
-import time
 from collections import defaultdict
 
+import after_tax
+import http_cache
+import instrumentation
+import intermediate_store
+import json_emitter
+import occupation_shards
+import percentile_tables
+import rank_indexes
+import search_index
+from fetch_engine import run_concurrently
+from http_cache import fetch_cached
+
 # BLS OEWS Data Files (May 2023 - most recent)
 NATIONAL_URL = "https://www.bls.gov/oes/special.requests/oesm23nat.zip"
 STATE_URL = "https://www.bls.gov/oes/special.requests/oesm23st.zip"
 
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+# Streaming ingest: downloads are spooled to the on-disk cache in blocks and
+# sheets are processed CHUNK_SIZE rows at a time, so peak memory does not grow
+# with the file
+SPOOL_BLOCK_SIZE = 1024 * 1024
+CHUNK_SIZE = 50000
+
+# Name of the parsed-sheet table in the intermediate store
+SHEET_TABLE = "sheet"
+
+OUTPUT_PATH = "../SuccessClaude/Data/JSON/us/us_bls_oews_occupations.json"
+PERCENTILES_OUTPUT_PATH = "../SuccessClaude/Data/JSON/us/us_percentile_tables.json"
+RANK_INDEXES_OUTPUT_PATH = "../SuccessClaude/Data/JSON/us/us_rank_indexes.json"
+SEARCH_INDEX_OUTPUT_PATH = "../SuccessClaude/Data/JSON/us/us_search_index.json"
+SHARDS_OUTPUT_DIR = "../SuccessClaude/Data/JSON/us"
+
+# Occupations are converted to the output schema and annotated with after-tax
+# values this many at a time while they are written
+OUTPUT_BATCH_SIZE = 256
+
+# Annual wage percentile columns, in percentile_tables.QUANTILES order (A_MEDIAN is the 50th)
+PERCENTILE_COLUMNS = ['A_PCT10', 'A_PCT25', 'A_MEDIAN', 'A_PCT75', 'A_PCT90']
+
 # Occupation categories mapping (SOC Major Groups)
 CATEGORIES = {
     "11": "Management",
@@ -55,112 +98,282 @@ STATE_FIPS = {
     "56": "WY"
 }
 
+# Reverse mapping from state codes and names to state codes
+STATE_NAMES = {v: v for v in STATE_FIPS.values()}  # CA: CA, etc.
+STATE_NAMES.update({
+    "Alabama": "AL", "Alaska": "AK", "Arizona": "AZ", "Arkansas": "AR",
+    "California": "CA", "Colorado": "CO", "Connecticut": "CT", "Delaware": "DE",
+    "District of Columbia": "DC", "Florida": "FL", "Georgia": "GA", "Hawaii": "HI",
+    "Idaho": "ID", "Illinois": "IL", "Indiana": "IN", "Iowa": "IA",
+    "Kansas": "KS", "Kentucky": "KY", "Louisiana": "LA", "Maine": "ME",
+    "Maryland": "MD", "Massachusetts": "MA", "Michigan": "MI", "Minnesota": "MN",
+    "Mississippi": "MS", "Missouri": "MO", "Montana": "MT", "Nebraska": "NE",
+    "Nevada": "NV", "New Hampshire": "NH", "New Jersey": "NJ", "New Mexico": "NM",
+    "New York": "NY", "North Carolina": "NC", "North Dakota": "ND", "Ohio": "OH",
+    "Oklahoma": "OK", "Oregon": "OR", "Pennsylvania": "PA", "Rhode Island": "RI",
+    "South Carolina": "SC", "South Dakota": "SD", "Tennessee": "TN", "Texas": "TX",
+    "Utah": "UT", "Vermont": "VT", "Virginia": "VA", "Washington": "WA",
+    "West Virginia": "WV", "Wisconsin": "WI", "Wyoming": "WY"
+})
+
+# Candidate column names, in order of preference, across OEWS file vintages
+AREA_COLUMNS = ['AREA', 'ST', 'STATE', 'AREA_NAME', 'ST_NAME', 'STATE_NAME']
+SOC_COLUMNS = ['OCC_CODE', 'OCCCODE', 'SOC_CODE']
+
+def _excel_members(zip_file):
+    """Workbooks in an archive, data files (national_M2023_dl.xlsx) before field descriptions"""
+    excel_files = [f for f in zip_file.namelist() if f.endswith('.xlsx')]
+    excel_files.sort(key=lambda name: '_dl' not in os.path.basename(name).lower())
+    return excel_files
+
+def archive_members(archive_path):
+    """Data workbooks in a downloaded BLS archive (the MSA archive has a metro and a nonmetro one)"""
+    with zipfile.ZipFile(archive_path) as zip_file:
+        return [name for name in _excel_members(zip_file) if '_dl' in os.path.basename(name).lower()]
+
+@contextmanager
+def open_excel_from_zip(archive_path, member=None):
+    """Yield a file handle on the xlsx (or the named member) inside a downloaded BLS ZIP archive"""
+    # BLS provides ZIP files, need to extract
+    with zipfile.ZipFile(archive_path) as zip_file:
+        # Find the Excel file in the ZIP
+        excel_files = [member] if member else _excel_members(zip_file)
+
+        if not excel_files:
+            yield None
+            return
+
+        with tempfile.TemporaryFile() as workbook:
+            with instrumentation.stage("unzip", detail=excel_files[0]) as record:
+                with zip_file.open(excel_files[0]) as source:
+                    shutil.copyfileobj(source, workbook, SPOOL_BLOCK_SIZE)
+                record.bytes_read = zip_file.getinfo(excel_files[0]).compress_size
+                record.bytes_written = workbook.tell()
+            workbook.seek(0)
+            yield workbook
+
 def download_and_parse_excel(url):
     """Download Excel file from BLS and parse it"""
     print(f"Downloading {url}...")
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-    }
-
     try:
-        response = requests.get(url, headers=headers, timeout=60)
-        response.raise_for_status()
+        archive_path = fetch_cached(url, headers=HEADERS, timeout=60)
+        return parse_archive(archive_path)
 
-        # BLS provides ZIP files, need to extract
-        import zipfile
-        from io import BytesIO
+    except Exception as e:
+        print(f"Error downloading/parsing: {e}")
+        return None
 
-        zip_file = zipfile.ZipFile(BytesIO(response.content))
+@instrumentation.staged("parse")
+def parse_archive(archive_path):
+    """Parse the sheet in a downloaded BLS archive, or None if it has no workbook"""
+    digest = intermediate_store.file_sha256(archive_path)
 
-        # Find the Excel file in the ZIP
-        excel_files = [f for f in zip_file.namelist() if f.endswith('.xlsx')]
+    # Re-runs on an unchanged archive skip the Excel parse entirely
+    df = intermediate_store.load_table(digest, SHEET_TABLE)
+    if df is not None:
+        print(f"✓ Loaded parsed sheet from intermediate store ({len(df):,} rows)")
+        return df
 
-        if not excel_files:
+    with open_excel_from_zip(archive_path) as workbook:
+        if workbook is None:
             print(f"No Excel files found in ZIP")
             return None
 
-        excel_data = zip_file.read(excel_files[0])
-        df = pd.read_excel(BytesIO(excel_data))
+        df = pd.read_excel(workbook)
 
-        return df
+    return intermediate_store.save_table(digest, SHEET_TABLE, df)
+
+def read_workbook_chunks(archive_path, chunk_size, member=None):
+    """Read the first sheet of a BLS archive row by row, yielding DataFrames of chunk_size rows"""
+    with open_excel_from_zip(archive_path, member) as workbook:
+        if workbook is None:
+            print(f"No Excel files found in ZIP")
+            return
+
+        book = openpyxl.load_workbook(workbook, read_only=True, data_only=True)
+        try:
+            sheet = book.worksheets[0]
+            # Dimensions recorded in BLS files are not always reliable
+            sheet.reset_dimensions()
+
+            rows = sheet.iter_rows(values_only=True)
+            columns = next(rows, None)
+            if columns is None:
+                return
+
+            # Trailing empty cells are not stored, so short rows are padded to the header
+            width = len(columns)
+            chunk = []
+            for row in rows:
+                if len(row) < width:
+                    row = row + (None,) * (width - len(row))
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield pd.DataFrame(chunk, columns=columns)
+                    chunk = []
+
+            if chunk:
+                yield pd.DataFrame(chunk, columns=columns)
+        finally:
+            book.close()
+
+def iter_excel_chunks(url, chunk_size=CHUNK_SIZE, member=None):
+    """Download Excel file from BLS and yield it as DataFrames of at most chunk_size rows"""
+    print(f"Streaming {url}{f' ({member})' if member else ''} in chunks of {chunk_size:,} rows...")
+
+    # Archives with several workbooks keep one table per workbook
+    table = SHEET_TABLE
+    if member:
+        table = f"{SHEET_TABLE}_{os.path.splitext(os.path.basename(member))[0].lower()}"
+
+    streamed = False
+    try:
+        archive_path = fetch_cached(url, headers=HEADERS, timeout=60)
+        digest = intermediate_store.file_sha256(archive_path)
+
+        if intermediate_store.has_table(digest, table):
+            print(f"✓ Reading parsed sheet from intermediate store")
+            for chunk in intermediate_store.iter_table(digest, table, chunk_size):
+                streamed = True
+                yield chunk
+            return
+
+        # Chunks are stored as they are parsed; the table is only kept if the whole sheet was read
+        with intermediate_store.TableWriter(digest, table) as writer:
+            for chunk in read_workbook_chunks(archive_path, chunk_size, member):
+                chunk = intermediate_store.normalize_frame(chunk)
+                writer.write(chunk)
+                streamed = True
+                yield chunk
 
     except Exception as e:
-        print(f"Error downloading/parsing: {e}")
-        return None
+        # Callers fall back when nothing arrives; once chunks went out, stopping quietly would truncate the data
+        if streamed:
+            raise
+        print(f"Error streaming/parsing: {e}")
 
-def fetch_national_data():
+@instrumentation.staged("national")
+def fetch_national_data(stream=False, chunk_size=CHUNK_SIZE):
     """Fetch national occupation data from BLS OEWS"""
     print("=" * 60)
     print("Fetching national occupation data from BLS OEWS...")
     print("=" * 60)
 
+    if stream:
+        occupations = {}
+        for chunk in iter_excel_chunks(NATIONAL_URL, chunk_size):
+            occupations.update(build_national_occupations(chunk))
+
+        if not occupations:
+            print("Failed to stream national data, using API fallback...")
+            return fetch_national_data_api()
+
+        print(f"✓ Processed {len(occupations)} occupations")
+        return occupations
+
     df = download_and_parse_excel(NATIONAL_URL)
 
     if df is None:
         print("Failed to download national data, using API fallback...")
         return fetch_national_data_api()
 
-    occupations = {}
+    occupations = build_national_occupations(df)
+
+    print(f"✓ Processed {len(occupations)} occupations")
+    return occupations
 
+def _column(df, name, default=''):
+    """Return a column as a Series, or a constant Series if the file lacks it"""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index, dtype=object)
+
+def _text(values):
+    """Stringify and strip a column the way str(value).strip() would, with missing values as 'nan'"""
+    text = values.map(str).astype(object).str.strip()
+    return text.where(values.notna(), 'nan')
+
+def _whole_dollars(values):
+    """Coerce wage values to truncated whole dollars (NaN where not numeric)"""
+    numbers = pd.to_numeric(values, errors='coerce').astype(float)
+    numbers[~np.isfinite(numbers)] = np.nan
+    return np.trunc(numbers)
+
+def _percentile_frame(df):
+    """Whole-dollar percentile columns; BLS special codes (e.g. '#' for top-coded wages) become NaN"""
+    return pd.DataFrame({
+        name: _whole_dollars(_text(_column(df, name, None)).str.replace(',', '', regex=False))
+        for name in PERCENTILE_COLUMNS
+    }, index=df.index)
+
+def _percentile_lists(frame):
+    """Per-row percentile lists with None for unpublished points"""
+    return [
+        [None if np.isnan(value) else int(value) for value in row]
+        for row in frame[PERCENTILE_COLUMNS].itertuples(index=False, name=None)
+    ]
+
+@instrumentation.staged("process_national", rows_in=len)
+def build_national_occupations(df):
+    """Build the occupations dict from a national OEWS frame using column operations"""
     # BLS OEWS columns:
     # OCC_CODE, OCC_TITLE, TOT_EMP, H_MEAN, A_MEAN, MEAN_PRSE, H_MEDIAN, A_MEDIAN, etc.
+    soc_codes = _text(_column(df, 'OCC_CODE'))
+
+    # Only want detailed occupations: skip aggregated categories,
+    # broad occupational groups (ending in 0000) and the all-occupations total
+    detailed = (
+        soc_codes.str.contains('-', regex=False)
+        & ~soc_codes.str.endswith('-0000')
+        & ~soc_codes.str.startswith('00-')
+    )
+
+    median = _whole_dollars(_column(df, 'A_MEDIAN', np.nan))
+    mean = _whole_dollars(_column(df, 'A_MEAN', np.nan))
+
+    # Skip rows without wage data (including special BLS codes) and unrealistic values
+    keep = detailed & median.notna() & mean.notna() & median.between(10000, 500000)
+
+    frame = pd.DataFrame({
+        'soc_code': soc_codes[keep],
+        'title': _text(_column(df, 'OCC_TITLE')[keep]),
+        'median': median[keep].astype(np.int64),
+        'mean': mean[keep].astype(np.int64),
+    })
+    frame = frame.join(_percentile_frame(df)[keep])
+    # Later rows win, as they did when the dict was filled row by row
+    frame = frame.drop_duplicates(subset='soc_code', keep='last')
 
-    for _, row in df.iterrows():
-        try:
-            soc_code = str(row.get('OCC_CODE', '')).strip()
-
-            # Skip aggregated categories (only want detailed occupations)
-            if not soc_code or '-' not in soc_code:
-                continue
-
-            # Skip broad occupational groups (ending in 0000, 0)
-            if soc_code.endswith('-0000') or soc_code.startswith('00-'):
-                continue
-
-            # Get major group for category
-            major_group = soc_code.split('-')[0]
-            category = CATEGORIES.get(major_group, "Other")
-
-            title = str(row.get('OCC_TITLE', '')).strip()
-
-            # Get wage data (annual)
-            a_median = row.get('A_MEDIAN')
-            a_mean = row.get('A_MEAN')
-
-            # Skip if no wage data
-            if pd.isna(a_median) or pd.isna(a_mean):
-                continue
-
-            # Convert to int, handling special values
-            try:
-                median = int(float(a_median))
-                mean = int(float(a_mean))
-            except (ValueError, TypeError):
-                continue
-
-            # Skip unrealistic values
-            if median < 10000 or median > 500000:
-                continue
-
-            # Estimate top 10% (usually ~2x median for most occupations)
-            top_10 = int(median * 2.2)
-
-            occupations[soc_code] = {
-                "soc_code": soc_code,
-                "title": title,
-                "category": category,
-                "national_median": median,
-                "national_mean": mean,
-                "top_10_percent": top_10,
-                "by_state": {},
-                "age_distribution": {}
-            }
+    # Get major group for category
+    frame['category'] = frame['soc_code'].str.split('-').str[0].map(CATEGORIES).fillna("Other")
 
-        except Exception as e:
-            continue
+    # Top 10% threshold is the published 90th percentile; estimate it
+    # (usually ~2x median for most occupations) where BLS top-codes or omits it
+    frame['top_10'] = frame['A_PCT90'].fillna(np.trunc(frame['median'] * 2.2)).astype(np.int64)
+
+    occupations = {}
+    for soc_code, title, category, median, mean, top_10, percentiles in zip(
+        frame['soc_code'].tolist(),
+        frame['title'].tolist(),
+        frame['category'].tolist(),
+        frame['median'].tolist(),
+        frame['mean'].tolist(),
+        frame['top_10'].tolist(),
+        _percentile_lists(frame),
+    ):
+        occupations[soc_code] = {
+            "soc_code": soc_code,
+            "title": title,
+            "category": category,
+            "national_median": median,
+            "national_mean": mean,
+            "top_10_percent": top_10,
+            "by_state": {},
+            "age_distribution": {},
+            "percentiles": percentiles,
+        }
 
-    print(f"✓ Processed {len(occupations)} occupations")
     return occupations
 
 def fetch_national_data_api():
@@ -170,140 +383,43 @@ def fetch_national_data_api():
     # For now, return empty dict - we'll populate from state data
     return {}
 
-def fetch_state_data(occupations):
+@instrumentation.staged("state")
+def fetch_state_data(occupations, stream=False, chunk_size=CHUNK_SIZE):
     """Fetch state-level occupation data"""
     print("\nFetching state-level occupation data...")
 
-    df = download_and_parse_excel(STATE_URL)
-
-    if df is None:
-        print("Failed to download state data")
-        return occupations
-
-    # Print first few rows to debug
-    print(f"State data ALL columns: {list(df.columns)}")
-    print(f"Total rows: {len(df)}")
-
-    # Sample some SOC codes from state file
-    sample_socs = df['OCC_CODE'].unique()[:10] if 'OCC_CODE' in df.columns else []
-    print(f"Sample SOC codes from state file: {list(sample_socs)}")
-    print(f"Sample SOC codes from national: {list(occupations.keys())[:10]}")
-
-    # BLS state file columns (check actual column names)
-    # Might be: AREA, AREA_NAME, OCC_CODE, OCC_TITLE, TOT_EMP, A_MEAN, A_MEDIAN
+    if stream:
+        chunks = iter_excel_chunks(STATE_URL, chunk_size)
+    else:
+        df = download_and_parse_excel(STATE_URL)
+        chunks = [df] if df is not None else []
 
     state_count = defaultdict(int)
     skip_reasons = defaultdict(int)
     matched_count = 0
+    total_rows = 0
 
-    # Create reverse mapping for state names
-    STATE_NAMES = {v: v for v in STATE_FIPS.values()}  # CA: CA, etc.
-    STATE_NAMES.update({
-        "Alabama": "AL", "Alaska": "AK", "Arizona": "AZ", "Arkansas": "AR",
-        "California": "CA", "Colorado": "CO", "Connecticut": "CT", "Delaware": "DE",
-        "District of Columbia": "DC", "Florida": "FL", "Georgia": "GA", "Hawaii": "HI",
-        "Idaho": "ID", "Illinois": "IL", "Indiana": "IN", "Iowa": "IA",
-        "Kansas": "KS", "Kentucky": "KY", "Louisiana": "LA", "Maine": "ME",
-        "Maryland": "MD", "Massachusetts": "MA", "Michigan": "MI", "Minnesota": "MN",
-        "Mississippi": "MS", "Missouri": "MO", "Montana": "MT", "Nebraska": "NE",
-        "Nevada": "NV", "New Hampshire": "NH", "New Jersey": "NJ", "New Mexico": "NM",
-        "New York": "NY", "North Carolina": "NC", "North Dakota": "ND", "Ohio": "OH",
-        "Oklahoma": "OK", "Oregon": "OR", "Pennsylvania": "PA", "Rhode Island": "RI",
-        "South Carolina": "SC", "South Dakota": "SD", "Tennessee": "TN", "Texas": "TX",
-        "Utah": "UT", "Vermont": "VT", "Virginia": "VA", "Washington": "WA",
-        "West Virginia": "WV", "Wisconsin": "WI", "Wyoming": "WY"
-    })
+    for df in chunks:
+        if total_rows == 0:
+            # Print first few rows to debug
+            print(f"State data ALL columns: {list(df.columns)}")
 
-    for _, row in df.iterrows():
-        try:
-            # Try different column name variations
-            area = None
-            for col_name in ['AREA', 'ST', 'STATE', 'AREA_NAME', 'ST_NAME', 'STATE_NAME']:
-                if col_name in df.columns:
-                    area = str(row.get(col_name, '')).strip()
-                    if area:
-                        break
-
-            if not area:
-                skip_reasons['no_area'] += 1
-                continue
-
-            # Map area to state code
-            st = None
-
-            # Check if it's already a 2-letter code
-            if len(area) == 2 and area in STATE_FIPS.values():
-                st = area
-            # Check if it's a FIPS code
-            elif area.isdigit():
-                st = STATE_FIPS.get(area.zfill(2))
-            # Check if it's a state name
-            else:
-                st = STATE_NAMES.get(area)
-
-            if not st:
-                skip_reasons['no_state_match'] += 1
-                continue
-
-            # Get occupation code
-            soc_code = None
-            for col_name in ['OCC_CODE', 'OCCCODE', 'SOC_CODE']:
-                if col_name in df.columns:
-                    soc_code = str(row.get(col_name, '')).strip()
-                    if soc_code:
-                        break
-
-            if not soc_code:
-                skip_reasons['no_soc_code'] += 1
-                continue
-
-            # Try exact match first
-            if soc_code not in occupations:
-                # Skip if it's a broad category not in our list
-                skip_reasons['soc_not_in_occupations'] += 1
-                continue
-
-            # Get wage data
-            a_median = row.get('A_MEDIAN')
-            a_mean = row.get('A_MEAN')
-            employment = row.get('TOT_EMP', 0)
-
-            # Skip if missing or special values
-            if pd.isna(a_median) or pd.isna(a_mean):
-                skip_reasons['missing_wage_data'] += 1
-                continue
-
-            # Handle special BLS codes (*, #, etc.)
-            if isinstance(a_median, str) and not a_median.replace(',', '').replace('.', '').replace('-', '').isdigit():
-                skip_reasons['special_median_code'] += 1
-                continue
-            if isinstance(a_mean, str) and not a_mean.replace(',', '').replace('.', '').replace('-', '').isdigit():
-                skip_reasons['special_mean_code'] += 1
-                continue
-
-            try:
-                median = int(float(str(a_median).replace(',', '')))
-                mean = int(float(str(a_mean).replace(',', '')))
-                emp = int(float(str(employment).replace(',', ''))) if not pd.isna(employment) and str(employment).replace(',', '').replace('.', '').isdigit() else 0
-            except (ValueError, TypeError):
-                continue
-
-            # Skip unrealistic values
-            if median < 10000 or median > 500000:
-                continue
-
-            occupations[soc_code]["by_state"][st] = {
-                "median": median,
-                "mean": mean,
-                "employment": emp
-            }
+            # Sample some SOC codes from state file
+            sample_socs = df['OCC_CODE'].unique()[:10] if 'OCC_CODE' in df.columns else []
+            print(f"Sample SOC codes from state file: {list(sample_socs)}")
+            print(f"Sample SOC codes from national: {list(occupations.keys())[:10]}")
+
+        # BLS state file columns (check actual column names)
+        # Might be: AREA, AREA_NAME, OCC_CODE, OCC_TITLE, TOT_EMP, A_MEAN, A_MEDIAN
+        total_rows += len(df)
+        matched_count += apply_state_frame(df, occupations, state_count, skip_reasons)
 
-            state_count[st] += 1
-            matched_count += 1
+    instrumentation.record().rows_in = total_rows
+    if total_rows == 0:
+        print("Failed to download state data")
+        return occupations
 
-        except Exception as e:
-            skip_reasons['exception'] += 1
-            continue
+    print(f"Total rows: {total_rows}")
 
     print(f"✓ Added state data for {len(state_count)} states")
     print(f"✓ Total matched rows: {matched_count}")
@@ -316,6 +432,116 @@ def fetch_state_data(occupations):
 
     return occupations
 
+def _first_present(df, candidates):
+    """Resolve candidate column names once per file, falling through on empty values"""
+    present = [name for name in candidates if name in df.columns]
+    if not present:
+        return None
+
+    values = _text(df[present[0]])
+    for name in present[1:]:
+        values = values.mask(values == '', _text(df[name]))
+    return values
+
+def _is_special_code(values):
+    """Mask string cells that are BLS special markers (*, #, etc.) rather than numbers"""
+    if not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+        return pd.Series(False, index=values.index)
+
+    is_str = values.map(lambda v: isinstance(v, str)).astype(bool)
+    digits = (
+        values[is_str].astype(object).str.replace(',', '', regex=False)
+        .str.replace('.', '', regex=False).str.replace('-', '', regex=False)
+    )
+    special = pd.Series(False, index=values.index)
+    special[is_str] = ~digits.str.isdigit().astype(bool)
+    return special
+
+@instrumentation.staged("process_state", rows_in=len, rows_out=int)
+def apply_state_frame(df, occupations, state_count, skip_reasons):
+    """Merge a state OEWS frame into occupations[...]["by_state"], returning matched rows"""
+    remaining = pd.Series(True, index=df.index)
+
+    def drop(reason, mask):
+        nonlocal remaining
+        skipped = remaining & mask
+        if reason:
+            count = int(skipped.sum())
+            if count:
+                skip_reasons[reason] += count
+        remaining = remaining & ~mask
+
+    area = _first_present(df, AREA_COLUMNS)
+    if area is None:
+        area = pd.Series('', index=df.index, dtype=object)
+    drop('no_area', area == '')
+
+    # Map area to state code: 2-letter codes and state names map directly,
+    # numeric areas are FIPS codes
+    is_fips = area.str.isdigit().astype(bool)
+    st = area.map(STATE_NAMES)
+    st[is_fips] = area[is_fips].str.zfill(2).map(STATE_FIPS)
+    drop('no_state_match', st.isna())
+
+    soc_codes = _first_present(df, SOC_COLUMNS)
+    if soc_codes is None:
+        soc_codes = pd.Series('', index=df.index, dtype=object)
+    drop('no_soc_code', soc_codes == '')
+
+    # Broad categories not in our national list are skipped
+    drop('soc_not_in_occupations', ~soc_codes.isin(occupations.keys()))
+
+    a_median = _column(df, 'A_MEDIAN', None)
+    a_mean = _column(df, 'A_MEAN', None)
+    drop('missing_wage_data', a_median.isna() | a_mean.isna())
+
+    # Handle special BLS codes (*, #, etc.)
+    drop('special_median_code', _is_special_code(a_median))
+    drop('special_mean_code', _is_special_code(a_mean))
+
+    median = _whole_dollars(_text(a_median).str.replace(',', '', regex=False))
+    mean = _whole_dollars(_text(a_mean).str.replace(',', '', regex=False))
+
+    employment = _text(_column(df, 'TOT_EMP', None)).str.replace(',', '', regex=False)
+    has_employment = (
+        _column(df, 'TOT_EMP', None).notna()
+        & employment.str.replace('.', '', regex=False).str.isdigit().astype(bool)
+    )
+    emp = _whole_dollars(employment.where(has_employment, '0'))
+
+    # Unparseable values and unrealistic medians are dropped without a reason
+    drop(None, median.isna() | mean.isna() | emp.isna())
+    drop(None, ~median.between(10000, 500000))
+
+    matched = pd.DataFrame({
+        'soc_code': soc_codes[remaining],
+        'st': st[remaining],
+        'median': median[remaining].astype(np.int64),
+        'mean': mean[remaining].astype(np.int64),
+        'employment': emp[remaining].astype(np.int64),
+    })
+    matched = matched.join(_percentile_frame(df)[remaining])
+
+    for soc_code, group in matched.groupby('soc_code', sort=False):
+        occupations[soc_code]["by_state"].update(zip(
+            group['st'].tolist(),
+            (
+                {"median": median, "mean": mean, "employment": emp, "percentiles": percentiles}
+                for median, mean, emp, percentiles in zip(
+                    group['median'].tolist(),
+                    group['mean'].tolist(),
+                    group['employment'].tolist(),
+                    _percentile_lists(group),
+                )
+            ),
+        ))
+
+    for st_code, count in matched['st'].value_counts().items():
+        state_count[st_code] += int(count)
+
+    return len(matched)
+
+@instrumentation.staged("age_distribution", rows_in=len)
 def add_age_distribution(occupations):
     """Add age distribution estimates based on national data"""
     print("\nCalculating age distribution estimates...")
@@ -357,55 +583,141 @@ def add_age_distribution(occupations):
 
     return occupations
 
+def _without_percentiles(occ):
+    """Occupation in the bundled schema; percentiles ship separately as quantile tables"""
+    occ = {key: value for key, value in occ.items() if key != "percentiles"}
+    occ["by_state"] = {
+        st: {key: value for key, value in stats.items() if key != "percentiles"}
+        for st, stats in occ["by_state"].items()
+    }
+    return occ
+
+def iter_occupations(occupations):
+    """Occupations in the bundled schema, in SOC code order, produced a batch at a time"""
+    ordered = sorted(occupations.values(), key=lambda x: x["soc_code"])
+    for start in range(0, len(ordered), OUTPUT_BATCH_SIZE):
+        batch = [_without_percentiles(occ) for occ in ordered[start:start + OUTPUT_BATCH_SIZE]]
+        after_tax.annotate_occupations(batch, "us")
+        yield from batch
+
+def build_output(occupations):
+    """Prepare the final JSON document; its occupations are a generator, consumed once"""
+    return {
+        "occupations": iter_occupations(occupations),
+        "metadata": {
+            "version": "2024.1",
+            "last_updated": "2024-12-28",
+            "source": "U.S. Bureau of Labor Statistics OEWS May 2023",
+            "source_url": "https://www.bls.gov/oes/",
+            "after_tax": after_tax.after_tax_metadata("us")
+        }
+    }
+
+def save_output(output, output_path=OUTPUT_PATH):
+    return json_emitter.emit(output_path, output)
+
+def build_percentile_tables(occupations):
+    """Quantile tables from the OEWS percentile columns kept on each occupation"""
+    return percentile_tables.build_tables(
+        sorted(occupations.values(), key=lambda x: x["soc_code"]),
+        {"country_code": "us", "source": "U.S. Bureau of Labor Statistics OEWS May 2023", "currency": "USD"},
+    )
+
+def build_rank_indexes(occupations):
+    """State-ranking and similar-occupation indexes; only needs national and state data"""
+    return rank_indexes.build_indexes(occupations.values(), {"country_code": "us"})
+
+def build_search_index(occupations):
+    """Title search index; aliases come from the other countries' bundled files and crosswalks"""
+    aliases = search_index.alias_table("us", list(occupations))
+    return search_index.build_index(occupations.values(), {"country_code": "us"}, aliases)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fetch occupation wage data from BLS OEWS")
+    parser.add_argument("--stream", action="store_true",
+                        help="spool downloads to disk and process the sheets in fixed-size chunks")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help=f"rows per chunk in --stream mode (default: {CHUNK_SIZE:,})")
+    parser.add_argument("--offline", action="store_true",
+                        help="serve downloads only from the local HTTP cache")
+    parser.add_argument("--history", metavar="YEARS",
+                        help="also build wage time series from the releases in a year range, e.g. 2015-2024")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes for --history, one release each (default: CPU count)")
+    parser.add_argument("--metro", action="store_true",
+                        help="also write per-state metropolitan-area shards from the MSA files")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    instrumentation.start("fetch_bls_data", args)
+    if args.offline:
+        http_cache.configure(offline=True)
+
     print("=" * 60)
     print("BLS OEWS Data Fetcher")
     print("=" * 60)
 
+    # Download both archives at the same time; the steps below read them from the cache
+    # (a failed download is retried and reported by the step that needs it)
+    run_concurrently({
+        url: lambda url=url: fetch_cached(url, headers=HEADERS, timeout=60)
+        for url in (NATIONAL_URL, STATE_URL)
+    }, return_exceptions=True)
+
     # Step 1: Get national occupation data
-    occupations = fetch_national_data()
+    occupations = fetch_national_data(stream=args.stream, chunk_size=args.chunk_size)
 
     if not occupations:
         print("\n⚠ No national data fetched. Exiting.")
         return
 
-    time.sleep(1)
-
     # Step 2: Add state-level data
-    occupations = fetch_state_data(occupations)
+    occupations = fetch_state_data(occupations, stream=args.stream, chunk_size=args.chunk_size)
 
     # Step 3: Add age distribution
     occupations = add_age_distribution(occupations)
 
-    # Convert to list
-    occupations_list = sorted(occupations.values(), key=lambda x: x["soc_code"])
-
-    # Prepare final JSON
-    output = {
-        "occupations": occupations_list,
-        "metadata": {
-            "version": "2024.1",
-            "last_updated": "2024-12-28",
-            "source": "U.S. Bureau of Labor Statistics OEWS May 2023",
-            "source_url": "https://www.bls.gov/oes/"
-        }
-    }
-
     # Save to file
-    output_path = "../SuccessClaude/Data/JSON/bls_oews_occupations.json"
-    with open(output_path, 'w') as f:
-        json.dump(output, f, indent=2)
+    with instrumentation.stage("serialize", rows_in=len(occupations)) as record:
+        save_output(build_output(occupations))
+        percentile_tables.save_tables(build_percentile_tables(occupations), PERCENTILES_OUTPUT_PATH)
+        rank_indexes.save_indexes(build_rank_indexes(occupations), RANK_INDEXES_OUTPUT_PATH)
+        search_index.save_index(build_search_index(occupations), SEARCH_INDEX_OUTPUT_PATH)
+        occupation_shards.write(build_output(occupations), "us", SHARDS_OUTPUT_DIR)
+        for path in (OUTPUT_PATH, PERCENTILES_OUTPUT_PATH, RANK_INDEXES_OUTPUT_PATH, SEARCH_INDEX_OUTPUT_PATH,
+                     occupation_shards.manifest_path("us", SHARDS_OUTPUT_DIR)):
+            record.wrote(path)
+
+    # Step 4: Wage time series from earlier releases, keyed to this snapshot's codes
+    if args.history:
+        # Imported here because oews_history builds on this module
+        import oews_history
+        print()
+        oews_history.run(oews_history.parse_years(args.history), args.workers or oews_history.WORKERS,
+                         target_codes=occupations.keys())
+
+    # Step 5: Metropolitan-area shards, always chunked
+    if args.metro:
+        # Imported here because metro_wages builds on this module
+        import metro_wages
+        metro_wages.run(occupations, args.chunk_size)
 
     print("\n" + "=" * 60)
-    print(f"✓ Saved data to {output_path}")
-    print(f"✓ Total occupations: {len(occupations_list)}")
+    print(f"✓ Saved data to {OUTPUT_PATH}")
+    print(f"✓ Saved quantile tables to {PERCENTILES_OUTPUT_PATH}")
+    print(f"✓ Saved rank indexes to {RANK_INDEXES_OUTPUT_PATH}")
+    print(f"✓ Saved search index to {SEARCH_INDEX_OUTPUT_PATH}")
+    print(f"✓ Saved occupation index and shards to {SHARDS_OUTPUT_DIR}")
+    print(f"✓ Total occupations: {len(occupations)}")
 
     # Print sample
-    if occupations_list:
-        print(f"\nSample occupation: {occupations_list[0]['title']}")
-        print(f"  SOC Code: {occupations_list[0]['soc_code']}")
-        print(f"  National Median: ${occupations_list[0]['national_median']:,}")
-        print(f"  States covered: {len(occupations_list[0]['by_state'])}")
+    sample = min(occupations.values(), key=lambda x: x["soc_code"])
+    print(f"\nSample occupation: {sample['title']}")
+    print(f"  SOC Code: {sample['soc_code']}")
+    print(f"  National Median: ${sample['national_median']:,}")
+    print(f"  States covered: {len(sample['by_state'])}")
 
     print("=" * 60)
 
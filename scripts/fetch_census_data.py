@@ -4,13 +4,22 @@ Fetch real income data from U.S. Census Bureau ACS API
 https://www.census.gov/data/developers/data-sets/acs-5year.html
 """
 
-import requests
+import argparse
 import json
-import time
 from collections import defaultdict
 
+import pandas as pd
+
+import instrumentation
+import json_emitter
+from fetch_engine import CENSUS_KEYED_LIMIT, get_session, run_concurrently
+from http_cache import fetch_cached
+
 # Census API endpoint (ACS 5-Year estimates - most recent)
 BASE_URL = "https://api.census.gov/data/2022/acs/acs5"
+CENSUS_HOST = "api.census.gov"
+
+OUTPUT_PATH = "../SuccessClaude/Data/JSON/state_income_data.json"
 
 # Note: You can get a free API key from https://api.census.gov/data/key_signup.html
 # For now, using without key (limited to 500 requests/day per IP)
@@ -51,35 +60,179 @@ STATE_NAMES = {
     "WV": "West Virginia", "WI": "Wisconsin", "WY": "Wyoming"
 }
 
-def fetch_census_data(variables, geo="state:*"):
+# The API accepts at most 50 variables per call (NAME counts toward the limit)
+MAX_VARIABLES_PER_CALL = 50
+
+# Calls allowed per day without an API key
+NO_KEY_DAILY_CALLS = 500
+
+# Annotation values such as -666666666 (not available) mark missing estimates
+MISSING_SENTINEL_MAX = -100000000
+
+# Supported geographies: the API "for" clause, whether the query must be made
+# within each state, and the columns that concatenate into the GEOID.
+# ZCTAs cross state lines and are not nested under states in the ACS 2020+
+# geography hierarchy, so they are fetched nationally in one call per batch.
+GEOGRAPHIES = {
+    "state": {"for": "state:*", "per_state": False, "geoid": ["state"]},
+    "county": {"for": "county:*", "per_state": True, "geoid": ["state", "county"]},
+    "place": {"for": "place:*", "per_state": True, "geoid": ["state", "place"]},
+    "zcta": {"for": "zip code tabulation area:*", "per_state": False, "geoid": ["zip code tabulation area"]},
+}
+
+# Variable groups fetched for every refresh
+VARIABLE_GROUPS = {
+    "overall": [
+        "NAME",
+        "B19013_001E",  # Median household income
+        "B19025_001E",  # Aggregate household income
+        "B19001_001E"   # Total households (for mean calculation)
+    ],
+    # Age group variables (median earnings by age)
+    # B20004_* - Median earnings by sex and age
+    "age_gender": [
+        "NAME",
+        "B20004_002E",  # Male: 16-24
+        "B20004_003E",  # Male: 25-44
+        "B20004_004E",  # Male: 45-64
+        "B20004_005E",  # Male: 65+
+        "B20004_007E",  # Female: 16-24
+        "B20004_008E",  # Female: 25-44
+        "B20004_009E",  # Female: 45-64
+        "B20004_010E",  # Female: 65+
+    ],
+    # Household income per ZCTA (zip_income.py); NAME only repeats the code there
+    "zcta": [
+        "B19013_001E",  # Median household income
+        "B19025_001E",  # Aggregate household income
+        "B19001_001E"   # Total households
+    ],
+}
+
+def fetch_census_data(variables, geo="state:*", within=None):
     """Fetch data from Census API"""
     params = {
         "get": ",".join(variables),
         "for": geo
     }
+    if within:
+        params["in"] = within
     if API_KEY:
         params["key"] = API_KEY
+        session = get_session()
+        if session.limits.get(CENSUS_HOST) != CENSUS_KEYED_LIMIT:
+            session.set_limit(CENSUS_HOST, *CENSUS_KEYED_LIMIT)
 
     try:
-        response = requests.get(BASE_URL, params=params, timeout=30)
-        response.raise_for_status()
-        return response.json()
+        with open(fetch_cached(BASE_URL, params=params, timeout=30), 'r') as f:
+            return json.load(f)
     except Exception as e:
         print(f"Error fetching data: {e}")
         return None
 
+def _batches(variables, size=MAX_VARIABLES_PER_CALL):
+    """Split a variable list into API-sized calls; NAME is only requested once"""
+    wanted = [v for v in variables if v != "NAME"]
+    batches = [wanted[i:i + size] for i in range(0, len(wanted), size)] or [[]]
+    if "NAME" in variables:
+        roomy = next((batch for batch in batches if len(batch) < size), None)
+        if roomy is None:
+            batches.append(["NAME"])
+        else:
+            roomy.insert(0, "NAME")
+    return batches
+
+def _response_frame(data, geo_columns):
+    """Turn a Census API response into a DataFrame indexed by GEOID"""
+    frame = pd.DataFrame(data[1:], columns=data[0])
+    frame["GEOID"] = frame[geo_columns].astype(str).agg("".join, axis=1)
+    return frame.set_index("GEOID")
+
+def fetch_census_table(variables, geography="state", states=None):
+    """Fetch any number of ACS variables for a geography as one table indexed by GEOID
+
+    Variable lists are split into API-sized batches and, for geographies that
+    must be queried within a state (county, place), fanned out across states;
+    state and ZCTA tables are one national call per batch. All calls run
+    concurrently through the rate-limited session; the batches are then joined
+    back together on GEOID.
+
+    Without an API key, a table needing more calls than the daily no-key
+    allowance is refused up front rather than failing partway through.
+    """
+    spec = GEOGRAPHIES[geography]
+    batches = _batches(variables)
+
+    if spec["per_state"]:
+        fips_codes = sorted(STATE_FIPS) if states is None else [
+            fips for fips, code in STATE_FIPS.items() if code in states or fips in states
+        ]
+        scopes = [f"state:{fips}" for fips in fips_codes]
+    else:
+        scopes = [None]
+
+    calls = {
+        (b, scope): (lambda batch=batch, scope=scope: fetch_census_data(batch, spec["for"], within=scope))
+        for b, batch in enumerate(batches)
+        for scope in scopes
+    }
+    print(f"Fetching {len(variables)} variables for {geography} geography "
+          f"({len(batches)} batches x {len(scopes)} scopes = {len(calls)} calls)...")
+    if not API_KEY:
+        if len(calls) > NO_KEY_DAILY_CALLS:
+            raise ValueError(f"{len(calls)} calls exceed the {NO_KEY_DAILY_CALLS}/day allowed without an API key; "
+                             f"set API_KEY or fetch fewer states")
+        # Within the allowance, the session's no-key bucket (HOST_LIMITS) spaces out calls past its burst
+
+    results = run_concurrently(calls)
+    failed = [key for key, data in results.items() if not data]
+    if failed:
+        print(f"⚠ {len(failed)} of {len(calls)} calls failed")
+
+    batch_frames = []
+    geo_frames = []
+    for b, batch in enumerate(batches):
+        parts = [
+            _response_frame(results[(b, scope)], spec["geoid"])
+            for scope in scopes if results[(b, scope)]
+        ]
+        if not parts:
+            continue
+
+        frame = pd.concat(parts)
+        batch_frames.append(frame[list(batch)])
+        geo_frames.append(frame[spec["geoid"]])
+
+    if not batch_frames:
+        return pd.DataFrame()
+
+    # Every batch returns the geography columns; take them from all of them, so
+    # areas missing from one batch still get their codes from another
+    geo = pd.concat(geo_frames)
+    geo = geo[~geo.index.duplicated()]
+    table = pd.concat(batch_frames + [geo], axis=1, join="outer").sort_index()
+    if "NAME" in table.columns:
+        table = table[["NAME"] + [column for column in table.columns if column != "NAME"]]
+
+    # Estimates and margins are numeric; Census encodes missing values as large negative sentinels
+    for column in table.columns:
+        if column == "NAME" or column in spec["geoid"]:
+            continue
+        values = pd.to_numeric(table[column], errors="coerce")
+        table[column] = values.mask(values <= MISSING_SENTINEL_MAX)
+
+    return table
+
+@instrumentation.staged("overall_income")
 def fetch_state_overall_income():
     """Fetch overall median and mean income by state"""
     print("Fetching overall state income data...")
 
-    variables = [
-        "NAME",
-        "B19013_001E",  # Median household income
-        "B19025_001E",  # Aggregate household income
-        "B19001_001E"   # Total households (for mean calculation)
-    ]
+    data = fetch_census_data(VARIABLE_GROUPS["overall"])
+    return parse_state_overall_income(data)
 
-    data = fetch_census_data(variables)
+def parse_state_overall_income(data):
+    """Turn the overall income response into per-state records"""
     if not data:
         return {}
 
@@ -110,25 +263,16 @@ def fetch_state_overall_income():
 
     return state_data
 
+@instrumentation.staged("age_gender_income")
 def fetch_age_gender_income():
     """Fetch income by age and gender from Census"""
     print("Fetching age/gender income data...")
 
-    # Age group variables (median earnings by age)
-    # B20004_* - Median earnings by sex and age
-    variables = [
-        "NAME",
-        "B20004_002E",  # Male: 16-24
-        "B20004_003E",  # Male: 25-44
-        "B20004_004E",  # Male: 45-64
-        "B20004_005E",  # Male: 65+
-        "B20004_007E",  # Female: 16-24
-        "B20004_008E",  # Female: 25-44
-        "B20004_009E",  # Female: 45-64
-        "B20004_010E",  # Female: 65+
-    ]
+    data = fetch_census_data(VARIABLE_GROUPS["age_gender"])
+    return parse_age_gender_income(data)
 
-    data = fetch_census_data(variables)
+def parse_age_gender_income(data):
+    """Turn the age/gender earnings response into per-state by_age/by_gender blocks"""
     if not data:
         return {}
 
@@ -192,6 +336,7 @@ def fetch_age_gender_income():
 
     return result
 
+@instrumentation.staged("marital_status", rows_in=len)
 def add_marital_status_estimates(state_data):
     """Add marital status income estimates based on overall income"""
     print("Calculating marital status income estimates...")
@@ -222,34 +367,20 @@ def add_marital_status_estimates(state_data):
 
     return state_data
 
-def main():
-    print("=" * 60)
-    print("Fetching real data from U.S. Census Bureau ACS...")
-    print("=" * 60)
-
-    # Step 1: Get overall state income
-    state_data = fetch_state_overall_income()
-    print(f"✓ Fetched data for {len(state_data)} states")
-
-    time.sleep(1)  # Rate limiting
-
-    # Step 2: Get age/gender breakdown
-    age_gender_data = fetch_age_gender_income()
-    print(f"✓ Fetched age/gender data for {len(age_gender_data)} states")
-
-    # Merge data
+@instrumentation.staged("merge", rows_in=len)
+def merge_state_data(state_data, age_gender_data):
+    """Merge the age/gender blocks into the overall state records"""
     for state_code, data in age_gender_data.items():
         if state_code in state_data:
             state_data[state_code].update(data)
+    return state_data
 
-    # Step 3: Add marital status estimates
-    state_data = add_marital_status_estimates(state_data)
-
+def build_output(state_data):
+    """Prepare the final JSON document"""
     # Convert to list format
     states_list = sorted(state_data.values(), key=lambda x: x["code"])
 
-    # Prepare final JSON
-    output = {
+    return {
         "states": states_list,
         "metadata": {
             "version": "2024.1",
@@ -259,13 +390,48 @@ def main():
         }
     }
 
+def save_output(output, output_path=OUTPUT_PATH):
+    return json_emitter.emit(output_path, output)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fetch state income data from the Census ACS")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    instrumentation.start("fetch_census_data", parse_args())
+
+    print("=" * 60)
+    print("Fetching real data from U.S. Census Bureau ACS...")
+    print("=" * 60)
+
+    # Steps 1 and 2: overall state income and age/gender breakdown are
+    # independent, so fetch them at the same time (the session rate-limits)
+    results = run_concurrently({
+        "overall": fetch_state_overall_income,
+        "age_gender": fetch_age_gender_income,
+    })
+    state_data = results["overall"]
+    age_gender_data = results["age_gender"]
+    print(f"✓ Fetched data for {len(state_data)} states")
+    print(f"✓ Fetched age/gender data for {len(age_gender_data)} states")
+
+    # Merge data
+    state_data = merge_state_data(state_data, age_gender_data)
+
+    # Step 3: Add marital status estimates
+    state_data = add_marital_status_estimates(state_data)
+
     # Save to file
-    output_path = "../SuccessClaude/Data/JSON/state_income_data.json"
-    with open(output_path, 'w') as f:
-        json.dump(output, f, indent=2)
+    with instrumentation.stage("serialize", rows_in=len(state_data)) as record:
+        output = build_output(state_data)
+        states_list = output["states"]
+
+        save_output(output)
+        record.wrote(OUTPUT_PATH)
 
     print("\n" + "=" * 60)
-    print(f"✓ Saved data to {output_path}")
+    print(f"✓ Saved data to {OUTPUT_PATH}")
     print(f"✓ Total states: {len(states_list)}")
     print("=" * 60)
 
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Concurrent fetch layer shared by the data scripts
+
+All HTTP traffic goes through one pooled requests.Session. Each host has a
+token bucket instead of hard-coded sleeps, which keeps the Census API under
+its 500-requests/day limit when no API key is configured. run_concurrently()
+runs independent downloads in parallel, so a refresh is bounded by the
+slowest download rather than the sum of all of them.
+
+Run directly to warm the download cache with every source the pipeline uses.
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+MAX_WORKERS = 8
+POOL_SIZE = 16
+
+# Requests per second and burst size for each host; unknown hosts are not throttled.
+# Buckets only cover a single run - the download cache is what keeps repeat runs cheap.
+HOST_LIMITS = {
+    "www.bls.gov": (2.0, 4),
+    # No-key limit is 500/day; leave headroom for the initial burst
+    "api.census.gov": ((500 - 20) / 86400, 20),
+    "raw.githubusercontent.com": (5.0, 10),
+}
+
+# Census limits with an API key are far more generous
+CENSUS_KEYED_LIMIT = (10.0, 20)
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+class RateLimitedSession(requests.Session):
+    """Pooled session that takes a token from the destination host's bucket before each request"""
+
+    def __init__(self, limits=None, pool_size=POOL_SIZE):
+        super().__init__()
+        self.limits = dict(HOST_LIMITS if limits is None else limits)
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+
+        retry = Retry(total=3, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def set_limit(self, host, rate, capacity):
+        with self._buckets_lock:
+            self.limits[host] = (rate, capacity)
+            self._buckets.pop(host, None)
+
+    def bucket(self, host):
+        with self._buckets_lock:
+            if host not in self._buckets and host in self.limits:
+                self._buckets[host] = TokenBucket(*self.limits[host])
+            return self._buckets.get(host)
+
+    def request(self, method, url, *args, **kwargs):
+        bucket = self.bucket(urlparse(url).hostname)
+        if bucket is not None:
+            bucket.acquire()
+        return super().request(method, url, *args, **kwargs)
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """The process-wide pooled, rate-limited session"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = RateLimitedSession()
+        return _session
+
+def run_concurrently(tasks, max_workers=MAX_WORKERS, return_exceptions=False):
+    """Run {name: callable} in parallel and return {name: result}
+
+    Failures are re-raised unless return_exceptions is set, in which case the
+    exception is returned as that task's result.
+    """
+    if not tasks:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+        futures = {name: executor.submit(task) for name, task in tasks.items()}
+
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[name] = e
+        return results
+
+def prefetch_all(offline=False):
+    """Download every source used by the pipeline into the HTTP cache at the same time"""
+    # Imported here so the engine itself has no dependency on the scripts
+    import fetch_ai_risk_data
+    import fetch_bls_data
+    import fetch_census_data
+    import http_cache
+
+    if offline:
+        http_cache.configure(offline=True)
+
+    tasks = {
+        "bls_national": lambda: http_cache.fetch_cached(
+            fetch_bls_data.NATIONAL_URL, headers=fetch_bls_data.HEADERS, timeout=60),
+        "bls_state": lambda: http_cache.fetch_cached(
+            fetch_bls_data.STATE_URL, headers=fetch_bls_data.HEADERS, timeout=60),
+        "openai_exposure": lambda: fetch_ai_risk_data.fetch_openai_gpt_impact(),
+    }
+    for name, variables in fetch_census_data.VARIABLE_GROUPS.items():
+        # The ZCTA group is only ever requested at ZCTA geography (zip_income.py)
+        geo = fetch_census_data.GEOGRAPHIES[name]["for"] if name in fetch_census_data.GEOGRAPHIES else "state:*"
+        tasks[f"census_{name}"] = lambda variables=variables, geo=geo: _census_source(variables, geo)
+
+    started = time.monotonic()
+    results = run_concurrently(tasks, return_exceptions=True)
+
+    failed = {name: e for name, e in results.items() if isinstance(e, Exception)}
+    print(f"✓ Fetched {len(results) - len(failed)}/{len(results)} sources in {time.monotonic() - started:.1f}s")
+    if failed:
+        print(f"✗ {len(failed)} sources failed:")
+        for name, e in failed.items():
+            print(f"  {name}: {e}")
+    return results
+
+def _census_source(variables, geo):
+    """fetch_census_data() reports failures by returning None; raise so they count as failed"""
+    import fetch_census_data
+
+    data = fetch_census_data.fetch_census_data(variables, geo)
+    if not data:
+        raise RuntimeError(f"no Census data for {geo}")
+    return data
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch every pipeline source concurrently into the download cache")
+    parser.add_argument("--offline", action="store_true", help="only check what is already cached")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Prefetching BLS, Census and AI exposure sources...")
+    print("=" * 60)
+    prefetch_all(offline=args.offline)
+
+if __name__ == "__main__":
+    main()
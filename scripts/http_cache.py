@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Persistent HTTP download cache shared by the fetch scripts
+
+Responses are stored content-addressed (by SHA-256) under CACHE_DIR, with an
+index that maps each request to its blob plus the ETag/Last-Modified needed to
+revalidate it. Cached entries are revalidated with conditional requests, the
+least recently used entries are evicted once the cache exceeds its size limit,
+and offline mode serves only from the cache.
+
+Configuration (environment):
+    SUCCESSCLAUDE_CACHE_DIR        cache location (default: scripts/.cache/http)
+    SUCCESSCLAUDE_CACHE_MAX_BYTES  size limit in bytes (default: 2 GiB)
+    SUCCESSCLAUDE_OFFLINE=1        never touch the network
+    SUCCESSCLAUDE_CACHE_FRESH_SECONDS  skip revalidation for entries this new (default: 600)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+
+import instrumentation
+from fetch_engine import get_session
+
+CACHE_DIR = os.environ.get(
+    "SUCCESSCLAUDE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "http")
+)
+CACHE_MAX_BYTES = int(os.environ.get("SUCCESSCLAUDE_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+OFFLINE = os.environ.get("SUCCESSCLAUDE_OFFLINE") == "1"
+# Entries fetched this recently are served without revalidating, so sources
+# prefetched at the start of a run are not requested again by each script
+FRESH_SECONDS = float(os.environ.get("SUCCESSCLAUDE_CACHE_FRESH_SECONDS", 600))
+
+# Query parameters that must never end up in cache keys or the index (API keys)
+SECRET_PARAMS = {"key"}
+
+# Conditional request headers, lowercased
+VALIDATOR_HEADERS = ("if-none-match", "if-modified-since")
+
+BLOCK_SIZE = 1024 * 1024
+
+class CacheMiss(Exception):
+    """Raised in offline mode when a request has no cached response"""
+
+def request_key(url, params=None):
+    """Stable cache key for a GET request, ignoring secret parameters"""
+    public = sorted((k, str(v)) for k, v in (params or {}).items() if k not in SECRET_PARAMS)
+    return f"{url}?{urlencode(public)}" if public else url
+
+class HTTPCache:
+    """On-disk, content-addressed GET cache with conditional revalidation and LRU eviction"""
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, offline=OFFLINE, session=None,
+                 fresh_seconds=FRESH_SECONDS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.session = session or get_session()
+        self.fresh_seconds = fresh_seconds
+        self.index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".json")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self._index, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def _cached_entry(self, key):
+        entry = self._index.get(key)
+        if entry and os.path.exists(self.blob_path(entry["sha256"])):
+            return entry
+        return None
+
+    def _touch(self, key):
+        with self._lock:
+            self._index[key]["last_access"] = time.time()
+            self._save_index()
+
+    def fetch(self, url, params=None, headers=None, timeout=60):
+        """GET url and return the path of the cached response body"""
+        key = request_key(url, params)
+        entry = self._cached_entry(key)
+
+        if self.offline:
+            if entry is None:
+                raise CacheMiss(f"Not cached (offline mode): {key}")
+            self._touch(key)
+            return self.blob_path(entry["sha256"])
+
+        if entry is not None and time.time() - entry["fetched_at"] < self.fresh_seconds:
+            self._touch(key)
+            return self.blob_path(entry["sha256"])
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = self.session.get(url, params=params, headers=request_headers,
+                                        timeout=timeout, stream=True)
+            if response.status_code == 304 and entry is None:
+                # Nothing to revalidate against (caller-supplied validators, or a blob that
+                # went missing); a 304 has no body, so ask again unconditionally
+                response.close()
+                request_headers = {k: v for k, v in request_headers.items() if k.lower() not in VALIDATOR_HEADERS}
+                response = self.session.get(url, params=params, headers=request_headers,
+                                            timeout=timeout, stream=True)
+        except requests.RequestException as e:
+            if entry is None:
+                raise
+            print(f"⚠ {e}; serving cached copy of {key}")
+            self._touch(key)
+            return self.blob_path(entry["sha256"])
+
+        with response:
+            if response.status_code == 304:
+                if entry is None:
+                    raise requests.HTTPError(f"304 Not Modified without a cached copy: {key}", response=response)
+                with self._lock:
+                    entry["fetched_at"] = entry["last_access"] = time.time()
+                    self._save_index()
+                return self.blob_path(entry["sha256"])
+
+            response.raise_for_status()
+            digest, size = self._store_body(response)
+
+        with self._lock:
+            self._index[key] = {
+                "url": key,
+                "sha256": digest,
+                "size": size,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+                "last_access": time.time(),
+            }
+            self._evict(keep=key)
+            self._save_index()
+
+        return self.blob_path(digest)
+
+    def _store_body(self, response):
+        """Stream a response body into the blob store, returning (sha256, size)"""
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for block in response.iter_content(chunk_size=BLOCK_SIZE):
+                    hasher.update(block)
+                    f.write(block)
+                    size += len(block)
+
+            digest = hasher.hexdigest()
+            path = self.blob_path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            return digest, size
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def fetch_bytes(self, url, params=None, headers=None, timeout=60):
+        with open(self.fetch(url, params, headers, timeout), 'rb') as f:
+            return f.read()
+
+    def fetch_json(self, url, params=None, headers=None, timeout=60):
+        with open(self.fetch(url, params, headers, timeout), 'r') as f:
+            return json.load(f)
+
+    def total_bytes(self):
+        blobs = {entry["sha256"]: entry["size"] for entry in self._index.values()}
+        return sum(blobs.values())
+
+    def _evict(self, keep=None):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        # Blobs are shared between identical responses; count references once and
+        # only delete (and stop counting the size of) blobs nothing else points to
+        references = {}
+        sizes = {}
+        for entry in self._index.values():
+            references[entry["sha256"]] = references.get(entry["sha256"], 0) + 1
+            sizes[entry["sha256"]] = entry["size"]
+        total = sum(sizes.values())
+
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+
+            del self._index[key]
+            digest = entry["sha256"]
+            references[digest] -= 1
+            if references[digest] == 0:
+                total -= sizes[digest]
+                try:
+                    os.remove(self.blob_path(digest))
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            self._index = {}
+            for dirpath, _, filenames in os.walk(os.path.join(self.root, "blobs")):
+                for filename in filenames:
+                    os.remove(os.path.join(dirpath, filename))
+            self._save_index()
+
+_default_cache = None
+
+def configure(**kwargs):
+    """Replace the shared cache (e.g. configure(offline=True) from a --offline flag)"""
+    global _default_cache
+    _default_cache = HTTPCache(**kwargs)
+    return _default_cache
+
+def get_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = HTTPCache()
+    return _default_cache
+
+def fetch_cached(url, params=None, headers=None, timeout=60):
+    """GET through the shared cache, returning the path of the response body"""
+    # The detail leaves out params, which can carry an API key
+    with instrumentation.stage("download", detail=url) as record:
+        path = get_cache().fetch(url, params=params, headers=headers, timeout=timeout)
+        record.read(path)
+        return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the shared HTTP download cache")
+    parser.add_argument("--clear", action="store_true", help="remove every cached response")
+    args = parser.parse_args()
+
+    cache = get_cache()
+    if args.clear:
+        cache.clear()
+        print(f"✓ Cleared {cache.root}")
+        return
+
+    print(f"Cache: {cache.root}")
+    print(f"Size: {cache.total_bytes():,} / {cache.max_bytes:,} bytes")
+    for key, entry in sorted(cache._index.items(), key=lambda item: -item[1]["last_access"]):
+        print(f"  {entry['size']:>12,}  {entry['sha256'][:12]}  {key}")
+
+if __name__ == "__main__":
+    main()
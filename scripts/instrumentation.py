@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing and memory instrumentation shared by the data scripts
+
+Scripts wrap each step in a stage, or decorate a function whose every call is one:
+
+    with instrumentation.stage("unzip", detail=member) as s:
+        ...
+        s.bytes_written = workbook.tell()
+
+    @instrumentation.staged("process_national", rows_in=len)
+    def build_national_occupations(df): ...
+
+Every stage records wall and CPU time, the process high-water RSS and, with
+--trace-memory, peak traced (tracemalloc) memory, plus any rows in/out and
+bytes read/written the step reports. Stages nest: a stage opened inside
+another is recorded under its path ("national/parse/unzip"), and a parent's
+peak includes its children's. CPU time and traced peaks are process-wide, so they overlap when
+build.py runs stages in parallel.
+
+A script calls start() with its parsed flags (see add_arguments) and, at
+exit, writes a JSON run report to REPORT_DIR
+(<script>-<timestamp>.json). Reports live with the local caches rather than
+next to the generated JSON, which is bundled into the app as-is. With
+--profile each top-level stage is also captured with cProfile (.prof) or, if
+installed, pyinstrument (.html) under a directory named after the report.
+
+Run directly to read reports:
+    python instrumentation.py                     # latest report vs the previous one of the same script
+    python instrumentation.py report.json --compare older.json
+"""
+
+import argparse
+import atexit
+import contextlib
+import cProfile
+import datetime
+import functools
+import glob
+import json
+import os
+import platform
+import re
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_DIR = os.path.join(SCRIPTS_DIR, ".cache", "runs")
+
+PROFILERS = ["cprofile", "pyinstrument"]
+
+# Stages whose wall time changed by less than this are not flagged when comparing reports
+COMPARE_MIN_SECONDS = 0.5
+
+def _max_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+class StageRecord:
+    """Measurements for one execution of a stage; counters may be set by the code inside it"""
+
+    def __init__(self, name, path=None, detail=None, rows_in=None):
+        self.name = name
+        self.path = path or name
+        self.detail = detail
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.started_at = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_traced_bytes = None
+        self.max_rss_bytes = None
+        self.profile = None
+        self.error = None
+
+    def read(self, path):
+        """Count a file this stage read"""
+        self.bytes_read += os.path.getsize(path)
+
+    def wrote(self, path):
+        """Count a file this stage wrote"""
+        self.bytes_written += os.path.getsize(path)
+
+    def as_dict(self):
+        return {key: value for key, value in vars(self).items() if value is not None}
+
+class Run:
+    """Stage records for one script invocation"""
+
+    def __init__(self, name, trace_memory=False, profile=None, report_path=None):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.started = time.time()
+        self.stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.report_path = report_path or os.path.join(REPORT_DIR, f"{name}-{self.stamp}.json")
+        self.records = []
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _profiler(self):
+        """Profiler for a top-level stage, or None"""
+        if not self.profile or self._stack():
+            return None
+        if self.profile == "pyinstrument" and pyinstrument is not None:
+            return pyinstrument.Profiler()
+        return cProfile.Profile()
+
+    def _save_profile(self, profiler, record, sequence):
+        directory = os.path.splitext(self.report_path)[0]
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', f"{sequence:03d}-{record.name}")
+        if isinstance(profiler, cProfile.Profile):
+            path = os.path.join(directory, f"{slug}.prof")
+            profiler.dump_stats(path)
+        else:
+            path = os.path.join(directory, f"{slug}.html")
+            with open(path, 'w') as f:
+                f.write(profiler.output_html())
+        record.profile = os.path.relpath(path, os.path.dirname(self.report_path))
+
+    @contextlib.contextmanager
+    def stage(self, name, detail=None, rows_in=None):
+        stack = self._stack()
+        record = StageRecord(name, f"{stack[-1].path}/{name}" if stack else name, detail, rows_in)
+        record.started_at = round(time.time() - self.started, 3)
+        with self._lock:
+            sequence = self._opened
+            self._opened += 1
+
+        if self.trace_memory:
+            # A child resets the peak, so fold the parent's peak so far into its record first
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak_traced_bytes = max(stack[-1].peak_traced_bytes or 0, peak)
+            tracemalloc.reset_peak()
+            record.peak_traced_bytes = current
+
+        profiler = self._profiler()
+        if profiler is not None:
+            try:
+                profiler.enable() if isinstance(profiler, cProfile.Profile) else profiler.start()
+            except ValueError:
+                # Another thread's stage holds the profiler (one per process on Python 3.12+)
+                profiler = None
+        stack.append(record)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield record
+        except BaseException as e:
+            record.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable() if isinstance(profiler, cProfile.Profile) else profiler.stop()
+            record.wall_seconds = round(time.perf_counter() - wall, 4)
+            record.cpu_seconds = round(time.process_time() - cpu, 4)
+            record.max_rss_bytes = _max_rss_bytes()
+            stack.pop()
+
+            if self.trace_memory:
+                record.peak_traced_bytes = max(record.peak_traced_bytes, tracemalloc.get_traced_memory()[1])
+                if stack:
+                    stack[-1].peak_traced_bytes = max(stack[-1].peak_traced_bytes or 0, record.peak_traced_bytes)
+            if profiler is not None:
+                self._save_profile(profiler, record, sequence)
+
+            with self._lock:
+                self.records.append(record)
+
+    def report(self):
+        with self._lock:
+            stages = sorted((record.as_dict() for record in self.records), key=lambda r: r["started_at"])
+        return {
+            "run": self.name,
+            "started": datetime.datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "argv": sys.argv[1:],
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "wall_seconds": round(time.perf_counter() - self._wall, 4),
+            "cpu_seconds": round(time.process_time() - self._cpu, 4),
+            "max_rss_bytes": _max_rss_bytes(),
+            "trace_memory": self.trace_memory,
+            "stages": stages,
+        }
+
+    def write_report(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.report_path)), exist_ok=True)
+        tmp_path = self.report_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        os.replace(tmp_path, self.report_path)
+        return self.report_path
+
+# Stages recorded before a script calls start() go to an unnamed run that is never written
+_run = Run("default")
+
+# Counters set outside any stage land here and are discarded
+_detached = StageRecord("detached")
+
+def start(name, args=None):
+    """Begin recording a script's run from its parsed flags; the report is written at exit"""
+    global _run
+    _run = Run(name, getattr(args, "trace_memory", False), getattr(args, "profile", None),
+               getattr(args, "report", None))
+
+    def write(run=_run):
+        print(f"\n✓ Run report: {run.write_report()}")
+    atexit.register(write)
+    return _run
+
+def current():
+    return _run
+
+def stage(name, detail=None, rows_in=None):
+    """Context manager recording one stage of the current run"""
+    return _run.stage(name, detail, rows_in)
+
+def record():
+    """The innermost open stage on this thread, for setting counters"""
+    stack = _run._stack()
+    return stack[-1] if stack else _detached
+
+def staged(name, rows_in=None, rows_out=len):
+    """Decorator recording each call as a stage; rows_in(first argument) and rows_out(result) count rows"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name, rows_in=rows_in(args[0]) if rows_in and args else None) as current_record:
+                result = func(*args, **kwargs)
+                if rows_out is not None and result is not None:
+                    current_record.rows_out = rows_out(result)
+                return result
+        return wrapper
+    return decorate
+
+def add_arguments(parser):
+    """The instrumentation flags every script accepts"""
+    group = parser.add_argument_group("instrumentation")
+    group.add_argument("--report", metavar="PATH", help=f"run report path (default: {REPORT_DIR}/<script>-<time>.json)")
+    group.add_argument("--trace-memory", action="store_true", help="record peak traced memory per stage (slower)")
+    group.add_argument("--profile", choices=PROFILERS, help="profile each top-level stage")
+
+# ============================================================================
+# Reading reports
+# ============================================================================
+
+def _load(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def stage_totals(report):
+    """{path: (count, wall, cpu, peak traced, rows out, bytes written)} for a report, parents before children"""
+    totals = {}
+    first_started = {}
+    for record in report["stages"]:
+        path = record["path"]
+        first_started[path] = min(first_started.get(path, record["started_at"]), record["started_at"])
+        count, wall, cpu, peak, rows, written = totals.get(path, (0, 0.0, 0.0, 0, 0, 0))
+        totals[path] = (
+            count + 1, wall + record["wall_seconds"], cpu + record["cpu_seconds"],
+            max(peak, record.get("peak_traced_bytes", 0)), rows + (record.get("rows_out") or 0),
+            written + record.get("bytes_written", 0),
+        )
+
+    # A parent starts before its children, so ordering by each ancestor's first start gives a tree
+    def tree_order(path):
+        parts = path.split("/")
+        return [first_started.get("/".join(parts[:depth]), 0) for depth in range(1, len(parts) + 1)]
+    return {path: totals[path] for path in sorted(totals, key=tree_order)}
+
+def print_report(report, baseline=None):
+    print(f"{report['run']} started {report['started']}: {report['wall_seconds']:.1f}s wall, "
+          f"{report['cpu_seconds']:.1f}s CPU, {report['max_rss_bytes'] / 1024 ** 2:,.0f} MiB max RSS")
+    previous = stage_totals(baseline) if baseline else {}
+
+    print(f"\n  {'stage':<34} {'n':>3} {'wall s':>9} {'cpu s':>9} {'peak MiB':>9} {'rows out':>10}"
+          + (f" {'vs before':>10}" if baseline else ""))
+    for path, (count, wall, cpu, peak, rows, _) in stage_totals(report).items():
+        label = "  " * path.count("/") + path.rsplit("/", 1)[-1]
+        line = f"  {label:<34} {count:>3} {wall:>9.2f} {cpu:>9.2f} {peak / 1024 ** 2:>9.1f} {rows:>10,}"
+        if path in previous:
+            before = previous[path][1]
+            change = f"{wall / before - 1:+.0%}" if before else "new"
+            flag = " ⚠" if before and wall > before * 1.5 and wall - before > COMPARE_MIN_SECONDS else ""
+            line += f" {change:>10}{flag}"
+        print(line)
+
+def previous_report(path):
+    """The report of the same script written just before this one"""
+    name = os.path.basename(path).rsplit("-", 2)[0]
+    reports = sorted(glob.glob(os.path.join(os.path.dirname(path), f"{name}-*.json")))
+    earlier = [report for report in reports if report < path]
+    return earlier[-1] if earlier else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Show a run report, compared with an earlier run")
+    parser.add_argument("report", nargs="?", help="report to show (default: the most recent)")
+    parser.add_argument("--compare", help="report to compare against (default: the previous run of the script)")
+    args = parser.parse_args()
+
+    path = args.report
+    if path is None:
+        reports = sorted(glob.glob(os.path.join(REPORT_DIR, "*.json")), key=os.path.getmtime)
+        if not reports:
+            print(f"No reports in {REPORT_DIR}")
+            return
+        path = reports[-1]
+
+    baseline_path = args.compare or previous_report(os.path.abspath(path))
+    print(f"Report: {path}")
+    if baseline_path:
+        print(f"Compared with: {baseline_path}")
+    print()
+    print_report(_load(path), _load(baseline_path) if baseline_path else None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Parquet intermediate store for parsed source files
+
+Parsing the OEWS xlsx files is the slowest step of a refresh, so the parsed
+sheet is written once as Parquet, keyed by the SHA-256 of the source file, and
+memory-mapped on later runs instead of being parsed again. Tables are
+normalized to nullable string columns so every chunk of a file shares one
+schema and the processors see the same values whether they come from Excel or
+from the store.
+
+Requires pyarrow; without it every lookup is a miss and nothing is written.
+"""
+
+import hashlib
+import os
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+STORE_DIR = os.environ.get(
+    "SUCCESSCLAUDE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "parquet")
+)
+
+# Bump when normalize_frame changes so stale tables are not reused
+FORMAT_VERSION = 1
+
+BLOCK_SIZE = 1024 * 1024
+
+def available():
+    return pq is not None
+
+def file_sha256(path):
+    """SHA-256 of a file, read in blocks"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def table_path(digest, name):
+    return os.path.join(STORE_DIR, f"{digest}.{name}.v{FORMAT_VERSION}.parquet")
+
+def normalize_frame(df):
+    """Convert every column to strings (None for missing) with string column names"""
+    normalized = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    for position, column in enumerate(df.columns):
+        values = df.iloc[:, position]
+        text = values.map(str).astype(object)
+        normalized[str(column)] = text.where(values.notna().to_numpy(), None)
+    return normalized
+
+def _schema(df):
+    return pa.schema([(column, pa.string()) for column in df.columns])
+
+def load_table(digest, name, columns=None):
+    """Memory-map a stored table, or return None if it has not been written yet"""
+    if not available():
+        return None
+
+    path = table_path(digest, name)
+    if not os.path.exists(path):
+        return None
+
+    return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+def iter_table(digest, name, batch_size):
+    """Yield a stored table as DataFrames of at most batch_size rows"""
+    parquet_file = pq.ParquetFile(table_path(digest, name), memory_map=True)
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield batch.to_pandas()
+
+def has_table(digest, name):
+    return available() and os.path.exists(table_path(digest, name))
+
+def save_table(digest, name, df):
+    """Normalize and store a parsed table, returning the normalized frame"""
+    normalized = normalize_frame(df)
+    if available():
+        with TableWriter(digest, name) as writer:
+            writer.write(normalized)
+    return normalized
+
+class TableWriter:
+    """Write a table chunk by chunk; it only becomes visible once the writer closes cleanly"""
+
+    def __init__(self, digest, name):
+        self.path = table_path(digest, name)
+        self._writer = None
+        self._tmp_path = None
+
+    def __enter__(self):
+        return self
+
+    def write(self, normalized):
+        if not available():
+            return
+
+        if self._writer is None:
+            os.makedirs(STORE_DIR, exist_ok=True)
+            fd, self._tmp_path = tempfile.mkstemp(dir=STORE_DIR, suffix=".parquet.tmp")
+            os.close(fd)
+            self._writer = pq.ParquetWriter(self._tmp_path, _schema(normalized))
+
+        table = pa.Table.from_pandas(normalized, schema=self._writer.schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._writer is None:
+            return False
+
+        self._writer.close()
+        if exc_type is None:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
+        return False
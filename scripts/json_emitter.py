@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Streaming, crash-safe writer for the main generated JSON files
+
+The fetch scripts used to build their whole output document, copy its records
+into a sorted list and json.dump() it straight onto the bundled path, so
+peak memory doubled at write time and an interrupted run left a truncated
+file that the next stage (or the app) would load. emit() instead:
+
+  - writes the records of a top-level list, or of a generator producing them,
+    one at a time, so no serialized or copied document is held alongside them
+  - produces exactly the bytes of json.dump(document, f, indent=2): keys in the
+    document's order, records in the order they are produced
+  - writes to a temporary file in the target's directory, fsyncs it and renames
+    it over the target, so readers only ever see the old file or the new one
+
+Used for bls_oews_occupations.json, state_income_data.json and
+automation_risk_data.json.
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+
+INDENT = "  "
+
+@contextlib.contextmanager
+def atomic_open(path, mode='w'):
+    """A file that replaces path only once the block completes"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+    # Persist the rename itself; not every platform can open a directory
+    with contextlib.suppress(OSError):
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def _dumps(value, depth):
+    """json.dumps(indent=2) of a value nested depth levels deep"""
+    return json.dumps(value, indent=2).replace("\n", "\n" + INDENT * depth)
+
+def _write_records(f, records, depth):
+    count = 0
+    for record in records:
+        f.write(("[" if count == 0 else ",") + "\n" + INDENT * (depth + 1) + _dumps(record, depth + 1))
+        count += 1
+    f.write("\n" + INDENT * depth + "]" if count else "[]")
+    return count
+
+def emit(path, document):
+    """Write a JSON object atomically, streaming its list and generator values; returns their record counts"""
+    counts = {}
+    with atomic_open(path) as f:
+        if not document:
+            f.write("{}")
+            return counts
+
+        f.write("{")
+        for i, (key, value) in enumerate(document.items()):
+            f.write(("" if i == 0 else ",") + "\n" + INDENT + json.dumps(key) + ": ")
+            if isinstance(value, (dict, str)) or not hasattr(value, "__iter__"):
+                f.write(_dumps(value, 1))
+            else:
+                counts[key] = _write_records(f, value, 1)
+        f.write("\n}")
+    return counts
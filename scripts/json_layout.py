@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Byte-exact re-serialization of the JSON files in Data/JSON
+
+The data files come in a handful of layouts: indent=2 from json.dump (with
+or without a trailing newline, ASCII-escaped or not), compact app-read files
+with separators=(',', ':'), and hand-formatted files that keep small objects
+on one line (uk_occupations_full.json's age_distribution entries). detect()
+finds the layout that reproduces a file's exact text, so a tool can load a
+file, change it and write it back without reformatting the untouched parts.
+
+A layout is a small dict, stored as-is in patch files:
+
+    {"indent": 2 | null, "separators": [item, key] | null, "inline_depth": n | null,
+     "ensure_ascii": bool, "newline": "\\n" | ""}
+"""
+
+import json
+
+# Candidates in the order detect() tries them
+LAYOUTS = [
+    {"indent": 2, "separators": None, "inline_depth": None},
+    {"indent": None, "separators": [",", ":"], "inline_depth": None},
+    {"indent": 2, "separators": None, "inline_depth": 4},
+    {"indent": None, "separators": None, "inline_depth": None},
+]
+
+DEFAULT_LAYOUT = {**LAYOUTS[0], "ensure_ascii": True, "newline": ""}
+
+def _inline(value, ensure_ascii, inline_depth, depth=0):
+    """indent=2, except containers nested inline_depth deep go on one line"""
+    if not isinstance(value, (dict, list)) or not value or depth >= inline_depth:
+        return json.dumps(value, ensure_ascii=ensure_ascii)
+    pad = "  " * (depth + 1)
+    if isinstance(value, dict):
+        items = [f"{pad}{json.dumps(key, ensure_ascii=ensure_ascii)}: {_inline(item, ensure_ascii, inline_depth, depth + 1)}"
+                 for key, item in value.items()]
+        return "{\n" + ",\n".join(items) + "\n" + "  " * depth + "}"
+    items = [pad + _inline(item, ensure_ascii, inline_depth, depth + 1) for item in value]
+    return "[\n" + ",\n".join(items) + "\n" + "  " * depth + "]"
+
+def dumps(document, layout=DEFAULT_LAYOUT):
+    """Serialize a document in a layout, including its trailing newline"""
+    if layout["inline_depth"] is not None:
+        text = _inline(document, layout["ensure_ascii"], layout["inline_depth"])
+    else:
+        separators = tuple(layout["separators"]) if layout["separators"] else None
+        text = json.dumps(document, indent=layout["indent"], separators=separators,
+                          ensure_ascii=layout["ensure_ascii"])
+    return text + layout["newline"]
+
+def detect(text, document=None):
+    """The layout that reproduces text exactly, or None"""
+    if document is None:
+        document = json.loads(text)
+    for candidate in LAYOUTS:
+        # Non-ASCII text was written with ensure_ascii=False; pure-ASCII text could be either
+        for ensure_ascii in ([True, False] if text.isascii() else [False]):
+            layout = {**candidate, "ensure_ascii": ensure_ascii, "newline": "\n" if text.endswith("\n") else ""}
+            if dumps(document, layout) == text:
+                return layout
+    return None
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Metropolitan and nonmetropolitan area wages from the OEWS MSA files
+
+The MSA archive holds two workbooks, metro areas (MSA_M2023_dl.xlsx) and
+balance-of-state nonmetro areas (BOS_M2023_dl.xlsx), with several hundred
+thousand occupation x area rows between them. They are streamed in
+fetch_bls_data.CHUNK_SIZE chunks; each chunk is reduced to the occupations in
+the national file and appended to a per-state spool on disk, so memory is
+bounded by one chunk while reading and by one state while writing.
+
+Output is one shard per state in OUTPUT_DIR, e.g. us_metro_CA.json:
+
+    {
+      "state": "CA",
+      "areas": {"31080": {"title": "Los Angeles-Long Beach-Anaheim, CA", "type": "metro"}, ...},
+      "occupations": {"15-1252": {"by_area": {"31080": {"median": ..., "mean": ..., "employment": ...}}}},
+      "zip_areas": {"90210": "31080", ...},
+      "metadata": {...}
+    }
+
+Areas spanning several states (New York-Newark-Jersey City, NY-NJ-PA) appear
+in each of their states' shards. zip_areas links the ZIP codes of
+zip_code_data.json to an area: the Census 2020 ZCTA-to-county relationship
+file gives each ZIP's county (the one with the most land area, treating the
+ZIP as its ZCTA) and the BLS area definitions give each county's OEWS area.
+
+Usage:
+    python metro_wages.py                         # needs the national file for the occupation list
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import tempfile
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+import fetch_bls_data
+import http_cache
+import instrumentation
+from fetch_bls_data import CHUNK_SIZE, HEADERS, STATE_FIPS, _column, _is_special_code, _text, _whole_dollars
+from http_cache import fetch_cached
+
+MSA_URL = "https://www.bls.gov/oes/special.requests/oesm23ma.zip"
+AREA_DEFINITIONS_URL = "https://www.bls.gov/oes/2023/may/area_definitions_m2023.xlsx"
+ZCTA_COUNTY_URL = "https://www2.census.gov/geo/docs/maps-data/data/rel2020/zcta520/tab20_zcta520_county20_natl.txt"
+
+ZIP_CODES_PATH = "../SuccessClaude/Data/JSON/zip_code_data.json"
+OUTPUT_DIR = "../SuccessClaude/Data/JSON/us/metro"
+
+# OEWS AREA_TYPE codes
+AREA_TYPES = {"4": "metro", "6": "nonmetro"}
+
+SPOOL_COLUMNS = ['area', 'title', 'type', 'soc_code', 'median', 'mean', 'employment']
+
+def shard_path(state, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"us_metro_{state}.json")
+
+def _area_codes(values):
+    """Area codes as text without float suffixes or leading zeros ('0100001' and 100001.0 agree)"""
+    codes = _text(values).str.replace(r'\.0$', '', regex=True).str.lstrip('0')
+    return codes.where(values.notna(), '')
+
+def area_states(titles, primary_states):
+    """States each area belongs to: the codes after the title's last comma, plus PRIM_STATE"""
+    valid = set(STATE_FIPS.values())
+    states = []
+    for title, primary in zip(titles, primary_states):
+        suffix = title.rsplit(',', 1)[1] if ',' in title else ''
+        codes = [code.strip() for code in suffix.split('-')]
+        members = [code for code in codes if code in valid] if all(code in valid for code in codes) else []
+        if primary in valid and primary not in members:
+            members.insert(0, primary)
+        states.append(members)
+    return states
+
+# ============================================================================
+# Chunked ingest
+# ============================================================================
+
+def area_rows(df, occupations):
+    """Valid occupation x area rows of one chunk, with the states each row belongs to"""
+    # The MSA files name their columns like the state file; older vintages use lowercase
+    df = df.rename(columns=lambda name: str(name).strip().upper())
+
+    soc_codes = _text(_column(df, 'OCC_CODE'))
+    area = _area_codes(_column(df, 'AREA', None))
+    area_type = _text(_column(df, 'AREA_TYPE', None)).str.replace(r'\.0$', '', regex=True).map(AREA_TYPES)
+
+    a_median = _column(df, 'A_MEDIAN', None)
+    a_mean = _column(df, 'A_MEAN', None)
+    median = _whole_dollars(_text(a_median).str.replace(',', '', regex=False))
+    mean = _whole_dollars(_text(a_mean).str.replace(',', '', regex=False))
+
+    employment = _text(_column(df, 'TOT_EMP', None)).str.replace(',', '', regex=False)
+    has_employment = (
+        _column(df, 'TOT_EMP', None).notna()
+        & employment.str.replace('.', '', regex=False).str.isdigit().astype(bool)
+    )
+    emp = _whole_dollars(employment.where(has_employment, '0'))
+
+    # Same rules as the state file: known occupations with published, realistic wages
+    keep = (
+        soc_codes.isin(occupations.keys())
+        & area.ne('') & area_type.notna()
+        & a_median.notna() & a_mean.notna()
+        & ~_is_special_code(a_median) & ~_is_special_code(a_mean)
+        & median.notna() & mean.notna() & emp.notna()
+        & median.between(10000, 500000)
+    )
+
+    rows = pd.DataFrame({
+        'area': area[keep],
+        'title': _text(_column(df, 'AREA_TITLE')[keep]),
+        'type': area_type[keep],
+        'soc_code': soc_codes[keep],
+        'median': median[keep].astype(np.int64),
+        'mean': mean[keep].astype(np.int64),
+        'employment': emp[keep].astype(np.int64),
+    })
+    rows['states'] = area_states(rows['title'].tolist(), _text(_column(df, 'PRIM_STATE')[keep]).tolist())
+    return rows.explode('states').dropna(subset=['states']).rename(columns={'states': 'state'})
+
+@instrumentation.staged("metro_spool", rows_out=lambda spooled: sum(spooled.values()))
+def spool_metro_data(occupations, spool_dir, chunk_size=CHUNK_SIZE):
+    """Stream both MSA workbooks into spool_dir/<ST>.csv; returns rows spooled per state"""
+    archive_path = fetch_cached(MSA_URL, headers=HEADERS, timeout=60)
+    members = fetch_bls_data.archive_members(archive_path)
+
+    spooled = defaultdict(int)
+    for member in members:
+        for chunk in fetch_bls_data.iter_excel_chunks(MSA_URL, chunk_size, member):
+            rows = area_rows(chunk, occupations)
+            for state, group in rows.groupby('state', sort=False):
+                path = os.path.join(spool_dir, f"{state}.csv")
+                group[SPOOL_COLUMNS].to_csv(path, mode='a', header=not os.path.exists(path),
+                                            index=False, quoting=csv.QUOTE_NONNUMERIC)
+                spooled[state] += len(group)
+    return spooled
+
+# ============================================================================
+# ZIP → area crosswalk
+# ============================================================================
+
+def _matching_column(frame, *words):
+    """First column whose lowercased name contains every word"""
+    for column in frame.columns:
+        name = str(column).strip().lower()
+        if all(word in name for word in words):
+            return column
+    raise KeyError(f"No column containing {' '.join(words)!r}")
+
+def load_county_areas():
+    """{5-digit county FIPS: OEWS area code} from the BLS area definitions"""
+    path = fetch_cached(AREA_DEFINITIONS_URL, headers=HEADERS, timeout=60)
+    definitions = pd.read_excel(path, dtype=str)
+
+    state_fips = _text(definitions[_matching_column(definitions, "fips")]).str.zfill(2)
+    county = _text(definitions[_matching_column(definitions, "county", "code")]).str.zfill(3)
+    area = _area_codes(definitions[_matching_column(definitions, "msa", "code")])
+
+    # New England rows are per township; a county goes to the area most of its rows belong to
+    frame = pd.DataFrame({'county': state_fips + county, 'area': area})
+    frame = frame[frame['area'] != '']
+    counts = frame.groupby(['county', 'area']).size().reset_index(name='rows')
+    counts = counts.sort_values(['county', 'rows'], ascending=[True, False])
+    return dict(counts.drop_duplicates('county')[['county', 'area']].itertuples(index=False, name=None))
+
+def load_zcta_counties():
+    """{ZCTA: county FIPS} using the county holding most of each ZCTA's land area"""
+    path = fetch_cached(ZCTA_COUNTY_URL, headers=HEADERS, timeout=60)
+    parts = pd.read_csv(path, sep='|', dtype=str,
+                        usecols=['GEOID_ZCTA5_20', 'GEOID_COUNTY_20', 'AREALAND_PART'])
+    parts = parts.dropna(subset=['GEOID_ZCTA5_20', 'GEOID_COUNTY_20'])
+    parts['AREALAND_PART'] = pd.to_numeric(parts['AREALAND_PART'], errors='coerce').fillna(0)
+    parts = parts.sort_values(['GEOID_ZCTA5_20', 'AREALAND_PART'], ascending=[True, False])
+    largest = parts.drop_duplicates('GEOID_ZCTA5_20')
+    return dict(zip(largest['GEOID_ZCTA5_20'], largest['GEOID_COUNTY_20']))
+
+def zip_areas_by_state(zip_codes_path=ZIP_CODES_PATH):
+    """{state: {zip: area}} for the ZIP codes in zip_code_data.json"""
+    with open(zip_codes_path, 'r') as f:
+        zip_codes = json.load(f)["zip_codes"]
+
+    zcta_counties = load_zcta_counties()
+    county_areas = load_county_areas()
+
+    by_state = defaultdict(dict)
+    for zip_code, location in zip_codes.items():
+        area = county_areas.get(zcta_counties.get(zip_code))
+        if area:
+            by_state[location["state"]][zip_code] = area
+    return by_state
+
+# ============================================================================
+# Shards
+# ============================================================================
+
+def build_shard(state, rows, zip_areas):
+    """One state's shard from its spooled rows"""
+    # Later rows win, as they did for the state file
+    rows = rows.drop_duplicates(subset=['area', 'soc_code'], keep='last')
+
+    areas = rows.drop_duplicates('area').sort_values('area')
+    occupations = {}
+    for soc_code, group in rows.sort_values(['soc_code', 'area']).groupby('soc_code', sort=False):
+        occupations[soc_code] = {"by_area": {
+            area: {"median": median, "mean": mean, "employment": employment}
+            for area, median, mean, employment in zip(
+                group['area'].tolist(), group['median'].tolist(),
+                group['mean'].tolist(), group['employment'].tolist(),
+            )
+        }}
+
+    area_codes = set(areas['area'])
+    return {
+        "state": state,
+        "areas": {area: {"title": title, "type": area_type}
+                  for area, title, area_type in zip(areas['area'], areas['title'], areas['type'])},
+        "occupations": occupations,
+        "zip_areas": {zip_code: area for zip_code, area in sorted(zip_areas.items()) if area in area_codes},
+        "metadata": {
+            "source": "U.S. Bureau of Labor Statistics OEWS May 2023 (metropolitan and nonmetropolitan areas)",
+            "source_url": "https://www.bls.gov/oes/tables.htm",
+            "zip_crosswalk": "Census 2020 ZCTA-to-county relationships and BLS OEWS area definitions",
+        },
+    }
+
+def save_shard(shard, output_dir=OUTPUT_DIR):
+    path = shard_path(shard["state"], output_dir)
+    # Read by the app, not people; skip the indentation
+    with open(path, 'w') as f:
+        json.dump(shard, f, separators=(',', ':'))
+    return path
+
+@instrumentation.staged("metro_serialize")
+def write_shards(spool_dir, zip_areas, output_dir=OUTPUT_DIR):
+    """Write every state's shard, one state in memory at a time; returns {state: path}"""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for state in sorted(set(STATE_FIPS.values())):
+        spool_path = os.path.join(spool_dir, f"{state}.csv")
+        if os.path.exists(spool_path):
+            rows = pd.read_csv(spool_path, dtype={'area': str, 'title': str, 'type': str, 'soc_code': str})
+        else:
+            rows = pd.DataFrame(columns=SPOOL_COLUMNS)
+        # States without metro data still get a shard, so the set of files is fixed
+        paths[state] = save_shard(build_shard(state, rows, zip_areas.get(state, {})), output_dir)
+        instrumentation.record().wrote(paths[state])
+    return paths
+
+def run(occupations, chunk_size=CHUNK_SIZE, output_dir=OUTPUT_DIR):
+    """Ingest the MSA files and write the per-state shards; returns {state: path}"""
+    print("\nFetching metropolitan-area occupation data...")
+    spool_dir = tempfile.mkdtemp(prefix="metro_spool_")
+    try:
+        spooled = spool_metro_data(occupations, spool_dir, chunk_size)
+        if not spooled:
+            print("⚠ No metropolitan-area rows matched")
+
+        try:
+            zip_areas = zip_areas_by_state()
+        except Exception as e:
+            print(f"⚠ Could not build the ZIP crosswalk, writing shards without zip_areas: {e}")
+            zip_areas = {}
+        paths = write_shards(spool_dir, zip_areas, output_dir)
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    linked = sum(len(areas) for areas in zip_areas.values())
+    print(f"✓ {sum(spooled.values()):,} occupation x area rows across {len(spooled)} states")
+    print(f"✓ {linked:,} ZIP codes linked to an area")
+    print(f"✓ Saved {len(paths)} shards to {output_dir}")
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Write per-state metro-area wage shards from the OEWS MSA files")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--offline", action="store_true", help="serve downloads only from the local HTTP cache")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.start("metro_wages", args)
+
+    if args.offline:
+        http_cache.configure(offline=True)
+
+    print("=" * 60)
+    print("OEWS metropolitan-area wages")
+    print("=" * 60)
+
+    occupations = fetch_bls_data.fetch_national_data(stream=True, chunk_size=args.chunk_size)
+    if not occupations:
+        print("\n⚠ No national data fetched. Exiting.")
+        return
+    run(occupations, args.chunk_size)
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Occupation files split into a light index and lazily loaded detail shards
+
+The picker only needs each occupation's summary fields, but the occupation
+files carry every by_state and age_distribution block. This writes, next to
+each country's occupation file:
+
+    <cc>_occupation_index.json          every occupation without its detail blocks,
+                                        plus the key of the shard holding them
+    <cc>_occupation_shard_<key>.json    {"occupations": {"<code>": {"by_state": ..., "age_distribution": ...}}}
+    <cc>_occupations_manifest.json      byte size and SHA-256 of the index and every shard
+
+A code's shard key is computable without the index: the SOC major group for US
+codes ("15-1252" → "15"), the first SHARD_PREFIX characters of the code
+elsewhere (NOC, ANZSCO, KldB, FAP, CNO and UK SOC all group occupations by
+their leading digits or letters). A single character left shards of up to
+250 KB (nz, ca), most of which a lookup never reads; two keep the largest
+under 85 KB.
+
+The app bundles the index and shards in place of the full occupation files;
+those and the manifests are excluded from the target in project.pbxproj and
+stay in the repository for the scripts. File names carry the country code because the app bundle flattens
+the Data/JSON folders. The manifest is written last, so it only ever
+describes a complete set of files.
+
+Usage:
+    python occupation_shards.py          # every country except us, whose shards come from fetch_bls_data.py
+    python occupation_shards.py ca de    # selected countries
+"""
+
+import argparse
+import glob
+import json
+import os
+from collections import defaultdict
+
+from intermediate_store import file_sha256
+from percentile_tables import DATA_DIR, occupations_path
+
+FORMAT_VERSION = 1
+
+# Per-occupation blocks that move into the shards
+DETAIL_FIELDS = ["by_state", "age_distribution"]
+
+# Leading characters of a non-US code that name its shard
+SHARD_PREFIX = 2
+
+def shard_key(code):
+    return code.split("-")[0] if "-" in code else code[:SHARD_PREFIX]
+
+def index_path(country_code, output_dir):
+    return os.path.join(output_dir, f"{country_code}_occupation_index.json")
+
+def shard_path(country_code, key, output_dir):
+    return os.path.join(output_dir, f"{country_code}_occupation_shard_{key}.json")
+
+def manifest_path(country_code, output_dir):
+    return os.path.join(output_dir, f"{country_code}_occupations_manifest.json")
+
+def split(occupations):
+    """(index entries, {shard key: {code: detail}}) from occupation dicts in the output schema"""
+    index = []
+    shards = defaultdict(dict)
+    for occ in occupations:
+        key = shard_key(occ["soc_code"])
+        index.append({**{field: value for field, value in occ.items() if field not in DETAIL_FIELDS}, "shard": key})
+        # First occurrence wins, as getOccupationData's first(where:)
+        shards[key].setdefault(occ["soc_code"], {field: occ.get(field, {}) for field in DETAIL_FIELDS})
+    return index, dict(sorted(shards.items()))
+
+def _save(document, path):
+    # Read by the app, not people; skip the indentation
+    with open(path, 'w') as f:
+        json.dump(document, f, separators=(',', ':'), ensure_ascii=False)
+    return {"path": os.path.basename(path), "bytes": os.path.getsize(path), "sha256": file_sha256(path)}
+
+def write(document, country_code, output_dir):
+    """Write the index, shards and manifest for one occupation document; returns the manifest"""
+    index, shards = split(document["occupations"])
+    metadata = document.get("metadata", {})
+
+    entries = {}
+    for key, detail in shards.items():
+        entries[key] = {**_save({"occupations": detail}, shard_path(country_code, key, output_dir)),
+                        "occupations": len(detail)}
+    index_entry = _save({"occupations": index, "metadata": metadata}, index_path(country_code, output_dir))
+
+    # Shards of keys that no longer exist would otherwise linger in the bundle
+    current = {shard_path(country_code, key, output_dir) for key in shards}
+    for stale in glob.glob(shard_path(country_code, "*", output_dir)):
+        if stale not in current:
+            os.remove(stale)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "country_code": country_code,
+        "index": {**index_entry, "occupations": len(index)},
+        "shards": entries,
+        "metadata": {
+            "version": metadata.get("version"),
+            "detail_fields": DETAIL_FIELDS,
+        },
+    }
+    _save(manifest, manifest_path(country_code, output_dir))
+    return manifest
+
+def build_country(country_code, data_dir=DATA_DIR):
+    """Split one country's bundled occupation file in its own directory"""
+    path = occupations_path(country_code, data_dir)
+    with open(path, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    return write(document, country_code, os.path.dirname(path))
+
+def main():
+    parser = argparse.ArgumentParser(description="Split occupation files into an index and detail shards")
+    parser.add_argument("countries", nargs="*",
+                        help="country codes (default: every country except us, whose shards come from fetch_bls_data.py)")
+    args = parser.parse_args()
+
+    countries = args.countries or sorted(
+        entry for entry in os.listdir(DATA_DIR)
+        if entry != "us" and os.path.exists(occupations_path(entry))
+    )
+
+    for country_code in countries:
+        if not os.path.exists(occupations_path(country_code)):
+            print(f"⚠ {country_code}: no occupation file at {occupations_path(country_code)}")
+            continue
+
+        manifest = build_country(country_code)
+        shard_bytes = sum(entry["bytes"] for entry in manifest["shards"].values())
+        print(f"✓ {country_code}: index {manifest['index']['bytes']:,} bytes, "
+              f"{len(manifest['shards'])} shards {shard_bytes:,} bytes "
+              f"(full file {os.path.getsize(occupations_path(country_code)):,})")
+
+if __name__ == "__main__":
+    main()
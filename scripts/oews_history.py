@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Multi-year OEWS ingestion: national wage time series per occupation
+
+Each May release from FIRST_YEAR on is downloaded concurrently into the HTTP
+cache, then parsed on a process pool, one year per worker, with the same
+column operations fetch_bls_data.py uses for the current snapshot.
+
+Releases up to May 2018 use SOC 2010 codes, May 2019 and 2020 a hybrid of
+SOC 2010 and 2018, and May 2021 onwards SOC 2018. Every year is reconciled
+onto the SOC 2018 codes of the latest release (or the current snapshot) with
+the BLS 2010-to-2018 crosswalk:
+
+    unchanged code      value carried over
+    renumbered code     value carried over ("recoded")
+    one code split      every new code gets the old value ("split")
+    codes merged        employment-weighted wages, summed employment ("merged")
+
+The output is one compact document:
+
+    {
+      "years": [2015, ..., 2024],
+      "occupations": {
+        "15-1252": {"median": [...], "mean": [...], "employment": [...],
+                    "median_growth": 0.0412, "reconciled": [2015, ...]},
+        ...
+      },
+      "metadata": {...}
+    }
+
+with null for years an occupation was not published, and median_growth the
+compound annual growth between its first and last published medians. The app
+shows median_growth in the career forecast (DataLoader.getWageGrowth).
+
+Usage:
+    python oews_history.py                        # 2015 through the latest release
+    python oews_history.py 2018-2023 --workers 4
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import fetch_bls_data
+import http_cache
+import instrumentation
+from fetch_engine import run_concurrently
+from http_cache import fetch_cached
+
+FIRST_YEAR = 2015
+LATEST_YEAR = 2024
+
+# First release coded (at least partly) in SOC 2018; earlier years always go through the crosswalk
+SOC_2018_FROM = 2019
+# First release coded entirely in SOC 2018
+SOC_2018_ONLY_FROM = 2021
+
+SOC_CROSSWALK_URL = "https://www.bls.gov/soc/2018/soc_2010_to_2018_crosswalk.xlsx"
+
+OUTPUT_PATH = "../SuccessClaude/Data/JSON/us/us_wage_history.json"
+
+# Occupations need this many published medians for a growth rate
+MIN_GROWTH_YEARS = 3
+
+WORKERS = os.cpu_count() or 4
+
+def national_url(year):
+    return f"https://www.bls.gov/oes/special.requests/oesm{year % 100:02d}nat.zip"
+
+def parse_years(text):
+    """'2015-2024' or '2023' → list of years"""
+    first, _, last = text.partition("-")
+    first, last = int(first), int(last or first)
+    if first > last:
+        raise argparse.ArgumentTypeError(f"empty year range: {text}")
+    return list(range(first, last + 1))
+
+# ============================================================================
+# Per-year ingestion (runs in worker processes)
+# ============================================================================
+
+def year_rows(df):
+    """{soc_code: [median, mean, employment]} for one national release"""
+    # Older releases use lowercase column names
+    df = df.rename(columns=lambda name: str(name).strip().upper())
+
+    # Some releases repeat a code (listed at more than one aggregation level). Keep its
+    # first row, as DataLoader.getOccupationData does, so wages and employment agree
+    soc_codes = fetch_bls_data._text(fetch_bls_data._column(df, 'OCC_CODE'))
+    repeated = soc_codes.duplicated(keep='first')
+    if repeated.any():
+        print(f"  {repeated.sum()} repeated occupation rows dropped (first row kept)")
+        df, soc_codes = df[~repeated], soc_codes[~repeated]
+
+    occupations = fetch_bls_data.build_national_occupations(df)
+    employment = fetch_bls_data._whole_dollars(
+        fetch_bls_data._text(fetch_bls_data._column(df, 'TOT_EMP', None)).str.replace(',', '', regex=False)
+    )
+    kept = soc_codes.isin(occupations.keys())
+    employment = dict(zip(soc_codes[kept].tolist(), employment[kept].tolist()))
+
+    return {
+        soc_code: [occ["national_median"], occ["national_mean"],
+                   None if np.isnan(employment[soc_code]) else int(employment[soc_code])]
+        for soc_code, occ in occupations.items()
+    }
+
+def ingest_year(year, archive_path):
+    """Parse one downloaded release; returns (year, rows or None)"""
+    started = time.monotonic()
+    try:
+        df = fetch_bls_data.parse_archive(archive_path)
+    except Exception as e:
+        print(f"  {year}: could not parse {archive_path}: {e}")
+        return year, None
+    if df is None:
+        return year, None
+
+    rows = year_rows(df)
+    print(f"  {year}: {len(rows)} occupations ({time.monotonic() - started:.1f}s, pid {os.getpid()})")
+    return year, rows
+
+def download_years(years):
+    """Fetch every release into the HTTP cache at once; returns {year: archive path}"""
+    results = run_concurrently({
+        year: lambda year=year: fetch_cached(national_url(year), headers=fetch_bls_data.HEADERS, timeout=60)
+        for year in years
+    }, return_exceptions=True)
+
+    archives = {}
+    for year, result in sorted(results.items()):
+        if isinstance(result, Exception):
+            print(f"⚠ {year}: download failed ({result})")
+        else:
+            archives[year] = result
+    return archives
+
+@instrumentation.staged("history_ingest")
+def ingest_years(years, workers=WORKERS):
+    """{year: rows} for every release that could be downloaded and parsed"""
+    archives = download_years(years)
+    if not archives:
+        return {}
+
+    # Workers only read the archives the parent already cached, so they never write the cache index
+    with ProcessPoolExecutor(max_workers=min(workers, len(archives))) as executor:
+        results = executor.map(ingest_year, archives.keys(), archives.values())
+        return {year: rows for year, rows in results if rows}
+
+# ============================================================================
+# SOC 2010 → 2018 reconciliation
+# ============================================================================
+
+def load_soc_crosswalk():
+    """{2010 code: [2018 codes]} from the BLS crosswalk workbook"""
+    path = fetch_cached(SOC_CROSSWALK_URL, headers=fetch_bls_data.HEADERS, timeout=60)
+    raw = pd.read_excel(path, header=None, dtype=str)
+
+    # The table starts below a few lines of notes
+    header = raw.apply(lambda row: row.str.strip().str.lower().eq("2010 soc code").any(), axis=1)
+    if not header.any():
+        raise ValueError(f"No '2010 SOC Code' header in {SOC_CROSSWALK_URL}")
+    start = header.idxmax()
+
+    frame = raw.loc[start + 1:].set_axis(raw.loc[start].str.strip().str.lower(), axis=1)
+    frame = frame[["2010 soc code", "2018 soc code"]].dropna()
+
+    crosswalk = {}
+    for old_code, new_code in zip(frame["2010 soc code"].str.strip(), frame["2018 soc code"].str.strip()):
+        crosswalk.setdefault(old_code, [])
+        if new_code not in crosswalk[old_code]:
+            crosswalk[old_code].append(new_code)
+    return crosswalk
+
+def _combine(contributions):
+    """Employment-weighted median and mean, summed employment"""
+    weights = [employment or 1 for _, _, employment in contributions]
+    total = sum(weights)
+    median = int(sum(m * w for (m, _, _), w in zip(contributions, weights)) / total)
+    mean = int(sum(m * w for (_, m, _), w in zip(contributions, weights)) / total)
+    employments = [employment for _, _, employment in contributions if employment is not None]
+    return [median, mean, sum(employments) if employments else None]
+
+def reconcile_year(year, rows, crosswalk, target_codes):
+    """Re-key one release onto target_codes; returns ({code: values}, {code: method})"""
+    values = {}
+    methods = {}
+
+    if year >= SOC_2018_FROM:
+        for soc_code, row in rows.items():
+            if soc_code in target_codes:
+                values[soc_code] = row
+                methods[soc_code] = "direct"
+
+    contributions = {}
+    for soc_code, row in rows.items():
+        if year >= SOC_2018_FROM and soc_code in target_codes:
+            continue
+        # Codes missing from the crosswalk are assumed unchanged
+        new_codes = crosswalk.get(soc_code, [soc_code])
+        for new_code in new_codes:
+            if new_code in target_codes and new_code not in values:
+                contributions.setdefault(new_code, []).append((soc_code, row, len(new_codes) > 1))
+
+    for new_code, sources in contributions.items():
+        if len(sources) > 1:
+            values[new_code] = _combine([row for _, row, _ in sources])
+            methods[new_code] = "merged"
+            continue
+
+        old_code, values[new_code], split = sources[0]
+        if split:
+            methods[new_code] = "split"
+        else:
+            methods[new_code] = "direct" if old_code == new_code else "recoded"
+
+    return values, methods
+
+# ============================================================================
+# Output
+# ============================================================================
+
+def median_growth(medians):
+    """Compound annual growth between the first and last published median"""
+    published = [(i, m) for i, m in enumerate(medians) if m]
+    if len(published) < MIN_GROWTH_YEARS:
+        return None
+    (first_index, first), (last_index, last) = published[0], published[-1]
+    return round((last / first) ** (1 / (last_index - first_index)) - 1, 4)
+
+@instrumentation.staged("history_reconcile", rows_in=len, rows_out=lambda result: len(result[0]["occupations"]))
+def build_history(by_year, crosswalk, target_codes=None):
+    """Reconcile every year and assemble the time-series document"""
+    years = sorted(by_year)
+    if target_codes is None:
+        target_codes = set(by_year[years[-1]])
+    target_codes = set(target_codes)
+
+    series = {}
+    report = {}
+    for position, year in enumerate(years):
+        values, methods = reconcile_year(year, by_year[year], crosswalk, target_codes)
+        report[year] = methods
+        for soc_code, row in values.items():
+            entry = series.setdefault(soc_code, {
+                "median": [None] * len(years),
+                "mean": [None] * len(years),
+                "employment": [None] * len(years),
+                "reconciled": [],
+            })
+            entry["median"][position], entry["mean"][position], entry["employment"][position] = row
+            if methods[soc_code] != "direct":
+                entry["reconciled"].append(year)
+
+    occupations = {}
+    for soc_code in sorted(series):
+        entry = series[soc_code]
+        occupations[soc_code] = {
+            "median": entry["median"],
+            "mean": entry["mean"],
+            "employment": entry["employment"],
+            "median_growth": median_growth(entry["median"]),
+            "reconciled": entry["reconciled"],
+        }
+
+    history = {
+        "years": years,
+        "occupations": occupations,
+        "metadata": {
+            "source": f"U.S. Bureau of Labor Statistics OEWS May {years[0]}-{years[-1]}",
+            "source_url": "https://www.bls.gov/oes/tables.htm",
+            "soc_version": "2018",
+            "crosswalk_url": SOC_CROSSWALK_URL,
+            "note": "Annual wages in nominal dollars. Years before SOC 2018 are mapped through the "
+                    "BLS crosswalk; recoded, split and merged occupations are listed under 'reconciled'.",
+        },
+    }
+    return history, report
+
+def save_history(history, output_path=OUTPUT_PATH):
+    # Read by the app, not people; skip the indentation
+    with open(output_path, 'w') as f:
+        json.dump(history, f, separators=(',', ':'))
+
+def print_report(history, report):
+    for year, methods in sorted(report.items()):
+        counts = pd.Series(list(methods.values()), dtype=object).value_counts()
+        detail = ", ".join(f"{method}: {count}" for method, count in sorted(counts.items()))
+        print(f"  {year}: {len(methods)} occupations ({detail})")
+
+    complete = sum(1 for entry in history["occupations"].values() if None not in entry["median"])
+    print(f"✓ {len(history['occupations'])} occupations, {complete} with every year published")
+
+def run(years, workers=WORKERS, target_codes=None, output_path=OUTPUT_PATH):
+    """Ingest, reconcile and save a year range; returns the document or None"""
+    print(f"Ingesting OEWS {years[0]}-{years[-1]} on {min(workers, len(years))} processes...")
+    started = time.monotonic()
+    by_year = ingest_years(years, workers)
+    if not by_year:
+        print("⚠ No OEWS releases could be ingested")
+        return None
+    print(f"✓ Parsed {len(by_year)} releases in {time.monotonic() - started:.1f}s")
+
+    crosswalk = load_soc_crosswalk() if min(by_year) < SOC_2018_ONLY_FROM else {}
+    history, report = build_history(by_year, crosswalk, target_codes)
+    print_report(history, report)
+
+    save_history(history, output_path)
+    print(f"✓ Saved wage history to {output_path}")
+    return history
+
+def main():
+    parser = argparse.ArgumentParser(description="Build per-occupation wage time series from several OEWS releases")
+    parser.add_argument("years", nargs="?", type=parse_years, default=list(range(FIRST_YEAR, LATEST_YEAR + 1)),
+                        help=f"year or range (default: {FIRST_YEAR}-{LATEST_YEAR})")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"parser processes (default: {WORKERS})")
+    parser.add_argument("--offline", action="store_true", help="serve downloads only from the local HTTP cache")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.start("oews_history", args)
+
+    if args.offline:
+        http_cache.configure(offline=True)
+
+    print("=" * 60)
+    print("OEWS wage history")
+    print("=" * 60)
+    run(args.years, args.workers)
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Build-time wage quantile tables
+
+For each occupation (nationally and per region) the app gets a small array of
+wage values at fixed QUANTILES, so a percentile lookup is an interpolation over
+five points instead of a guess from median and mean. US tables come from the
+OEWS A_PCT10/25/75/90 columns kept by fetch_bls_data.py; for countries that
+only publish median and mean, a lognormal is fitted to those two values.
+
+us_percentile_tables.json is only written by a full fetch_bls_data.py run
+(or build.py's emit_percentile_tables): the percentile columns exist only in
+the downloaded OEWS workbooks, and the repository has no US occupation file
+to fit from. Until that run, the app approximates US percentiles from median
+and mean as before.
+
+Table layout:
+    {
+      "quantiles": [10, 25, 50, 75, 90],
+      "occupations": {
+        "<soc_code>": {"national": [p10, p25, p50, p75, p90],
+                       "by_state": {"<region>": [...]},
+                       "fitted": false}
+      },
+      "metadata": {...}
+    }
+
+The file is written in compact_format's gzipped columnar encoding; load it
+with compact_format.load_document.
+
+Usage:
+    python percentile_tables.py            # fit tables for every non-US country
+    python percentile_tables.py ca de      # selected countries
+"""
+
+import argparse
+import json
+import math
+import os
+
+import compact_format
+
+QUANTILES = [10, 25, 50, 75, 90]
+
+# Standard normal quantiles for QUANTILES
+Z_SCORES = [-1.2815515655446004, -0.6744897501960817, 0.0, 0.6744897501960817, 1.2815515655446004]
+
+# Spread used when mean <= median, where the lognormal fit is undefined
+DEFAULT_SIGMA = 0.5
+MAX_SIGMA = 1.5
+
+DATA_DIR = "../SuccessClaude/Data/JSON"
+
+# Same file names DataLoader.loadOccupationsData uses
+OCCUPATION_FILES = {
+    "uk": "uk_occupations_full",
+    "us": "us_bls_oews_occupations",
+}
+
+def lognormal_sigma(median, mean):
+    """Shape of the lognormal with this median and mean (mean = median * exp(sigma^2 / 2))"""
+    if median <= 0 or mean <= median:
+        return DEFAULT_SIGMA
+    return min(MAX_SIGMA, math.sqrt(2 * math.log(mean / median)))
+
+def lognormal_quantiles(median, mean):
+    """Wage at each of QUANTILES for a lognormal fitted to median and mean"""
+    sigma = lognormal_sigma(median, mean)
+    return [int(median * math.exp(sigma * z)) for z in Z_SCORES]
+
+def complete_quantiles(points, median, mean):
+    """Fill missing points (None, e.g. BLS top-coded '#') from the lognormal fit.
+
+    Returns (values, fitted) where fitted is True if any point was estimated.
+    Values are forced non-decreasing so lookups can bisect them.
+    """
+    fit = lognormal_quantiles(median, mean)
+    points = list(points) if points else [None] * len(QUANTILES)
+
+    values = []
+    for point, estimate in zip(points, fit):
+        value = estimate if point is None else int(point)
+        values.append(max(value, values[-1]) if values else value)
+
+    return values, any(point is None for point in points)
+
+def build_tables(occupations, metadata=None):
+    """Build the quantile table document from occupation dicts in the output schema"""
+    table = {}
+    fitted_count = 0
+
+    for occ in occupations:
+        national, fitted = complete_quantiles(
+            occ.get("percentiles"), occ["national_median"], occ["national_mean"])
+        fitted_count += fitted
+
+        table[occ["soc_code"]] = {
+            "national": national,
+            "by_state": {
+                region: complete_quantiles(stats.get("percentiles"), stats["median"], stats["mean"])[0]
+                for region, stats in occ.get("by_state", {}).items()
+            },
+            "fitted": fitted,
+        }
+
+    return {
+        "quantiles": QUANTILES,
+        "occupations": table,
+        "metadata": {
+            **(metadata or {}),
+            "total_occupations": len(table),
+            "fitted_occupations": fitted_count,
+            "method": "published percentiles where available, otherwise a lognormal fitted to median and mean",
+        }
+    }
+
+def save_tables(tables, output_path):
+    # Tables are read by the app, not people; columnar and gzipped, as the bulk of the file is numbers
+    compact_format.save_document(tables, output_path, "gzip")
+
+def occupations_path(country_code, data_dir=DATA_DIR):
+    filename = OCCUPATION_FILES.get(country_code, f"{country_code}_occupations")
+    return os.path.join(data_dir, country_code, f"{filename}.json")
+
+def tables_path(country_code, data_dir=DATA_DIR):
+    return os.path.join(data_dir, country_code, f"{country_code}_percentile_tables.json")
+
+def build_country(country_code, data_dir=DATA_DIR):
+    """Fit and save the tables for one country's bundled occupation file"""
+    with open(occupations_path(country_code, data_dir), 'r') as f:
+        data = json.load(f)
+
+    source = data.get("metadata", {})
+    tables = build_tables(data["occupations"], {
+        "country_code": country_code,
+        "source": source.get("source") or source.get("data_source", ""),
+        "currency": source.get("currency", ""),
+    })
+    save_tables(tables, tables_path(country_code, data_dir))
+    return tables
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit wage quantile tables for countries without published percentiles")
+    parser.add_argument("countries", nargs="*",
+                        help="country codes (default: every country except us, whose tables come from fetch_bls_data.py)")
+    args = parser.parse_args()
+
+    countries = args.countries or sorted(
+        entry for entry in os.listdir(DATA_DIR)
+        if entry != "us" and os.path.exists(occupations_path(entry))
+    )
+
+    for country_code in countries:
+        if not os.path.exists(occupations_path(country_code)):
+            print(f"⚠ {country_code}: no occupation file at {occupations_path(country_code)}")
+            continue
+
+        tables = build_country(country_code)
+        meta = tables["metadata"]
+        print(f"✓ {country_code}: {meta['total_occupations']} occupations "
+              f"({meta['fitted_occupations']} fitted) → {tables_path(country_code)}")
+
+if __name__ == "__main__":
+    main()
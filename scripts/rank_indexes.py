@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Pre-sorted ranking indexes for the results screen
+
+The state ranking and similar-occupation cards only depend on the data files,
+so the orderings are computed once here instead of on every results screen:
+
+    {
+      "state_rankings": {
+        "<soc_code>": {"codes": ["CA", "NY", ...], "medians": [...]}     # median, descending
+      },
+      "similar_occupations": {
+        "<soc_code>": [{"soc_code": ..., "title": ..., "median": ...,
+                        "percentage_difference": ...}, ...]              # same category, median descending
+      },
+      "metadata": {...}
+    }
+
+Ties are broken by code so the output is stable between builds. The file is
+written in compact_format's gzipped columnar encoding; load it with
+compact_format.load_document.
+
+Usage:
+    python rank_indexes.py            # every country except us, whose index comes from fetch_bls_data.py
+    python rank_indexes.py ca de      # selected countries
+"""
+
+import argparse
+import json
+import os
+from collections import defaultdict
+
+import compact_format
+from percentile_tables import DATA_DIR, occupations_path
+
+# The app shows the top five similar occupations
+SIMILAR_LIMIT = 5
+
+def state_ranking(occupation):
+    """Regions with data for an occupation, ordered by median descending"""
+    ranked = sorted(occupation.get("by_state", {}).items(), key=lambda item: (-item[1]["median"], item[0]))
+    return {
+        "codes": [code for code, _ in ranked],
+        "medians": [stats["median"] for _, stats in ranked],
+    }
+
+def similar_occupations(occupation, members, limit=SIMILAR_LIMIT):
+    """Highest-paid other occupations in the same category, with % difference from this one"""
+    median = occupation["national_median"]
+    similar = []
+    for other in members:
+        if other["soc_code"] == occupation["soc_code"]:
+            continue
+        similar.append({
+            "soc_code": other["soc_code"],
+            "title": other["title"],
+            "median": other["national_median"],
+            "percentage_difference": round((other["national_median"] - median) / median * 100, 2) if median else 0,
+        })
+        if len(similar) == limit:
+            break
+    return similar
+
+def build_indexes(occupations, metadata=None):
+    """Build the ranking document from occupation dicts in the output schema"""
+    occupations = sorted(occupations, key=lambda occ: occ["soc_code"])
+
+    by_category = defaultdict(list)
+    for occ in occupations:
+        by_category[occ["category"]].append(occ)
+    for members in by_category.values():
+        members.sort(key=lambda occ: (-occ["national_median"], occ["soc_code"]))
+
+    return {
+        "state_rankings": {occ["soc_code"]: state_ranking(occ) for occ in occupations},
+        "similar_occupations": {
+            occ["soc_code"]: similar_occupations(occ, by_category[occ["category"]]) for occ in occupations
+        },
+        "metadata": {
+            **(metadata or {}),
+            "total_occupations": len(occupations),
+            "similar_limit": SIMILAR_LIMIT,
+        }
+    }
+
+def save_indexes(indexes, output_path):
+    # Read by the app, not people; columnar and gzipped like the other derived tables
+    compact_format.save_document(indexes, output_path, "gzip")
+
+def indexes_path(country_code, data_dir=DATA_DIR):
+    return os.path.join(data_dir, country_code, f"{country_code}_rank_indexes.json")
+
+def build_country(country_code, data_dir=DATA_DIR):
+    """Build and save the indexes for one country's bundled occupation file"""
+    with open(occupations_path(country_code, data_dir), 'r') as f:
+        data = json.load(f)
+
+    indexes = build_indexes(data["occupations"], {"country_code": country_code})
+    save_indexes(indexes, indexes_path(country_code, data_dir))
+    return indexes
+
+def main():
+    parser = argparse.ArgumentParser(description="Build state-ranking and similar-occupation indexes")
+    parser.add_argument("countries", nargs="*",
+                        help="country codes (default: every country except us, whose index comes from fetch_bls_data.py)")
+    args = parser.parse_args()
+
+    countries = args.countries or sorted(
+        entry for entry in os.listdir(DATA_DIR)
+        if entry != "us" and os.path.exists(occupations_path(entry))
+    )
+
+    for country_code in countries:
+        if not os.path.exists(occupations_path(country_code)):
+            print(f"⚠ {country_code}: no occupation file at {occupations_path(country_code)}")
+            continue
+
+        indexes = build_country(country_code)
+        print(f"✓ {country_code}: {indexes['metadata']['total_occupations']} occupations → {indexes_path(country_code)}")
+
+if __name__ == "__main__":
+    main()
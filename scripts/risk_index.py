@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Flattened automation-risk lookup for every occupation code of every country
+
+DataLoader.getAutomationRisk resolves a code by scanning the risk rows several
+times: the country's own rows (2-digit prefix for UK SOC 2020), then the
+crosswalk to US SOC, then the US minor group (XX-XXX0) and broad group
+(XX-X000). This script runs the same resolution once at build time and writes
+one table the app reads with a single dictionary probe:
+
+    {
+      "format_version": 1,
+      "profiles": [[ai_risk, robotics_risk, overall_risk], ...],
+      "rows": [[soc_code, title, category, profile], ...],
+      "lookup": {"<country>": {"<code>": row, ...}, ...},
+      "metadata": {"<country>": {...risk file metadata...}}
+    }
+
+Each distinct source row is stored once, so the many codes that resolve to
+the same US row (a crosswalk target, or a parent group standing in for its
+children) share one entry and still report the soc_code of the row found.
+Detailed US codes that only repeat their parent group are already left out
+of the US file (fetch_ai_risk_data.drop_inherited_rows).
+
+Usage:
+    python risk_index.py
+"""
+
+import argparse
+import json
+import os
+from collections import Counter
+
+from percentile_tables import DATA_DIR, occupations_path
+
+FORMAT_VERSION = 1
+
+OUTPUT_PATH = os.path.join(DATA_DIR, "automation_risk_index.json")
+
+# Crosswalk from each country's occupation codes to US SOC, as in DataLoader.getAutomationRisk
+MAPPING_FILES = {
+    "uk": "uk_to_us_soc_mapping",
+    "ca": "noc_to_soc_mapping",
+    "au": "anzsco_to_soc_mapping",
+    "nz": "anzsco_to_soc_mapping",
+    "de": "kldb_to_soc_mapping",
+    "fr": "fap_to_soc_mapping",
+    "es": "cno_to_soc_mapping",
+}
+
+# Countries whose own risk data is published at a coarser level than their occupation codes
+PREFIX_LENGTHS = {"uk": 2}
+
+def _load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def risk_path(country_code, data_dir=DATA_DIR):
+    return os.path.join(data_dir, country_code, f"{country_code}_automation_risk_data.json")
+
+def load_risk_data(country_code, data_dir=DATA_DIR):
+    path = risk_path(country_code, data_dir)
+    return _load_json(path) if os.path.exists(path) else None
+
+def load_mapping(country_code, data_dir=DATA_DIR):
+    if country_code not in MAPPING_FILES:
+        return {}
+    return _load_json(os.path.join(data_dir, f"{MAPPING_FILES[country_code]}.json"))["mappings"]
+
+def rows_by_code(risk_data):
+    """First row for each code, matching first(where:) in the app"""
+    rows = {}
+    for row in (risk_data or {}).get("automation_risks", []):
+        rows.setdefault(row["soc_code"], row)
+    return rows
+
+def parent_codes(soc_code):
+    """US SOC minor group then broad group (27-2011 → 27-2010, 27-2000)"""
+    if len(soc_code) != 7:
+        return []
+    return [soc_code[:-1] + "0", soc_code[:4] + "000"]
+
+def resolve(country_code, code, own_rows, us_rows, mapping):
+    """The risk row the app would return for a code, and how it was found"""
+    search_code = code
+    prefix = PREFIX_LENGTHS.get(country_code)
+    if prefix and len(code) >= prefix:
+        search_code = code[:prefix]
+    if search_code in own_rows:
+        return own_rows[search_code], "own"
+
+    us_code = code if country_code == "us" else mapping.get(code)
+    if us_code is None:
+        return None, "unmapped"
+    if us_code in us_rows:
+        return us_rows[us_code], "exact" if country_code == "us" else "crosswalk"
+    for parent in parent_codes(us_code):
+        if parent in us_rows:
+            return us_rows[parent], "parent"
+    return None, "no_risk_data"
+
+def country_codes_to_resolve(country_code, own_rows, mapping, data_dir=DATA_DIR):
+    """Every code the app can ask about: occupation file, own risk rows and crosswalk keys"""
+    codes = set(own_rows) | set(mapping)
+    path = occupations_path(country_code, data_dir)
+    if os.path.exists(path):
+        codes.update(occ["soc_code"] for occ in _load_json(path)["occupations"])
+    return sorted(codes)
+
+def build_index(countries, data_dir=DATA_DIR):
+    """Resolve every code of every country, returning (index, coverage per country)"""
+    us_risk = load_risk_data("us", data_dir)
+    us_rows = rows_by_code(us_risk)
+
+    profiles = {}
+    rows = {}
+    lookup = {}
+    metadata = {}
+    coverage = {}
+
+    def row_id(row):
+        scores = (row["ai_risk"], row["robotics_risk"], row["overall_risk"])
+        profile = profiles.setdefault(scores, len(profiles))
+        key = (row["soc_code"], row["title"], row["category"], profile)
+        return rows.setdefault(key, len(rows))
+
+    for country_code in countries:
+        own_risk = us_risk if country_code == "us" else load_risk_data(country_code, data_dir)
+        own_rows = rows_by_code(own_risk)
+        mapping = load_mapping(country_code, data_dir)
+
+        table = {}
+        methods = Counter()
+        for code in country_codes_to_resolve(country_code, own_rows, mapping, data_dir):
+            row, method = resolve(country_code, code, own_rows, us_rows, mapping)
+            methods[method] += 1
+            if row is not None:
+                table[code] = row_id(row)
+
+        lookup[country_code] = table
+        coverage[country_code] = methods
+        if own_risk:
+            metadata[country_code] = own_risk["metadata"]
+
+    index = {
+        "format_version": FORMAT_VERSION,
+        "profiles": [list(scores) for scores in profiles],
+        "rows": [list(key) for key in rows],
+        "lookup": lookup,
+        "metadata": metadata,
+    }
+    return index, coverage
+
+def save_index(index, output_path=OUTPUT_PATH):
+    # Read by the app, not people; skip the indentation
+    with open(output_path, 'w') as f:
+        json.dump(index, f, separators=(',', ':'), ensure_ascii=False)
+
+def available_countries(data_dir=DATA_DIR):
+    return sorted(
+        entry for entry in os.listdir(data_dir)
+        if os.path.isdir(os.path.join(data_dir, entry))
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the flattened automation-risk lookup index")
+    parser.add_argument("countries", nargs="*", help="country codes (default: every country directory)")
+    args = parser.parse_args()
+
+    index, coverage = build_index(args.countries or available_countries())
+    save_index(index)
+
+    source_rows = sum(len(rows_by_code(load_risk_data(cc))) for cc in index["lookup"])
+    print(f"✓ {len(index['rows'])} distinct rows (from {source_rows} source rows), "
+          f"{len(index['profiles'])} score profiles")
+    for country_code, methods in coverage.items():
+        resolved = len(index["lookup"][country_code])
+        detail = ", ".join(f"{method}: {count}" for method, count in sorted(methods.items()))
+        print(f"  {country_code}: {resolved}/{sum(methods.values())} codes resolved ({detail})")
+    print(f"✓ Saved {OUTPUT_PATH} ({os.path.getsize(OUTPUT_PATH):,} bytes)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Prebuilt occupation title search index
+
+OccupationPickerView used to filter the whole occupation list with
+localizedCaseInsensitiveContains on the title, category and code on every
+keystroke. This builds postings per country once, so a query costs a binary
+search over the vocabulary and a few sorted-list intersections
+(DataLoader.searchOccupations runs the same query in the app):
+
+    {
+      "format_version": 3,
+      "codes": [...], "titles": [...],                  # document id = position
+      "categories": [...], "category_ids": [...],       # category names and each document's category
+      "vocabulary": ["<token>", ...],                   # sorted by code point; title, code and alias tokens
+      "postings": [[gaps], ...],                        # per vocabulary entry: title/code documents
+      "alias_postings": [[gaps], ...],                  # per vocabulary entry: alias documents
+      "trigrams": ["<trigram>", ...],                   # sorted by code point; of titles and codes
+      "trigram_postings": [[gaps], ...],                # per trigram: documents containing it
+      "metadata": {...}
+    }
+
+Postings are gap-encoded (each id stored as the difference from the previous
+one), and the title/code and alias postings share one token table. Prefixes
+are answered by walking the sorted vocabulary from the query word's insertion
+point. Substring matches intersect the postings of the query's trigrams and
+only check the surviving candidates; category names, of which there are a
+few dozen, are matched directly. Queries shorter than a trigram match
+category names only, since the prefix tier already covers word starts.
+
+Text is normalized by case folding and stripping diacritics, so "securite"
+finds "Sécurité". Aliases come from the *_to_soc_mapping.json crosswalks:
+each occupation also answers to the US title of its SOC code and the titles
+of other countries' occupations that map to the same code, so "software
+developer" finds the German and French equivalents.
+
+The query API (SearchIndex) matches each query word as a token prefix, then
+falls back to the app's substring match and finally to aliases.
+
+Usage:
+    python search_index.py                          # every country except us, whose index comes from fetch_bls_data.py
+    python search_index.py ca de                    # selected countries
+    python search_index.py --search "nurse" ca      # query a built index
+"""
+
+import argparse
+import bisect
+import json
+import os
+import re
+import unicodedata
+from collections import defaultdict
+
+from percentile_tables import DATA_DIR, occupations_path
+from risk_index import MAPPING_FILES, load_mapping, load_risk_data, parent_codes, rows_by_code
+
+FORMAT_VERSION = 3
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# ============================================================================
+# Text
+# ============================================================================
+
+def normalize(text):
+    """Case-folded text without diacritics"""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(normalize(text))
+
+def trigrams(text):
+    """Every three-character substring of already normalized text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _gaps(ids):
+    """Sorted ids as differences from the previous id"""
+    ids = sorted(ids)
+    return [current - previous for previous, current in zip([0] + ids, ids)]
+
+def _ungap(gaps):
+    ids = []
+    position = 0
+    for gap in gaps:
+        position += gap
+        ids.append(position)
+    return ids
+
+def _intersect(sets):
+    sets = sorted(sets, key=len)
+    if not sets:
+        return set()
+    result = set(sets[0])
+    for other in sets[1:]:
+        result.intersection_update(other)
+    return result
+
+# ============================================================================
+# Aliases
+# ============================================================================
+
+def us_titles(data_dir=DATA_DIR):
+    """US SOC code → title, from the occupation file where present and the automation risk rows"""
+    titles = {code: row["title"] for code, row in rows_by_code(load_risk_data("us", data_dir)).items()}
+    path = occupations_path("us", data_dir)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            titles.update((occ["soc_code"], occ["title"]) for occ in json.load(f)["occupations"])
+    return titles
+
+def us_code(country_code, code, mapping):
+    return code if country_code == "us" else mapping.get(code)
+
+def alias_table(country_code, codes, data_dir=DATA_DIR):
+    """{code: (us_code, [alias titles])} for one country's codes through the SOC crosswalks"""
+    titles = us_titles(data_dir)
+
+    # Every other country's titles, grouped by the US code they map to
+    equivalents = defaultdict(list)
+    for other in sorted(MAPPING_FILES):
+        path = occupations_path(other, data_dir)
+        if other == country_code or not os.path.exists(path):
+            continue
+        mapping = load_mapping(other, data_dir)
+        with open(path, 'r') as f:
+            for occ in json.load(f)["occupations"]:
+                target = mapping.get(occ["soc_code"])
+                if target:
+                    equivalents[target].append(occ["title"])
+
+    mapping = load_mapping(country_code, data_dir)
+    table = {}
+    for code in codes:
+        target = us_code(country_code, code, mapping)
+        if not target:
+            continue
+        aliases = [titles[candidate] for candidate in [target, *parent_codes(target)] if candidate in titles][:1]
+        aliases += equivalents.get(target, [])
+        table[code] = (target, aliases)
+    return table
+
+# ============================================================================
+# Build
+# ============================================================================
+
+def build_index(occupations, metadata=None, aliases=None):
+    """Build the search document from occupation dicts in the output schema
+
+    aliases maps codes to (us_code, [alias titles]) as returned by alias_table.
+    """
+    documents = {}
+    for occ in sorted(occupations, key=lambda occ: occ["soc_code"]):
+        documents.setdefault(occ["soc_code"], occ)
+    documents = list(documents.values())
+    aliases = aliases or {}
+
+    categories = sorted({occ["category"] for occ in documents})
+    category_ids = {category: position for position, category in enumerate(categories)}
+
+    tokens = defaultdict(set)
+    alias_tokens = defaultdict(set)
+    grams = defaultdict(set)
+    for doc_id, occ in enumerate(documents):
+        for field in (occ["title"], occ["soc_code"]):
+            for token in tokenize(field):
+                tokens[token].add(doc_id)
+            for gram in trigrams(normalize(field)):
+                grams[gram].add(doc_id)
+        tokens[normalize(occ["soc_code"])].add(doc_id)
+
+        own = set(tokenize(occ["title"]))
+        for title in aliases.get(occ["soc_code"], (None, []))[1]:
+            for token in set(tokenize(title)) - own:
+                alias_tokens[token].add(doc_id)
+
+    vocabulary = sorted(set(tokens) | set(alias_tokens))
+    trigram_list = sorted(grams)
+    return {
+        "format_version": FORMAT_VERSION,
+        "codes": [occ["soc_code"] for occ in documents],
+        "titles": [occ["title"] for occ in documents],
+        "categories": categories,
+        "category_ids": [category_ids[occ["category"]] for occ in documents],
+        "vocabulary": vocabulary,
+        "postings": [_gaps(tokens.get(token, ())) for token in vocabulary],
+        "alias_postings": [_gaps(alias_tokens.get(token, ())) for token in vocabulary],
+        "trigrams": trigram_list,
+        "trigram_postings": [_gaps(grams[gram]) for gram in trigram_list],
+        "metadata": {
+            **(metadata or {}),
+            "total_occupations": len(documents),
+            "total_tokens": len(tokens),
+            "aliased_occupations": sum(1 for occ in documents if occ["soc_code"] in aliases),
+        },
+    }
+
+def save_index(index, output_path):
+    # Read by the app, not people; skip the indentation
+    with open(output_path, 'w') as f:
+        json.dump(index, f, separators=(',', ':'), ensure_ascii=False)
+
+def index_path(country_code, data_dir=DATA_DIR):
+    return os.path.join(data_dir, country_code, f"{country_code}_search_index.json")
+
+def build_country(country_code, data_dir=DATA_DIR):
+    """Build and save the index for one country's bundled occupation file"""
+    with open(occupations_path(country_code, data_dir), 'r') as f:
+        occupations = json.load(f)["occupations"]
+
+    aliases = alias_table(country_code, [occ["soc_code"] for occ in occupations], data_dir)
+    index = build_index(occupations, {"country_code": country_code}, aliases)
+    save_index(index, index_path(country_code, data_dir))
+    return index
+
+# ============================================================================
+# Query
+# ============================================================================
+
+class SearchIndex:
+    """Queries over a built index document"""
+
+    def __init__(self, document):
+        if document.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported search index version {document.get('format_version')}; rebuild it")
+        self.document = document
+        self.codes = document["codes"]
+        self.titles = document["titles"]
+        self.categories = document["categories"]
+        self.category_ids = document["category_ids"]
+        self.vocabulary = document["vocabulary"]
+        self.postings = [set(_ungap(gaps)) for gaps in document["postings"]]
+        self.alias_postings = [set(_ungap(gaps)) for gaps in document["alias_postings"]]
+        self.trigrams = {gram: set(_ungap(gaps)) for gram, gaps in zip(document["trigrams"], document["trigram_postings"])}
+        self.facets = [set() for _ in self.categories]
+        for doc_id, category_id in enumerate(self.category_ids):
+            self.facets[category_id].add(doc_id)
+        # Fields the app's substring match looks at, normalized
+        self.fields = [(normalize(title), normalize(self.categories[category]), normalize(code))
+                       for code, title, category in zip(self.codes, self.titles, self.category_ids)]
+
+    @classmethod
+    def load(cls, country_code, data_dir=DATA_DIR):
+        with open(index_path(country_code, data_dir), 'r') as f:
+            return cls(json.load(f))
+
+    def _prefix_matches(self, term, postings):
+        """Documents with a token starting with term, from the vocabulary entries at its insertion point"""
+        matches = set()
+        for position in range(bisect.bisect_left(self.vocabulary, term), len(self.vocabulary)):
+            if not self.vocabulary[position].startswith(term):
+                break
+            matches |= postings[position]
+        return matches
+
+    def token_matches(self, query):
+        """Documents where every query word starts a title or code token"""
+        terms = tokenize(query)
+        if not terms:
+            return set()
+        return _intersect([self._prefix_matches(term, self.postings) for term in terms])
+
+    def contains(self, query):
+        """Documents whose title, category or code contains the query, as the app's filter
+
+        Candidates come from the trigram postings, so only they are checked; a needle
+        shorter than a trigram matches category names only.
+        """
+        needle = normalize(query).strip()
+        if not needle:
+            return set(range(len(self.codes)))
+
+        matches = set()
+        for category_id, category in enumerate(self.categories):
+            if needle in normalize(category):
+                matches |= self.facets[category_id]
+        if len(needle) >= 3:
+            candidates = _intersect([self.trigrams.get(gram, set()) for gram in trigrams(needle)])
+            matches |= {doc_id for doc_id in candidates
+                        if needle in self.fields[doc_id][0] or needle in self.fields[doc_id][2]}
+        return matches
+
+    def alias_matches(self, query):
+        """Documents where every query word starts an alias token"""
+        terms = tokenize(query)
+        if not terms:
+            return set()
+        return _intersect([self._prefix_matches(term, self.alias_postings) for term in terms])
+
+    def search(self, query, category=None, limit=None, aliases=True):
+        """Ranked matches: token prefixes, then substrings, then aliases; titles alphabetical within each"""
+        allowed = None
+        if category is not None:
+            allowed = self.facets[self.categories.index(category)] if category in self.categories else set()
+
+        tiers = [("token", self.token_matches(query)), ("substring", self.contains(query))]
+        if aliases:
+            tiers.append(("alias", self.alias_matches(query)))
+
+        results = []
+        seen = set()
+        for match, ids in tiers:
+            if allowed is not None:
+                ids = ids & allowed
+            for doc_id in sorted(ids - seen, key=lambda doc_id: (normalize(self.titles[doc_id]), self.codes[doc_id])):
+                results.append({
+                    "soc_code": self.codes[doc_id],
+                    "title": self.titles[doc_id],
+                    "category": self.categories[self.category_ids[doc_id]],
+                    "match": match,
+                })
+            seen |= ids
+        return results[:limit] if limit is not None else results
+
+    def facet_counts(self, results):
+        """Matches per category, for the picker's grouped sections"""
+        counts = defaultdict(int)
+        for result in results:
+            counts[result["category"]] += 1
+        return dict(sorted(counts.items()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Build occupation title search indexes")
+    parser.add_argument("countries", nargs="*",
+                        help="country codes (default: every country except us, whose index comes from fetch_bls_data.py)")
+    parser.add_argument("--search", metavar="QUERY", help="query the built indexes instead of building them")
+    parser.add_argument("--limit", type=int, default=10, help="results shown per country with --search (default: 10)")
+    args = parser.parse_args()
+
+    if args.search is not None:
+        for country_code in args.countries or sorted(
+            entry for entry in os.listdir(DATA_DIR) if os.path.exists(index_path(entry))
+        ):
+            results = SearchIndex.load(country_code).search(args.search)
+            print(f"\n=== {country_code}: {len(results)} matches ===")
+            for result in results[:args.limit]:
+                print(f"  {result['soc_code']:<10} {result['title']} ({result['match']})")
+        return
+
+    countries = args.countries or sorted(
+        entry for entry in os.listdir(DATA_DIR)
+        if entry != "us" and os.path.exists(occupations_path(entry))
+    )
+
+    for country_code in countries:
+        if not os.path.exists(occupations_path(country_code)):
+            print(f"⚠ {country_code}: no occupation file at {occupations_path(country_code)}")
+            continue
+
+        index = build_country(country_code)
+        metadata = index["metadata"]
+        print(f"✓ {country_code}: {metadata['total_occupations']} occupations, {metadata['total_tokens']:,} tokens, "
+              f"{metadata['aliased_occupations']} aliased → {index_path(country_code)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Patch bundles against the bundled data tree: every file, plain or columnar,
+must be reproduced byte for byte in both directions
+
+Usage:
+    python -m pytest test_dataset_delta.py
+"""
+
+import glob
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import compact_format
+import dataset_delta
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SuccessClaude", "Data", "JSON")
+
+def _read_tree(data_dir):
+    tree = {}
+    for name in dataset_delta.release_files(data_dir):
+        with open(os.path.join(data_dir, name), 'rb') as f:
+            tree[name] = f.read()
+    return tree
+
+class DatasetDeltaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.bundled = os.path.join(self.root, "bundled")
+        shutil.copytree(DATA_DIR, self.bundled)
+
+        # The same release with every columnar file written out as plain JSON
+        self.plain = os.path.join(self.root, "plain")
+        shutil.copytree(DATA_DIR, self.plain)
+        self.columnar = []
+        for name, payload in _read_tree(self.plain).items():
+            if payload.startswith(compact_format.GZIP_MAGIC) or compact_format.FORMAT_NAME.encode() in payload[:64]:
+                self.columnar.append(name)
+                with open(os.path.join(self.plain, name), 'w') as f:
+                    json.dump(compact_format.loads(payload), f, separators=(',', ':'), ensure_ascii=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def round_trip(self, old_dir, new_dir):
+        bundle = dataset_delta.diff_releases(old_dir, new_dir)
+        # Through the serialized bundle, as a release ships it
+        path = os.path.join(self.root, "update.patch.json.gz")
+        dataset_delta.save_bundle(bundle, path)
+        output = os.path.join(self.root, "output")
+        dataset_delta.apply_release(dataset_delta.load_bundle(path), old_dir, output)
+        self.assertEqual(_read_tree(output), _read_tree(new_dir))
+        shutil.rmtree(output)
+        return bundle
+
+    def test_tree_has_columnar_files(self):
+        self.assertTrue(any(name.endswith("_percentile_tables.json") for name in self.columnar))
+
+    def test_plain_to_columnar(self):
+        bundle = self.round_trip(self.plain, self.bundled)
+        for name in self.columnar:
+            entry = bundle["files"][name]
+            self.assertEqual(entry["ops"], [], name)
+            self.assertEqual(entry["encoding"]["compression"], "gzip", name)
+
+    def test_columnar_to_plain(self):
+        self.round_trip(self.bundled, self.plain)
+
+    def test_changed_columnar_file(self):
+        name = sorted(name for name in self.columnar if name.endswith("_percentile_tables.json"))[0]
+        path = os.path.join(self.bundled, name)
+        document = compact_format.load_document(path)
+        code = next(iter(document["occupations"]))
+        document["occupations"][code]["fitted"] = not document["occupations"][code]["fitted"]
+        compact_format.save_document(document, path, "gzip")
+
+        bundle = self.round_trip(DATA_DIR, self.bundled)
+        self.assertEqual(bundle["files"][name]["ops"],
+                         [["set", ["occupations", code, "fitted"], document["occupations"][code]["fitted"]]])
+
+    def test_binary_file_ships_whole(self):
+        path = os.path.join(self.bundled, "opaque.json")
+        with open(path, 'wb') as f:
+            f.write(b"\x1f\x8b not really gzip \xff")
+        with open(os.path.join(self.plain, "opaque.json"), 'wb') as f:
+            f.write(b"\xfe\xff")
+
+        bundle = self.round_trip(self.plain, self.bundled)
+        self.assertIn("data", bundle["files"]["opaque.json"])
+
+if __name__ == "__main__":
+    unittest.main()
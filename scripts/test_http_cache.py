@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+HTTPCache against a local stand-in server: full downloads, 304 revalidation
+and LRU eviction
+
+Usage:
+    python -m pytest test_http_cache.py
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from http_cache import HTTPCache
+
+class StandIn(BaseHTTPRequestHandler):
+    """Serves server.bodies[path] with an ETag; answers 304 whenever If-None-Match is sent"""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+        body = self.server.bodies.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        if self.headers.get("If-None-Match"):
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("ETag", f'"{self.path}"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class HTTPCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+        self.server.bodies = {"/a": b"a" * 100, "/b": b"b" * 100, "/c": b"c" * 100}
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+
+        self.root = tempfile.mkdtemp()
+        self.cache = HTTPCache(root=self.root, max_bytes=250, offline=False,
+                               session=requests.Session(), fresh_seconds=0)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.root)
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_200_stores_body(self):
+        path = self.cache.fetch(self.base + "/a")
+        self.assertEqual(self.read(path), b"a" * 100)
+        self.assertEqual(self.server.requests, [("/a", None)])
+        self.assertEqual(self.cache._index[self.base + "/a"]["etag"], '"/a"')
+
+    def test_304_revalidates_cached_entry(self):
+        first = self.cache.fetch(self.base + "/a")
+        second = self.cache.fetch(self.base + "/a")
+        self.assertEqual(first, second)
+        self.assertEqual(self.read(second), b"a" * 100)
+        self.assertEqual(self.server.requests, [("/a", None), ("/a", '"/a"')])
+
+    def test_304_without_entry_refetches(self):
+        path = self.cache.fetch(self.base + "/a", headers={"If-None-Match": '"stale"'})
+        self.assertEqual(self.read(path), b"a" * 100)
+        self.assertEqual(self.server.requests, [("/a", '"stale"'), ("/a", None)])
+
+    def test_304_after_blob_lost_refetches(self):
+        path = self.cache.fetch(self.base + "/a")
+        os.remove(path)
+        path = self.cache.fetch(self.base + "/a")
+        self.assertEqual(self.read(path), b"a" * 100)
+        # The missing blob means no validators are sent, so the server answers 200
+        self.assertEqual(self.server.requests, [("/a", None), ("/a", None)])
+
+    def test_eviction_drops_least_recently_used(self):
+        a = self.cache.fetch(self.base + "/a")
+        b = self.cache.fetch(self.base + "/b")
+        # Revalidating /a makes /b the least recently used entry
+        self.cache.fetch(self.base + "/a")
+        self.cache.fetch(self.base + "/c")
+
+        self.assertEqual(set(self.cache._index), {self.base + "/a", self.base + "/c"})
+        self.assertTrue(os.path.exists(a))
+        self.assertFalse(os.path.exists(b))
+        self.assertLessEqual(self.cache.total_bytes(), 250)
+
+    def test_eviction_keeps_shared_blob(self):
+        self.server.bodies["/a-copy"] = b"a" * 100
+        a = self.cache.fetch(self.base + "/a")
+        self.cache.fetch(self.base + "/a-copy")
+        self.cache.fetch(self.base + "/b")
+        self.cache.fetch(self.base + "/a-copy")
+        self.cache.fetch(self.base + "/c")
+
+        # Dropping /a frees nothing, since /a-copy shares its blob, so /b goes as well
+        self.assertEqual(set(self.cache._index), {self.base + "/a-copy", self.base + "/c"})
+        self.assertTrue(os.path.exists(a))
+        self.assertLessEqual(self.cache.total_bytes(), 250)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Build the binary ZIP code dataset read by zip_lookup.py
+
+zip_code_data.json is decoded in full just to resolve one ZIP to a city and
+state. This converts it into sorted fixed-width records (ZIP as uint32, state
+index, offset into a deduplicated city string pool) with a directory of
+3-digit-prefix shards, so lookups memory-map the file and bisect one shard.
+The legacy JSON can be regenerated from the binary file at any time.
+
+Only 5-digit ZIPs are stored. The Census pseudo-ZCTAs in the JSON (350HH,
+350XX: water and unpopulated areas) fail ZIPCodeService.isValidZIPCode, so the
+app can never look them up; they are counted and dropped.
+
+Usage:
+    python zip_dataset.py build                   # JSON → binary (default paths)
+    python zip_dataset.py legacy out.json         # binary → zip_code_data.json schema
+    python zip_dataset.py check                   # verify every ZIP and compare load costs
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from zip_lookup import (DEFAULT_PATH, HEADER, MAGIC, RECORD, SHARD, SHARD_COUNT, VERSION, ZipIndex,
+                        shard_of)
+
+LEGACY_PATH = "../SuccessClaude/Data/JSON/zip_code_data.json"
+
+def load_legacy(path=LEGACY_PATH):
+    with open(path, 'r') as f:
+        return json.load(f)["zip_codes"]
+
+def is_zip_code(zip_code):
+    return len(zip_code) == 5 and zip_code.isdigit()
+
+def encode_dataset(zip_codes):
+    """Serialize {zip: {"city", "state"}} into the binary layout, skipping non-ZIP keys"""
+    entries = []
+    for zip_code, location in zip_codes.items():
+        if not is_zip_code(zip_code):
+            continue
+        entries.append((int(zip_code), location["city"], location["state"]))
+    entries.sort()
+
+    states = sorted({state for _, _, state in entries})
+    state_index = {state: i for i, state in enumerate(states)}
+    for state in states:
+        if len(state.encode('ascii')) != 2:
+            raise ValueError(f"Not a 2-letter state code: {state!r}")
+
+    pool = bytearray()
+    pool_offsets = {}
+    records = bytearray()
+    shards = [[0, 0] for _ in range(SHARD_COUNT)]
+
+    for position, (zip_number, city, state) in enumerate(entries):
+        encoded = city.encode('utf-8')
+        if city not in pool_offsets:
+            pool_offsets[city] = len(pool)
+            pool += encoded
+
+        shard = shards[shard_of(zip_number)]
+        if shard[1] == 0:
+            shard[0] = position
+        shard[1] += 1
+
+        records += RECORD.pack(zip_number, state_index[state], len(encoded), pool_offsets[city])
+
+    header = HEADER.pack(MAGIC, VERSION, 0, len(entries), len(states), len(pool))
+    directory = b"".join(SHARD.pack(first, count) for first, count in shards)
+    return header + directory + "".join(states).encode('ascii') + bytes(records) + bytes(pool)
+
+def write_dataset(zip_codes, output_path=DEFAULT_PATH):
+    """Write the binary dataset atomically, returning its size in bytes"""
+    payload = encode_dataset(zip_codes)
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".bin.tmp")
+    with os.fdopen(fd, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, output_path)
+    return len(payload)
+
+def write_legacy(data_path, output_path):
+    with ZipIndex(data_path) as index:
+        legacy = index.to_legacy()
+    with open(output_path, 'w') as f:
+        json.dump(legacy, f, indent=2)
+    return len(legacy["zip_codes"])
+
+def _measure(load):
+    """(seconds, peak traced bytes) for a callable"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def check(json_path, data_path):
+    """Every ZIP in the JSON resolves identically in the binary file; print load costs"""
+    zip_codes = {zip_code: location for zip_code, location in load_legacy(json_path).items()
+                 if is_zip_code(zip_code)}
+    sample = next(iter(zip_codes))
+
+    _, json_seconds, json_peak = _measure(lambda: load_legacy(json_path)[sample])
+
+    def cold_lookup():
+        with ZipIndex(data_path) as index:
+            return index.lookup(sample)
+    _, bin_seconds, bin_peak = _measure(cold_lookup)
+
+    mismatches = 0
+    with ZipIndex(data_path) as index:
+        for zip_code, location in zip_codes.items():
+            if index.lookup(zip_code) != (location["city"], location["state"]):
+                mismatches += 1
+        extra = len(index) - len(zip_codes)
+
+    print(f"JSON:   {os.path.getsize(json_path):>10,} bytes, cold lookup {json_seconds * 1000:8.2f} ms, "
+          f"peak {json_peak / 1024:>9,.0f} KiB")
+    print(f"Binary: {os.path.getsize(data_path):>10,} bytes, cold lookup {bin_seconds * 1000:8.2f} ms, "
+          f"peak {bin_peak / 1024:>9,.0f} KiB")
+
+    if mismatches or extra:
+        print(f"✗ {mismatches} mismatched ZIP codes, {extra} unexpected records")
+        return False
+    print(f"✓ All {len(zip_codes):,} ZIP codes match")
+    return True
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build or export the binary ZIP code dataset")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="convert zip_code_data.json to the binary dataset")
+    build_parser.add_argument("--input", default=LEGACY_PATH)
+    build_parser.add_argument("--output", default=DEFAULT_PATH)
+
+    legacy_parser = commands.add_parser("legacy", help="write the legacy JSON from the binary dataset")
+    legacy_parser.add_argument("output")
+    legacy_parser.add_argument("--data", default=DEFAULT_PATH)
+
+    check_parser = commands.add_parser("check", help="verify the binary dataset against the JSON")
+    check_parser.add_argument("--input", default=LEGACY_PATH)
+    check_parser.add_argument("--data", default=DEFAULT_PATH)
+
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    if args.command == "build":
+        zip_codes = load_legacy(args.input)
+        size = write_dataset(zip_codes, args.output)
+        stored = sum(1 for zip_code in zip_codes if is_zip_code(zip_code))
+        print(f"✓ {stored:,} ZIP codes ({len(zip_codes) - stored:,} pseudo-ZCTAs skipped): {args.input} ({os.path.getsize(args.input):,} bytes) → "
+              f"{args.output} ({size:,} bytes)")
+
+    elif args.command == "legacy":
+        count = write_legacy(args.data, args.output)
+        print(f"✓ Wrote {count:,} ZIP codes to {args.output}")
+
+    elif args.command == "check":
+        if not check(args.input, args.data):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+ZIP-level household income from ACS estimates at ZCTA geography
+
+ZIPCodeService resolves a ZIP to a city and state, so income comparisons stop
+at the state. The ACS publishes the same income tables for ZIP Code Tabulation
+Areas; a ZCTA shares its code with the ZIP it approximates. This fetches them
+through fetch_census_table, joins them to zip_code_data.json and writes
+zip_income_data.json next to it:
+
+    {"zip_codes": ["00601", ...],      sorted, so the app can binary-search
+     "median": [..], "mean": [..],     household income; null where the ACS has no estimate
+     "households": [..],
+     "metadata": {...}}
+
+Parallel columns instead of an object per ZIP keep the file small enough to
+decode whole. Both sides of the join are sorted by code and walked once
+(merge_zip_codes), rather than probing a dict per ZIP. ZIPs without a ZCTA
+(PO boxes, single-building ZIPs) and ZCTAs outside the ZIP file are left out.
+
+Usage:
+    python zip_income.py                  # fetch, join and write the file
+    python zip_income.py --lookup 90210   # print the record of a ZIP from the written file
+"""
+
+import argparse
+import bisect
+import json
+
+import instrumentation
+from fetch_census_data import VARIABLE_GROUPS, fetch_census_table
+from json_emitter import atomic_open
+from zip_dataset import LEGACY_PATH, is_zip_code, load_legacy
+
+OUTPUT_PATH = "../SuccessClaude/Data/JSON/zip_income_data.json"
+
+# Income columns, in output order
+FIELDS = ["median", "mean", "households"]
+
+def _estimate(value):
+    """Integer estimate, or None for one the ACS suppressed (already NaN from fetch_census_table)"""
+    return None if value is None or value != value else int(value)
+
+def parse_zcta_income(table):
+    """Columns of per-ZCTA household income, sorted by ZCTA, from a fetch_census_table result"""
+    columns = {"zctas": [], **{field: [] for field in FIELDS}}
+    if table.empty:
+        return columns
+
+    table = table.sort_index()
+    for zcta, median, aggregate, households in zip(table.index, table["B19013_001E"],
+                                                   table["B19025_001E"], table["B19001_001E"]):
+        median, aggregate, households = _estimate(median), _estimate(aggregate), _estimate(households)
+        columns["zctas"].append(zcta)
+        columns["median"].append(median)
+        columns["mean"].append(int(aggregate / households) if aggregate is not None and households else None)
+        columns["households"].append(households)
+    return columns
+
+@instrumentation.staged("zcta_income", rows_out=lambda columns: len(columns["zctas"]))
+def fetch_zcta_income():
+    """Fetch household income for every ZCTA"""
+    print("Fetching ZCTA income data...")
+    return parse_zcta_income(fetch_census_table(VARIABLE_GROUPS["zcta"], geography="zcta"))
+
+@instrumentation.staged("merge", rows_in=len, rows_out=lambda columns: len(columns["zip_codes"]))
+def merge_zip_codes(zip_codes, zcta):
+    """Output columns for the ZIPs in zip_codes that have a ZCTA estimate, by a sorted-key merge"""
+    zips = sorted(zip_code for zip_code in zip_codes if is_zip_code(zip_code))
+    zctas = zcta["zctas"]
+
+    columns = {"zip_codes": [], **{field: [] for field in FIELDS}}
+    i = j = 0
+    while i < len(zips) and j < len(zctas):
+        if zips[i] < zctas[j]:
+            i += 1
+        elif zips[i] > zctas[j]:
+            j += 1
+        else:
+            if zcta["median"][j] is not None or zcta["mean"][j] is not None:
+                columns["zip_codes"].append(zips[i])
+                for field in FIELDS:
+                    columns[field].append(zcta[field][j])
+            i += 1
+            j += 1
+    return columns
+
+def build_output(columns, zip_count):
+    """Prepare the final JSON document"""
+    return {
+        **columns,
+        "metadata": {
+            "version": "2024.1",
+            "last_updated": "2024-12-28",
+            "source": "U.S. Census Bureau ACS 5-Year Estimates 2022",
+            "source_url": "https://www.census.gov/data/developers/data-sets/acs-5year.html",
+            "geography": "zip code tabulation area",
+            "zip_codes": len(columns["zip_codes"]),
+            "zip_codes_without_estimate": zip_count - len(columns["zip_codes"]),
+        }
+    }
+
+def save_output(output, output_path=OUTPUT_PATH):
+    # Read by the app, not people; skip the indentation
+    with atomic_open(output_path) as f:
+        json.dump(output, f, separators=(',', ':'), ensure_ascii=False)
+
+def lookup(document, zip_code):
+    """Income record of one ZIP from a loaded output document, or None"""
+    zip_codes = document["zip_codes"]
+    position = bisect.bisect_left(zip_codes, zip_code)
+    if position == len(zip_codes) or zip_codes[position] != zip_code:
+        return None
+    return {field: document[field][position] for field in FIELDS}
+
+def build(zcta, zip_path=LEGACY_PATH, output_path=OUTPUT_PATH):
+    """Join fetched ZCTA columns to the ZIP file and write the output; returns the document"""
+    zip_codes = [zip_code for zip_code in load_legacy(zip_path) if is_zip_code(zip_code)]
+    output = build_output(merge_zip_codes(zip_codes, zcta), len(zip_codes))
+    save_output(output, output_path)
+    return output
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Join ACS income at ZCTA geography to the ZIP code data")
+    parser.add_argument("--lookup", nargs="+", metavar="ZIP", help="print records from the written file instead")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    if args.lookup:
+        with open(OUTPUT_PATH, 'r') as f:
+            document = json.load(f)
+        for zip_code in args.lookup:
+            record = lookup(document, zip_code)
+            print(f"{zip_code}: {record if record else 'no estimate'}")
+        return
+
+    instrumentation.start("zip_income", args)
+
+    print("=" * 60)
+    print("ZIP-level income from Census ACS ZCTAs")
+    print("=" * 60)
+
+    zcta = fetch_zcta_income()
+    if not zcta["zctas"]:
+        print("\n⚠ No ZCTA data fetched. Exiting.")
+        return
+    print(f"✓ Fetched income for {len(zcta['zctas']):,} ZCTAs")
+
+    with instrumentation.stage("serialize") as record:
+        output = build(zcta)
+        record.wrote(OUTPUT_PATH)
+
+    metadata = output["metadata"]
+    print("\n" + "=" * 60)
+    print(f"✓ Saved data to {OUTPUT_PATH}")
+    print(f"✓ ZIP codes with income: {metadata['zip_codes']:,} "
+          f"({metadata['zip_codes_without_estimate']:,} without a ZCTA estimate)")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped ZIP code lookup over the binary dataset built by zip_dataset.py
+
+File layout (little-endian):
+
+    header     MAGIC, version u16, reserved u16, records u32, states u32, pool bytes u32
+    shards     SHARD_COUNT x (first record u32, record count u32), one per 3-digit prefix
+    states     states x 2-byte ASCII codes
+    records    records x (zip u32, state index u16, city length u16, pool offset u32), sorted by zip
+    pool       UTF-8 city names, each stored once
+
+A lookup reads the shard for the ZIP's prefix and bisects its records, so only
+a few pages of the file are ever touched and nothing is decoded up front.
+
+Usage:
+    python zip_lookup.py 90210 10001
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"SCZP"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHIII")
+SHARD = struct.Struct("<II")
+RECORD = struct.Struct("<IHHI")
+STATE_WIDTH = 2
+
+SHARD_COUNT = 1000
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "zip", "zip_code_data.bin")
+
+class ZipFormatError(Exception):
+    """Raised when a file is not a ZIP dataset this module can read"""
+
+def shard_of(zip_number):
+    return zip_number // 100
+
+def _zip_number(zip_code):
+    """Integer form of a 5-digit ZIP string, or None if it is not one"""
+    zip_code = str(zip_code).strip()
+    if len(zip_code) != 5 or not zip_code.isdigit():
+        return None
+    return int(zip_code)
+
+class ZipIndex:
+    """Read-only view of a ZIP dataset; use as a context manager or call close()"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ZipFormatError(f"{path} is empty")
+
+        magic, version, _, self.record_count, state_count, pool_size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ZipFormatError(f"{path} is not a ZIP dataset")
+        if version != VERSION:
+            self.close()
+            raise ZipFormatError(f"{path}: unsupported version {version}")
+
+        self._shards_at = HEADER.size
+        states_at = self._shards_at + SHARD_COUNT * SHARD.size
+        self.states = [
+            self._map[states_at + i * STATE_WIDTH:states_at + (i + 1) * STATE_WIDTH].decode('ascii')
+            for i in range(state_count)
+        ]
+        self._records_at = states_at + state_count * STATE_WIDTH
+        self._pool_at = self._records_at + self.record_count * RECORD.size
+
+        if self._pool_at + pool_size != len(self._map):
+            self.close()
+            raise ZipFormatError(f"{path} is truncated")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __len__(self):
+        return self.record_count
+
+    def _record(self, position):
+        return RECORD.unpack_from(self._map, self._records_at + position * RECORD.size)
+
+    def _city(self, length, offset):
+        start = self._pool_at + offset
+        return self._map[start:start + length].decode('utf-8')
+
+    def _find(self, zip_number):
+        """Position of a ZIP's record, or None"""
+        first, count = SHARD.unpack_from(self._map, self._shards_at + shard_of(zip_number) * SHARD.size)
+
+        low, high = first, first + count
+        while low < high:
+            middle = (low + high) // 2
+            value = self._record(middle)[0]
+            if value < zip_number:
+                low = middle + 1
+            elif value > zip_number:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def lookup(self, zip_code):
+        """(city, state) for a 5-digit ZIP string, or None"""
+        zip_number = _zip_number(zip_code)
+        if zip_number is None:
+            return None
+
+        position = self._find(zip_number)
+        if position is None:
+            return None
+
+        _, state, length, offset = self._record(position)
+        return self._city(length, offset), self.states[state]
+
+    def __contains__(self, zip_code):
+        zip_number = _zip_number(zip_code)
+        return zip_number is not None and self._find(zip_number) is not None
+
+    def items(self):
+        """Every (zip, city, state) in ZIP order"""
+        for position in range(self.record_count):
+            zip_number, state, length, offset = self._record(position)
+            yield f"{zip_number:05d}", self._city(length, offset), self.states[state]
+
+    def to_legacy(self):
+        """The dataset in the zip_code_data.json schema"""
+        return {"zip_codes": {zip_code: {"city": city, "state": state} for zip_code, city, state in self.items()}}
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up ZIP codes in the binary ZIP dataset")
+    parser.add_argument("zip_codes", nargs="+")
+    parser.add_argument("--data", default=DEFAULT_PATH, help="dataset built by zip_dataset.py")
+    args = parser.parse_args()
+
+    found = 0
+    with ZipIndex(args.data) as index:
+        for zip_code in args.zip_codes:
+            result = index.lookup(zip_code)
+            if result is None:
+                print(f"{zip_code}: not found")
+            else:
+                found += 1
+                print(f"{zip_code}: {result[0]}, {result[1]}")
+
+    if not found:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()